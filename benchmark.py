@@ -0,0 +1,204 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from instrumentation import peak_rss_mb
+from jira_analytics import JiraAnalytics
+from mock_jira_server import MockJiraServer
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+STAGES = [
+    'get_issues',
+    'prepare_data',
+    'build_issue_table',
+    'build_status_intervals',
+    'plot_lead_time_histogram',
+    'plot_time_in_status',
+    'plot_daily_issue_flow',
+    'plot_top_users',
+    'plot_user_worklog_histogram',
+    'plot_issues_by_priority',
+    'generate_all_reports',
+]
+
+
+
+def current_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure(stage, func, server, trace_memory=True):
+    """Замер одного этапа: время, пик памяти Python, число запросов к mock-серверу
+    
+    Исключение этапа не прерывает прогон: замер помечается error, чтобы упавший этап
+    не попал в результаты как успешный.
+    """
+    requests_before = server.requests_served
+    bytes_before = server.bytes_served
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    result, error = None, None
+    try:
+        result = func()
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    finally:
+        wall_seconds = time.perf_counter() - started
+        peak_traced = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        if trace_memory:
+            tracemalloc.stop()
+
+    requests_count = server.requests_served - requests_before
+    return result, {
+        'stage': stage,
+        'wall_seconds': round(wall_seconds, 3),
+        'peak_memory_mb': round(peak_traced / (1024 * 1024), 1) if peak_traced is not None else None,
+        'peak_rss_mb': peak_rss_mb(),
+        'requests': requests_count,
+        'requests_per_second': round(requests_count / wall_seconds, 1) if wall_seconds else None,
+        'megabytes_downloaded': round((server.bytes_served - bytes_before) / (1024 * 1024), 2),
+        'error': error,
+    }
+
+
+def run_benchmark(size, latency=0.0, error_rate=0.0, stages=None, render_workers=1, trace_memory=True):
+    """Прогон этапов конвейера на mock-сервере с size задачами; возвращает замеры по этапам"""
+    stages = stages or STAGES
+    results = []
+
+    with tempfile.TemporaryDirectory() as work_dir, \
+            MockJiraServer(total=size, latency=latency, error_rate=error_rate) as server:
+        config = {
+            'jira_server': server.url,
+            'project_key': 'KAFKA',
+            'max_results': server.max_page_size,
+            'max_workers': 8,
+            'backoff_base': 0.01,
+            'render_workers': render_workers,
+            'chart_cache': False,
+            'output_dir': os.path.join(work_dir, 'outputs'),
+            'data_dir': os.path.join(work_dir, 'data'),
+        }
+        config_path = os.path.join(work_dir, 'config.json')
+        with open(config_path, 'w', encoding='utf-8') as f:
+            json.dump(config, f)
+        analytics = JiraAnalytics(config_path)
+
+        state = {}
+        
+        def reports():
+            analytics.last_render_summary = None
+            if not analytics.generate_all_reports(full_refresh=True):
+                raise RuntimeError("generate_all_reports завершился ошибкой")
+            failed = analytics.last_render_summary['failed'] if analytics.last_render_summary else []
+            if failed:
+                raise RuntimeError(f"Не отрисованы графики: {', '.join(failed)}")
+
+        def issues_for_reports():
+            if 'all_issues' not in state:
+                state['all_issues'] = analytics.prepare_data(full_refresh=True)[2]
+            return state['all_issues']
+
+        def table():
+            if 'table' not in state:
+                state['table'] = analytics.build_issue_table(issues_for_reports())
+            return state['table']
+
+        def intervals():
+            if 'intervals' not in state:
+                state['intervals'] = analytics.build_status_intervals(issues_for_reports())
+            return state['intervals']
+
+        actions = {
+            'get_issues': lambda: len(analytics.get_issues('project = KAFKA')),
+            'prepare_data': lambda: len(issues_for_reports()),
+            'build_issue_table': table,
+            'build_status_intervals': intervals,
+            'plot_lead_time_histogram': lambda: analytics.plot_lead_time_histogram(table()),
+            'plot_time_in_status': lambda: analytics.plot_time_in_status(intervals()),
+            'plot_daily_issue_flow': lambda: analytics.plot_daily_issue_flow(table()),
+            'plot_top_users': lambda: analytics.plot_top_users(table()),
+            'plot_user_worklog_histogram': lambda: analytics.plot_user_worklog_histogram(table()),
+            'plot_issues_by_priority': lambda: analytics.plot_issues_by_priority(table()),
+            'generate_all_reports': reports,
+        }
+
+        for stage in stages:
+            _, record = measure(stage, actions[stage], server, trace_memory)
+            record['issues'] = size
+            results.append(record)
+            if record['error']:
+                logger.error(f"[{size}] {stage}: ошибка {record['error']}")
+                continue
+            logger.info(f"[{size}] {stage}: {record['wall_seconds']} с, пик {record['peak_memory_mb']} МБ, "
+                        f"запросов {record['requests']}")
+
+    return results
+
+
+def save_results(path, run):
+    """Добавление прогона в файл результатов, чтобы сравнивать замеры разных коммитов"""
+    history = []
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            history = json.load(f)
+    history.append(run)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(history, f, indent=2, ensure_ascii=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Бенчмарк конвейера JIRA Analytics на локальном mock-сервере')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='число задач в прогонах')
+    parser.add_argument('--latency', type=float, default=0.0, help='задержка ответа страницы, с')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='доля ответов 503')
+    parser.add_argument('--stages', nargs='+', choices=STAGES, help='замеряемые этапы (по умолчанию все)')
+    parser.add_argument('--render-workers', type=int, default=1, help='процессы отрисовки в generate_all_reports')
+    parser.add_argument('--no-tracemalloc', action='store_true', help='не замерять пик памяти (tracemalloc замедляет код)')
+    parser.add_argument('--output', default='bench_results.json', help='файл результатов')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logging.getLogger('jira_analytics').setLevel(logging.WARNING)
+
+    run = {
+        'timestamp': datetime.now().isoformat(),
+        'commit': current_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'latency': args.latency,
+        'error_rate': args.error_rate,
+        'results': [],
+    }
+    for size in args.sizes:
+        run['results'] += run_benchmark(size, args.latency, args.error_rate, args.stages,
+                                        args.render_workers, not args.no_tracemalloc)
+
+    save_results(args.output, run)
+    logger.info(f"Результаты сохранены в {args.output}")
+    failed = [f"{record['stage']} ({record['issues']})" for record in run['results'] if record['error']]
+    if failed:
+        logger.error(f"Этапы завершились ошибкой: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())
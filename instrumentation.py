@@ -0,0 +1,134 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+
+def peak_rss_mb():
+    """Пиковый RSS процесса в МБ (None, если недоступно на платформе)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдает килобайты, macOS - байты
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+class Tracer:
+    """Замеры этапов конвейера: длительности, счетчики и пиковый RSS
+
+    Каждый этап записывается как событие формата Chrome trace (ph='X'), поэтому трассу
+    можно открыть в chrome://tracing или Perfetto. Время отсчитывается по time.time(),
+    чтобы события из процессов отрисовки ложились на ту же шкалу.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.events = []
+        self._origin = time.time()
+        self._thread_names = {}
+        self._lock = threading.Lock()
+
+    def _to_us(self, timestamp):
+        return (timestamp - self._origin) * 1e6
+
+    @contextmanager
+    def span(self, name, category='pipeline', **args):
+        """Замер блока кода; в выданный словарь можно дописать счетчики (issues, bytes, ...)"""
+        if not self.enabled:
+            yield args
+            return
+        started = time.time()
+        try:
+            yield args
+        finally:
+            self.record(name, started, time.time() - started, category, args)
+
+    def record(self, name, started, seconds, category='pipeline', args=None, pid=None, tid=None):
+        """Запись готового замера (например, присланного процессом отрисовки)"""
+        if not self.enabled:
+            return
+        if tid is None:
+            thread = threading.current_thread()
+            tid = thread.ident
+            self._thread_names.setdefault(tid, thread.name)
+        event = {
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': round(self._to_us(started), 1),
+            'dur': round(seconds * 1e6, 1),
+            'pid': pid or os.getpid(),
+            'tid': tid,
+            'args': dict(args or {}, peak_rss_mb=peak_rss_mb()),
+        }
+        with self._lock:
+            self.events.append(event)
+
+    def clear(self):
+        """Сброс накопленных событий (например, между циклами долгоживущего процесса)"""
+        with self._lock:
+            self.events = []
+            self._thread_names = {}
+
+    def summary(self):
+        """Сводка по этапам в порядке первого появления: вызовы, время, задачи, байты, пик RSS"""
+        rows = {}
+        for event in self.events:
+            row = rows.setdefault(event['name'], {
+                'stage': event['name'], 'calls': 0, 'total_seconds': 0.0, 'max_seconds': 0.0,
+                'issues': 0, 'bytes': 0, 'peak_rss_mb': None,
+            })
+            seconds = event['dur'] / 1e6
+            row['calls'] += 1
+            row['total_seconds'] += seconds
+            row['max_seconds'] = max(row['max_seconds'], seconds)
+            row['issues'] += event['args'].get('issues', 0)
+            row['bytes'] += event['args'].get('bytes', 0)
+            rss = event['args'].get('peak_rss_mb')
+            if rss is not None:
+                row['peak_rss_mb'] = max(row['peak_rss_mb'] or 0, rss)
+        return list(rows.values())
+
+    def format_summary(self):
+        """Сводка в виде текстовой таблицы"""
+        header = f"{'Этап':<36} {'Вызовов':>8} {'Всего, с':>10} {'Макс, с':>9} {'Задач':>8} {'МБ загр.':>9} {'RSS, МБ':>8}"
+        lines = [header, '-' * len(header)]
+        for row in self.summary():
+            issues = row['issues'] or ''
+            megabytes = f"{row['bytes'] / (1024 * 1024):.2f}" if row['bytes'] else ''
+            rss = '' if row['peak_rss_mb'] is None else f"{row['peak_rss_mb']:.1f}"
+            lines.append(
+                f"{row['stage'][:36]:<36} {row['calls']:>8} {row['total_seconds']:>10.3f} "
+                f"{row['max_seconds']:>9.3f} {issues:>8} {megabytes:>9} {rss:>8}"
+            )
+        return '\n'.join(lines)
+
+    def write_chrome_trace(self, path):
+        """Сохранение трассы в формате Chrome trace event (JSON)"""
+        metadata = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': tid, 'args': {'name': name}}
+            for tid, name in self._thread_names.items()
+        ]
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': metadata + self.events, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False)
+        return path
+
+
+def traced(name, category='pipeline'):
+    """Декоратор метода: замер вызова через self.tracer"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(self, *args, **kwargs):
+            with self.tracer.span(name, category):
+                return func(self, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,478 +1,3223 @@
-import requests
-import pandas as pd
-import matplotlib.pyplot as plt
+import argparse
+import copy
+import hashlib
+import heapq
+import importlib
 import json
 import logging
-from datetime import datetime
+import random
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+from array import array
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from itertools import islice
 import os
 from pathlib import Path
 
+from instrumentation import Tracer, traced
+
+
+class LazyModule:
+    """Модуль, который импортируется при первом обращении к его атрибуту
+    
+    После импорта имя в глобальных переменных модуля заменяется настоящим модулем, поэтому
+    дальше обращения идут напрямую. Так команды, которым не нужны pandas, numpy, requests
+    или asyncio (например, stats), не платят за их импорт при запуске.
+    """
+    
+    def __init__(self, name, alias):
+        self._name = name
+        self._alias = alias
+    
+    def __getattr__(self, attr):
+        module = importlib.import_module(self._name)
+        globals()[self._alias] = module
+        return getattr(module, attr)
+
+
+requests = LazyModule('requests', 'requests')
+np = LazyModule('numpy', 'np')
+pd = LazyModule('pandas', 'pd')
+asyncio = LazyModule('asyncio', 'asyncio')
+
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+CLOSED_STATUSES = ('Closed', 'Resolved', 'Done')
+
+# Профили запроса /rest/api/2/search: lean - только скалярные поля отчетов, full - с changelog.
+# Профиль changelog служит для дозагрузки истории пакетами задач, которым она нужна.
+FETCH_PROFILES = {
+    'lean': {'fields': 'key,created,updated,status,resolutiondate,assignee,reporter,timespent,priority'},
+    'full': {'fields': 'key,created,updated,status,resolutiondate,assignee,reporter,timespent,priority',
+             'expand': 'changelog'},
+    'changelog': {'fields': 'updated', 'expand': 'changelog'},
+}
+
+# Отчеты: функция подготовки графиков, требуемый профиль загрузки, входные данные
+# (таблица задач, интервалы статусов или общий проход по закрытым задачам ClosedIssueStats)
+# и столбцы таблицы задач, которые читаются из колоночного снимка
+REPORTS = {
+    'lead-time': {'charts': 'charts_lead_time_histogram', 'profile': 'lean', 'input': 'table',
+                  'columns': ['is_closed', 'created', 'resolved']},
+    'time-in-status': {'charts': 'charts_time_in_status', 'profile': 'full', 'input': 'intervals',
+                       'columns': ['key', 'status', 'created', 'updated']},
+    'daily-flow': {'charts': 'charts_daily_issue_flow', 'profile': 'lean', 'input': 'table',
+                   'columns': ['created', 'resolved']},
+    'top-users': {'charts': 'charts_top_users', 'profile': 'lean', 'input': 'closed_stats',
+                  'columns': ['is_closed', 'assignee', 'reporter']},
+    'worklog': {'charts': 'charts_user_worklog_histogram', 'profile': 'lean', 'input': 'closed_stats',
+                'columns': ['is_closed', 'timespent']},
+    'priority': {'charts': 'charts_issues_by_priority', 'profile': 'lean', 'input': 'closed_stats',
+                 'columns': ['is_closed', 'priority']},
+}
+
+
+# Столбцы таблицы задач: поле REST API, атрибут вложенного объекта и значение по умолчанию
+TABLE_COLUMNS = {
+    'key': (None, None, None),
+    'status': ('status', 'name', 'Неизвестно'),
+    'priority': ('priority', 'name', 'Не установлен'),
+    'assignee': ('assignee', 'displayName', 'Не назначен'),
+    'reporter': ('reporter', 'displayName', 'Неизвестно'),
+    'timespent': ('timespent', None, None),
+}
+
+
+# Частоты агрегации потока задач: псевдоним pandas и подпись графика
+FLOW_FREQUENCIES = {'D': 'D', 'W': 'W', 'M': 'MS'}
+FLOW_TITLES = {'D': 'Ежедневное', 'W': 'Еженедельное', 'M': 'Ежемесячное'}
+FLOW_COLUMNS = ['date', 'created', 'resolved', 'created_cumulative', 'resolved_cumulative']
+
+
+INTERVAL_COLUMNS = ['key', 'status', 'start', 'end', 'duration_days']
+
+# Статистики распределений отчетов: квантили и столбцы выгрузки
+DISTRIBUTION_REPORTS = ('lead-time', 'time-in-status', 'worklog')
+DISTRIBUTION_QUANTILES = {'p50': 0.5, 'p75': 0.75, 'p90': 0.9, 'p99': 0.99}
+DISTRIBUTION_COLUMNS = ['report', 'dimension', 'group', 'count', 'mean', 'min', *DISTRIBUTION_QUANTILES, 'max']
+# Измерения статистик распределений не зависят от того, какие столбцы загрузил отчет
+DISTRIBUTION_DIMENSIONS = ['status', 'priority', 'assignee']
+# Столбцы, из которых считаются значения распределений табличных отчетов
+DISTRIBUTION_VALUE_COLUMNS = {'lead-time': ['created', 'resolved'], 'worklog': ['timespent']}
+# Столбцы задач, которые присоединяются по ключу к времени в статусах (статус берется из интервала)
+DISTRIBUTION_DWELL_COLUMNS = ['key', 'priority', 'assignee']
+CHART_DPI = 150
+# Меняется вместе с функциями отрисовки, чтобы сбросить кэш графиков
+CHART_CACHE_VERSION = 2
+
+
+def parse_jira_datetime(value):
+    """Разбор даты JIRA вида 2024-01-31T12:00:00.000+0000"""
+    return datetime.strptime(value, '%Y-%m-%dT%H:%M:%S.%f%z')
+
+
+def status_transitions(issue):
+    """Переходы статусов задачи из changelog (или готового поля transitions): (время, из статуса, в статус)"""
+    if 'transitions' in issue:
+        return issue['transitions']
+    
+    transitions = []
+    for history in (issue.get('changelog') or {}).get('histories', []):
+        for item in history.get('items', []):
+            if item.get('field') == 'status':
+                transitions.append((history['created'], item.get('fromString'), item.get('toString')))
+    return transitions
+
+
+def issue_column_values(issue):
+    """Значения столбцов TABLE_COLUMNS одной задачи (со значениями по умолчанию для пустых полей)"""
+    fields = issue['fields']
+    values = {'key': issue['key']}
+    for name, (field, attr, default) in TABLE_COLUMNS.items():
+        if field is None:
+            continue
+        value = fields.get(field)
+        if isinstance(value, dict):
+            value = value.get(attr)
+        values[name] = value if value is not None else default
+    return values
+
+
+class JiraSyncError(Exception):
+    """Синхронизация прервана: страницу не удалось получить после всех повторов"""
+
+
+class StoreError(Exception):
+    """Локальное хранилище отсутствует, устарело или не подходит для работы без сети"""
+
+
+def _histogram_axes(ax, chart):
+    ax.hist(chart['values'], bins=chart['bins'], alpha=0.7, color=chart.get('color'), edgecolor='black')
+    ax.set_xlabel(chart['xlabel'])
+    ax.set_ylabel(chart['ylabel'])
+    ax.set_title(chart['title'])
+    ax.grid(True, alpha=0.3)
+
+
+def _draw_histogram(figure, chart):
+    _histogram_axes(figure.add_subplot(), chart)
+
+
+def _draw_facets(figure, chart):
+    """Сетка гистограмм (например, по статусам) на одной фигуре"""
+    columns = chart['columns']
+    rows = -(-len(chart['panels']) // columns)
+    axes = figure.subplots(rows, columns, squeeze=False).ravel()
+    for ax, panel in zip(axes, chart['panels']):
+        _histogram_axes(ax, panel)
+    for ax in axes[len(chart['panels']):]:
+        ax.set_visible(False)
+    figure.suptitle(chart['title'])
+
+
+def _draw_daily_flow(figure, chart):
+    ax1, ax2 = figure.subplots(2, 1)
+    
+    ax1.plot(chart['dates'], chart['created'], label='Создано', linewidth=2)
+    ax1.plot(chart['dates'], chart['resolved'], label='Закрыто', linewidth=2)
+    ax1.set_title(chart['title'])
+    ax1.set_ylabel('Количество задач')
+    ax1.legend()
+    ax1.grid(True, alpha=0.3)
+    
+    ax2.plot(chart['dates'], chart['created_cumulative'], label='Всего создано', linewidth=2)
+    ax2.plot(chart['dates'], chart['resolved_cumulative'], label='Всего закрыто', linewidth=2)
+    ax2.set_title('Накопительный итог задач')
+    ax2.set_xlabel('Дата')
+    ax2.set_ylabel('Количество задач')
+    ax2.legend()
+    ax2.grid(True, alpha=0.3)
+
+
+def _draw_top_users(figure, chart):
+    ax = figure.add_subplot()
+    y_pos = range(len(chart['users']))
+    
+    ax.barh(y_pos, chart['assignee_counts'], alpha=0.7, label='Исполнитель', color='blue')
+    ax.barh(y_pos, chart['reporter_counts'], left=chart['assignee_counts'], alpha=0.7, label='Репортер', color='orange')
+    
+    ax.set_ylabel('Пользователь')
+    ax.set_xlabel('Количество задач')
+    ax.set_title(chart['title'])
+    ax.set_yticks(list(y_pos), chart['users'])
+    ax.legend()
+    ax.grid(True, alpha=0.3)
+
+
+def _draw_priority(figure, chart):
+    ax = figure.add_subplot()
+    bars = ax.bar(chart['priorities'], chart['counts'], alpha=0.7, edgecolor='black')
+    
+    for bar, count in zip(bars, chart['counts']):
+        ax.text(bar.get_x() + bar.get_width()/2, bar.get_height() + 0.1,
+                str(count), ha='center', va='bottom')
+    
+    ax.set_xlabel('Приоритет')
+    ax.set_ylabel('Количество задач')
+    ax.set_title(chart['title'])
+    ax.tick_params(axis='x', labelrotation=45)
+    ax.grid(True, alpha=0.3)
+
+
+CHART_RENDERERS = {
+    'histogram': _draw_histogram,
+    'daily_flow': _draw_daily_flow,
+    'top_users': _draw_top_users,
+    'priority': _draw_priority,
+    'facets': _draw_facets,
+}
+
+
+def new_figure():
+    """Фигура с холстом Agg, которую можно переиспользовать для нескольких графиков"""
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    
+    figure = Figure()
+    FigureCanvasAgg(figure)
+    return figure
+
+
+def draw_chart(chart, figure=None):
+    """Построение графика на новой или очищенной переиспользуемой фигуре"""
+    if figure is None:
+        figure = new_figure()
+    else:
+        figure.clear()
+    figure.set_size_inches(chart['figsize'])
+    CHART_RENDERERS[chart['kind']](figure, chart)
+    figure.tight_layout()
+    return figure
+
+
+def render_chart(chart, figure=None):
+    """Отрисовка одного графика через объектный API Agg, без глобального состояния pyplot
+    
+    Функция модульного уровня, чтобы ее можно было передать в пул процессов. График
+    сохраняется во всех форматах chart['formats'] (расширение path - первый из них) и,
+    если задан preview_dpi, в превью <имя>.preview.png с пониженным разрешением.
+    Поля подгоняет tight_layout в draw_chart, поэтому savefig не перерисовывает фигуру
+    повторно ради bbox_inches='tight'.
+    """
+    started = time.perf_counter()
+    figure = draw_chart(chart, figure)
+    dpi = chart.get('dpi', CHART_DPI)
+    for path in chart_output_paths(chart):
+        figure.savefig(path, dpi=chart['preview_dpi'] if path.endswith('.preview.png') else dpi)
+    return time.perf_counter() - started
+
+
+def chart_output_paths(chart):
+    """Все файлы графика: path, остальные форматы из chart['formats'] и превью, если задан preview_dpi"""
+    base = os.path.splitext(chart['path'])[0]
+    paths = [chart['path']] + [f'{base}.{fmt}' for fmt in chart.get('formats', [])[1:]]
+    if chart.get('preview_dpi'):
+        paths.append(f'{base}.preview.png')
+    return paths
+
+
+def render_chart_timed(chart, figure=None):
+    """render_chart с отметками для трассы: начало (time.time()), длительность и pid процесса"""
+    started = time.time()
+    return started, render_chart(chart, figure), os.getpid()
+
+
+def render_chart_bundle(charts, path):
+    """Все графики одним многостраничным PDF: одна фигура очищается и переиспользуется для каждой страницы"""
+    from matplotlib.backends.backend_pdf import PdfPages
+    
+    started = time.time()
+    figure = new_figure()
+    with PdfPages(path) as pdf:
+        for chart in charts:
+            pdf.savefig(draw_chart(chart, figure))
+    return started, time.time() - started, os.getpid()
+
+
+def chart_fingerprint(chart):
+    """Хеш содержимого графика: входные массивы и параметры отрисовки (кроме сообщения в лог)"""
+    digest = hashlib.sha256(f'{CHART_CACHE_VERSION}'.encode())
+    _update_fingerprint(digest, chart)
+    return digest.hexdigest()
+
+
+def _update_fingerprint(digest, chart):
+    for name in sorted(chart):
+        if name == 'message':
+            continue
+        value = chart[name]
+        digest.update(name.encode('utf-8'))
+        if isinstance(value, np.ndarray) and value.dtype != object:
+            digest.update(str(value.dtype).encode('utf-8'))
+            digest.update(np.ascontiguousarray(value).tobytes())
+        elif isinstance(value, list) and value and all(isinstance(item, dict) for item in value):
+            # Панели составной фигуры хешируются так же, как отдельные графики
+            for item in value:
+                _update_fingerprint(digest, item)
+        else:
+            digest.update(repr(value.tolist() if isinstance(value, np.ndarray) else value).encode('utf-8'))
+
+
+class ConnectionLimiter:
+    """Ограничение числа одновременных HTTP-запросов: общее и отдельно для каждого хоста"""
+    
+    def __init__(self, max_connections, max_per_host):
+        self._global_slots = threading.BoundedSemaphore(max_connections)
+        self._max_per_host = max_per_host
+        self._host_slots = {}
+        self._lock = threading.Lock()
+    
+    @contextmanager
+    def slot(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            host_slots = self._host_slots.setdefault(host, threading.BoundedSemaphore(self._max_per_host))
+        with self._global_slots, host_slots:
+            yield
+
+
+class SharedSession:
+    """HTTP-сессия, создаваемая при первом обращении; один объект разделяют копии для проектов"""
+    
+    def __init__(self, factory):
+        self._factory = factory
+        self._session = None
+        self._lock = threading.Lock()
+    
+    def get(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._factory()
+        return self._session
+
+
+class IssueStoreWriter:
+    """Запись хранилища JSON Lines во временный файл с атомарной заменой при успешном завершении
+    
+    discard=True до выхода из блока оставляет прежний файл (например, если ничего не изменилось).
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = f"{path}.tmp"
+        self.discard = False
+        self.count = 0
+        self.watermark = None
+        self._watermark_dt = None
+        self._file = None
+    
+    def __enter__(self):
+        self._file = open(self.tmp_path, 'w', encoding='utf-8')
+        return self
+    
+    def write(self, issue):
+        self._file.write(json.dumps(issue, ensure_ascii=False))
+        self._file.write('\n')
+        self.count += 1
+        
+        updated = issue.get('fields', {}).get('updated')
+        if updated:
+            updated_dt = parse_jira_datetime(updated)
+            if self._watermark_dt is None or updated_dt > self._watermark_dt:
+                self._watermark_dt = updated_dt
+                self.watermark = updated
+    
+    def __exit__(self, exc_type, exc, tb):
+        self._file.close()
+        if exc_type is None and not self.discard:
+            os.replace(self.tmp_path, self.path)
+        else:
+            os.remove(self.tmp_path)
+        return False
+
+
+class ColumnarSnapshot:
+    """Сжатый колоночный снимок таблицы задач: по массиву numpy на столбец в архиве .npz
+    
+    Категориальные столбцы хранятся кодами и словарем категорий, даты - как datetime64[ns].
+    np.load читает члены архива по требованию, поэтому отчет загружает только свои столбцы.
+    Переходы статусов (все, что отчетам нужно из changelog) лежат в отдельном архиве.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.changelog_path = f"{os.path.splitext(path)[0]}.changelog.npz"
+    
+    def exists(self):
+        return os.path.exists(self.path) and os.path.exists(self.changelog_path)
+    
+    @property
+    def count(self):
+        """Число задач в снимке"""
+        with np.load(self.path) as archive:
+            return len(archive['is_closed'])
+    
+    @property
+    def source(self):
+        """Отметка файла хранилища, из которого построен снимок"""
+        with np.load(self.path) as archive:
+            return str(archive['source'])
+    
+    def write(self, table, transitions, source):
+        """Запись таблицы и переходов (issue, time, from, to) во временные файлы с атомарной заменой"""
+        arrays = {'source': np.array(source)}
+        for name in table.columns:
+            arrays.update(self._encode(name, table[name]))
+        changelog = {'issue': np.asarray(transitions['issue'], dtype=np.int32), 'time': transitions['time']}
+        for name in ('from', 'to'):
+            changelog.update(self._encode(name, pd.Series(pd.Categorical(transitions[name]))))
+        
+        for path, data in ((self.changelog_path, changelog), (self.path, arrays)):
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.savez_compressed(f, **data)
+            os.replace(tmp_path, path)
+    
+    def _encode(self, name, column):
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            return {name: column.cat.codes.to_numpy(),
+                    f'{name}__categories': column.cat.categories.to_numpy(dtype=str)}
+        if column.dtype == object:
+            return {name: column.to_numpy(dtype=str)}
+        return {name: column.to_numpy()}
+    
+    def _decode(self, archive, name):
+        values = archive[name]
+        if f'{name}__categories' in archive.files:
+            return pd.Categorical.from_codes(values, archive[f'{name}__categories'])
+        if values.dtype.kind == 'U':
+            return pd.Series(values, dtype=object)
+        return values
+    
+    def load_table(self, columns=None):
+        """Таблица задач только из нужных столбцов (по умолчанию - из всех)"""
+        with np.load(self.path) as archive:
+            if columns is None:
+                columns = [name for name in archive.files if '__' not in name and name != 'source']
+            return pd.DataFrame({name: self._decode(archive, name) for name in columns}, columns=columns)
+    
+    def load_transitions(self):
+        """Переходы статусов: номер строки таблицы, время, статус до и после"""
+        with np.load(self.changelog_path) as archive:
+            return {
+                'issue': archive['issue'].astype(np.int64),
+                'time': archive['time'],
+                'from': np.asarray(self._decode(archive, 'from'), dtype=object),
+                'to': np.asarray(self._decode(archive, 'to'), dtype=object),
+            }
+
+
+class CompactIssues:
+    """Компактная модель задач для анализа в памяти: массивы array по полям вместо словарей REST API
+    
+    Статусы, приоритеты и имена пользователей хранятся кодами в общем словаре строк (каждое
+    значение - один интернированный объект на весь запуск), даты - целыми миллисекундами эпохи
+    UTC (MISSING_TIME для пустых), timespent - float с NaN. Переходы статусов лежат в плоских
+    массивах: переходы i-й задачи - trans_offsets[i]:trans_offsets[i + 1]. Задачи добавляются
+    пачками по мере чтения страниц, исходный JSON после разбора пачки не хранится.
+    
+    Индексация и перебор отдают облегченные задачи (поля отчетов и готовый список transitions
+    вместо changelog), поэтому модель можно передать везде, где ожидается список задач; view() - подмножество строк без копирования данных.
+    """
+    
+    CHUNK_SIZE = 4096
+    CATEGORY_COLUMNS = ('status', 'priority', 'assignee', 'reporter')
+    TIME_COLUMNS = {'created': 'created', 'updated': 'updated', 'resolved': 'resolutiondate'}
+    # Значение NaT в datetime64: пустые даты переводятся в NaT без отдельной маски
+    MISSING_TIME = -2 ** 63
+    
+    def __init__(self, issues=()):
+        self.keys = []
+        self.strings = []
+        self._codes = {}
+        self.categories = {name: array('I') for name in self.CATEGORY_COLUMNS}
+        self.times = {name: array('q') for name in self.TIME_COLUMNS}
+        self.timespent = array('d')
+        self.trans_offsets = array('q', [0])
+        self.trans_time = array('q')
+        self.trans_from = array('I')
+        self.trans_to = array('I')
+        # Единица datetime64, в которой pd.to_datetime отдал даты (ns или us в зависимости от версии pandas)
+        self.time_unit = 'ns'
+        self.rows = None
+        self.extend(issues)
+    
+    def _code(self, value):
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.strings)
+            self.strings.append(sys.intern(str(value)))
+        return code
+    
+    def extend(self, issues):
+        """Добавление задач из потока (страницы REST API или хранилище) пачками по CHUNK_SIZE"""
+        if self.rows is not None:
+            raise ValueError("Нельзя добавлять задачи в подмножество строк (view)")
+        issues = iter(issues)
+        while True:
+            chunk = list(islice(issues, self.CHUNK_SIZE))
+            if not chunk:
+                return self
+            self._append_chunk(chunk)
+    
+    def _append_chunk(self, chunk):
+        # Даты пачки разбираются одним векторизованным вызовом pd.to_datetime, как в build_issue_table
+        dates, trans_dates = [], []
+        for issue in chunk:
+            values = issue_column_values(issue)
+            self.keys.append(issue['key'])
+            for name in self.CATEGORY_COLUMNS:
+                self.categories[name].append(self._code(values[name]))
+            timespent = values['timespent']
+            self.timespent.append(float('nan') if timespent is None else float(timespent))
+            
+            fields = issue['fields']
+            dates += [fields.get(field) for field in self.TIME_COLUMNS.values()]
+            for when, from_status, to_status in status_transitions(issue):
+                trans_dates.append(when)
+                self.trans_from.append(self._code(from_status or 'Неизвестно'))
+                self.trans_to.append(self._code(to_status or 'Неизвестно'))
+            self.trans_offsets.append(len(self.trans_from))
+        
+        stamps = pd.to_datetime(pd.Series(dates + trans_dates, dtype=object), utc=True, format='ISO8601')
+        stamps = stamps.dt.tz_convert(None).to_numpy()
+        if len(self.keys) == len(chunk):
+            self.time_unit = np.datetime_data(stamps.dtype)[0]
+        millis = stamps.astype('datetime64[ms]').view(np.int64)
+        for position, name in enumerate(self.TIME_COLUMNS):
+            self.times[name].frombytes(millis[position:len(dates):len(self.TIME_COLUMNS)].tobytes())
+        self.trans_time.frombytes(millis[len(dates):].tobytes())
+    
+    def __len__(self):
+        return len(self.keys) if self.rows is None else len(self.rows)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self._issue(index if self.rows is None else int(self.rows[index]))
+    
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+    
+    def _format_time(self, millis):
+        if millis == self.MISSING_TIME:
+            return None
+        moment = datetime(1970, 1, 1, tzinfo=timezone.utc) + timedelta(milliseconds=millis)
+        return moment.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + '+0000'
+    
+    def _issue(self, row):
+        """Облегченная задача строки row в формате REST API с полем transitions (даты - в UTC)"""
+        fields = {field: self._format_time(self.times[name][row]) for name, field in self.TIME_COLUMNS.items()}
+        for name in self.CATEGORY_COLUMNS:
+            field, attr, _ = TABLE_COLUMNS[name]
+            fields[field] = {attr: self.strings[self.categories[name][row]]}
+        timespent = self.timespent[row]
+        fields['timespent'] = None if timespent != timespent else int(timespent)
+        transitions = [
+            (self._format_time(self.trans_time[position]),
+             self.strings[self.trans_from[position]], self.strings[self.trans_to[position]])
+            for position in range(self.trans_offsets[row], self.trans_offsets[row + 1])
+        ]
+        return {'key': self.keys[row], 'fields': fields, 'transitions': transitions}
+    
+    def view(self, rows):
+        """Подмножество строк (номера в текущем наборе) с общими массивами данных"""
+        subset = copy.copy(self)
+        rows = np.asarray(rows, dtype=np.int64)
+        subset.rows = rows if self.rows is None else self.rows[rows]
+        return subset
+    
+    def closed(self):
+        """Закрытые задачи (статус из CLOSED_STATUSES) как view()"""
+        return self.view(np.flatnonzero(self._is_closed()))
+    
+    def _is_closed(self):
+        codes = [self._codes[status] for status in CLOSED_STATUSES if status in self._codes]
+        return np.isin(self._column(self.categories['status'], np.int64), codes)
+    
+    def _column(self, values, dtype):
+        column = np.array(values, dtype=dtype)
+        return column if self.rows is None else column[self.rows]
+    
+    def _categorical(self, codes):
+        # Категории по алфавиту и только используемые - как у pd.Categorical в build_issue_table
+        used = np.unique(codes)
+        names = np.asarray(self.strings, dtype=object)[used]
+        order = np.argsort(names)
+        remap = np.zeros(len(self.strings), dtype=np.int32)
+        remap[used[order]] = np.arange(len(used), dtype=np.int32)
+        return pd.Categorical.from_codes(remap[codes], categories=names[order])
+    
+    def _datetimes_at(self, values, positions):
+        return np.array(values, dtype=np.int64)[positions].view('datetime64[ms]').astype(f'datetime64[{self.time_unit}]')
+    
+    def _datetimes(self, values):
+        return self._column(values, np.int64).view('datetime64[ms]').astype(f'datetime64[{self.time_unit}]')
+    
+    def to_table(self, columns=None):
+        """Таблица задач в формате build_issue_table (по умолчанию - все столбцы)"""
+        columns = list(columns or [*TABLE_COLUMNS, *self.TIME_COLUMNS, 'is_closed'])
+        data = {}
+        for name in columns:
+            if name == 'key':
+                data[name] = pd.Series(self._column(self.keys, object), dtype=object)
+            elif name in self.categories:
+                data[name] = self._categorical(self._column(self.categories[name], np.int64))
+            elif name in self.times:
+                data[name] = self._datetimes(self.times[name])
+            elif name == 'timespent':
+                data[name] = self._column(self.timespent, np.float64)
+            elif name == 'is_closed':
+                data[name] = self._is_closed()
+            else:
+                raise KeyError(name)
+        return pd.DataFrame(data, columns=columns)
+    
+    def transitions(self):
+        """Переходы статусов в формате ColumnarSnapshot.load_transitions: номер строки, время, статус до и после"""
+        offsets = np.array(self.trans_offsets, dtype=np.int64)
+        counts = np.diff(offsets)
+        if self.rows is None:
+            positions = np.arange(offsets[-1])
+            issue = np.repeat(np.arange(len(counts)), counts)
+        else:
+            counts = counts[self.rows]
+            issue = np.repeat(np.arange(len(self.rows)), counts)
+            # Номер перехода = начало переходов задачи + порядковый номер внутри задачи
+            first = np.cumsum(counts) - counts
+            positions = np.repeat(offsets[self.rows] - first, counts) + np.arange(counts.sum())
+        strings = np.asarray(self.strings, dtype=object)
+        return {
+            'issue': issue,
+            'time': self._datetimes_at(self.trans_time, positions),
+            'from': strings[np.array(self.trans_from, dtype=np.int64)[positions]],
+            'to': strings[np.array(self.trans_to, dtype=np.int64)[positions]],
+        }
+    
+    @property
+    def nbytes(self):
+        """Оценка занимаемой памяти в байтах: массивы, ключи и словарь строк (общие для всех view)"""
+        buffers = [*self.categories.values(), *self.times.values(), self.timespent,
+                   self.trans_offsets, self.trans_time, self.trans_from, self.trans_to]
+        total = sum(values.itemsize * len(values) for values in buffers)
+        total += sys.getsizeof(self.keys) + sum(sys.getsizeof(key) for key in self.keys)
+        return total + sum(sys.getsizeof(value) for value in self.strings)
+
+
+class SpaceSaving:
+    """Приближенный поиск самых частых элементов потока (алгоритм Space-Saving) в памяти O(capacity)
+    
+    Счетчик элемента завышен не более чем на errors[item]; любой элемент с частотой выше
+    N / capacity гарантированно остается в сводке.
+    """
+    
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        # Куча (счетчик, элемент) с ленивым удалением устаревших записей
+        self._heap = []
+    
+    def add(self, item, count=1):
+        """Учет элемента; возвращает вытесненный из сводки элемент или None"""
+        evicted = None
+        if item in self.counts:
+            self.counts[item] += count
+        elif len(self.counts) < self.capacity:
+            self.counts[item] = count
+            self.errors[item] = 0
+        else:
+            evicted, minimum = self._pop_min()
+            del self.counts[evicted]
+            del self.errors[evicted]
+            self.counts[item] = minimum + count
+            self.errors[item] = minimum
+        
+        heapq.heappush(self._heap, (self.counts[item], item))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(value, key) for key, value in self.counts.items()]
+            heapq.heapify(self._heap)
+        return evicted
+    
+    def _pop_min(self):
+        while True:
+            value, item = heapq.heappop(self._heap)
+            if self.counts.get(item) == value:
+                return item, value
+    
+    def most_common(self, n):
+        return heapq.nlargest(n, self.counts.items(), key=lambda pair: pair[1])
+
+
+class QuantileSketch:
+    """Сливаемый скетч квантилей в духе t-digest: взвешенные центроиды отсортированных значений
+    
+    Соседние значения сливаются в центроиды, пока они укладываются в единицу масштабной функции
+    k(q) = compression / pi * arcsin(2q - 1); у хвостов она круче, поэтому p99 оценивается точнее
+    медианы. Размер скетча - O(compression) независимо от числа значений, а скетчи разных
+    проектов или периодов сливаются через merge без исходных задач.
+    """
+    
+    def __init__(self, compression=100):
+        self.compression = compression
+        self.count = 0
+        self.sum = 0.0
+        self.min = float('inf')
+        self.max = float('-inf')
+        self.means = np.empty(0, dtype=np.float64)
+        self.weights = np.empty(0, dtype=np.float64)
+    
+    def add(self, values):
+        """Учет массива значений (NaN пропускаются); возвращает сам скетч"""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return self
+        self.count += len(values)
+        self.sum += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self._compress(np.concatenate([self.means, values]),
+                       np.concatenate([self.weights, np.ones(len(values))]))
+        return self
+    
+    def merge(self, other):
+        """Слияние с другим скетчем (например, другого проекта); возвращает сам скетч"""
+        if not other.count:
+            return self
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress(np.concatenate([self.means, other.means]), np.concatenate([self.weights, other.weights]))
+        return self
+    
+    def _compress(self, means, weights):
+        order = np.argsort(means, kind='stable')
+        means, weights = means[order], weights[order]
+        cumulative = np.cumsum(weights)
+        q_left = (cumulative - weights) / cumulative[-1]
+        k = self.compression / np.pi * np.arcsin(np.clip(2 * q_left - 1, -1, 1))
+        groups = np.floor(k - k[0]).astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+        self.weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / self.weights
+    
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else float('nan')
+    
+    def quantile(self, q):
+        """Оценка квантиля интерполяцией между центрами центроидов (с min и max на краях)"""
+        if not self.count:
+            return float('nan')
+        centers = np.cumsum(self.weights) - self.weights / 2
+        return float(np.interp(q * self.count, np.r_[0.0, centers, float(self.count)],
+                               np.r_[self.min, self.means, self.max]))
+    
+    def to_dict(self):
+        return {
+            'compression': self.compression,
+            'count': self.count,
+            'sum': self.sum,
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None,
+            'centroids': [[float(mean), float(weight)] for mean, weight in zip(self.means, self.weights)],
+        }
+    
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['compression'])
+        if data['count']:
+            sketch.count = data['count']
+            sketch.sum = data['sum']
+            sketch.min = data['min']
+            sketch.max = data['max']
+            centroids = np.asarray(data['centroids'], dtype=np.float64).reshape(-1, 2)
+            sketch.means, sketch.weights = centroids[:, 0].copy(), centroids[:, 1].copy()
+        return sketch
+
+
+def merge_distribution_stats(documents):
+    """Слияние выгрузок статистик распределений (проектов или периодов) по скетчам, без исходных задач
+    
+    Строки пересчитываются по слитым скетчам, поэтому квантили в результате приближенные.
+    """
+    sketches = {}
+    for document in documents:
+        for name, data in document['sketches'].items():
+            sketch = QuantileSketch.from_dict(data)
+            if name in sketches:
+                sketches[name].merge(sketch)
+            else:
+                sketches[name] = sketch
+    
+    rows = []
+    for name, sketch in sketches.items():
+        report, dimension, group = name.split('|', 2)
+        row = {'report': report, 'dimension': dimension, 'group': group, 'count': sketch.count,
+               'mean': sketch.mean, 'min': sketch.min}
+        row.update({column: sketch.quantile(q) for column, q in DISTRIBUTION_QUANTILES.items()})
+        row['max'] = sketch.max
+        rows.append(row)
+    return {'rows': rows, 'sketches': {name: sketch.to_dict() for name, sketch in sketches.items()}}
+
+
+class ClosedIssueStats:
+    """Однопроходная агрегация закрытых задач для отчетов top-users, worklog и priority
+    
+    Счетчики исполнителей, репортеров и приоритетов и часы worklog обновляются за один проход
+    по таблице или потоку задач; топ пользователей выбирается кучей (heapq.nlargest), без
+    полной сортировки. При sketch_capacity пользователи учитываются приближенно через
+    SpaceSaving, и память не растет с числом пользователей (для больших мультипроектных запусков).
+    """
+    
+    def __init__(self, top_n=30, sketch_capacity=None):
+        self.top_n = top_n
+        self.closed = 0
+        self.assignee = Counter()
+        self.reporter = Counter()
+        self.priority = Counter()
+        self.worklog_hours = array('d')
+        self.sketch = SpaceSaving(sketch_capacity) if sketch_capacity else None
+    
+    def _count_user(self, counter, user):
+        if self.sketch is not None:
+            evicted = self.sketch.add(user)
+            if evicted is not None:
+                self.assignee.pop(evicted, None)
+                self.reporter.pop(evicted, None)
+        counter[user] += 1
+    
+    def add(self, assignee, reporter, priority, timespent):
+        """Учет одной закрытой задачи"""
+        self.closed += 1
+        self._count_user(self.assignee, assignee)
+        self._count_user(self.reporter, reporter)
+        self.priority[priority] += 1
+        if timespent is not None and timespent > 0:
+            self.worklog_hours.append(timespent / 3600)
+    
+    def update_table(self, table):
+        """Учет закрытых задач таблицы build_issue_table (достаточно столбцов выбранных отчетов)"""
+        closed = table[table['is_closed']]
+        self.closed += len(closed)
+        for name, counter in (('assignee', self.assignee), ('reporter', self.reporter), ('priority', self.priority)):
+            if name not in closed:
+                continue
+            if self.sketch is not None and name != 'priority':
+                for user in closed[name].tolist():
+                    self._count_user(counter, user)
+            else:
+                counts = closed[name].value_counts(sort=False)
+                counter.update(counts[counts > 0].to_dict())
+        if 'timespent' in closed:
+            timespent = closed['timespent'].to_numpy()
+            self.worklog_hours.extend((timespent[timespent > 0] / 3600).tolist())
+    
+    def update_issues(self, issues):
+        """Учет закрытых задач из потока задач REST API или хранилища, без построения таблицы"""
+        for issue in issues:
+            values = issue_column_values(issue)
+            if values['status'] in CLOSED_STATUSES:
+                self.add(values['assignee'], values['reporter'], values['priority'], values['timespent'])
+    
+    def top_users(self):
+        """Топ-N пользователей по сумме задач исполнителя и репортера: (пользователь, исполнитель, репортер)"""
+        if self.sketch is not None:
+            users = [user for user, _ in self.sketch.most_common(self.top_n)]
+        else:
+            totals = self.assignee + self.reporter
+            # При равных суммах порядок по имени, чтобы он не зависел от порядка задач
+            users = [user for user, _ in heapq.nsmallest(self.top_n, totals.items(),
+                                                         key=lambda pair: (-pair[1], pair[0]))]
+        return [(user, self.assignee[user], self.reporter[user]) for user in users]
+    
+    def priority_counts(self):
+        """Число закрытых задач по приоритетам, по убыванию"""
+        return sorted(self.priority.items(), key=lambda pair: (-pair[1], str(pair[0])))
+
+
+class ReportAggregates:
+    """Сохраняемые между запусками агрегаты отчетов с вкладом каждой задачи
+    
+    Хранятся счетчики созданных и закрытых задач по дням, задач по исполнителям, репортерам
+    и приоритетам, а также вклад каждой задачи (даты, пользователи, время выполнения, worklog).
+    При обновлении задачи ее старый вклад вычитается, а новый прибавляется, поэтому после
+    инкрементальной синхронизации пересчет стоит O(измененных задач).
+    
+    На диске агрегаты - базовый файл JSON и журнал JSON Lines рядом с ним: после синхронизации
+    в журнал дописывается строка с новым вкладом только измененных задач. Когда в журнале
+    накапливается больше COMPACT_RATIO от числа задач, агрегаты целиком переписываются в базовый
+    файл, а журнал удаляется, так что запись в среднем тоже стоит O(измененных задач).
+    """
+    
+    VERSION = 2
+    COUNTERS = ('created', 'resolved', 'assignee', 'reporter', 'priority')
+    COMPACT_RATIO = 0.5
+    
+    def __init__(self, source=None):
+        self.source = source
+        self.contributions = {}
+        self.counters = {name: Counter() for name in self.COUNTERS}
+        # Вклад задач, измененных после последней записи, и число записей в журнале на диске
+        self.pending = {}
+        self.journal_size = 0
+    
+    def contribution(self, issue):
+        """Вклад задачи: [день создания, день закрытия, закрыта, исполнитель, репортер, приоритет,
+        время выполнения в днях, worklog в часах, статус]"""
+        values = issue_column_values(issue)
+        fields = issue['fields']
+        created = parse_jira_datetime(fields['created']) if fields.get('created') else None
+        resolved = parse_jira_datetime(fields['resolutiondate']) if fields.get('resolutiondate') else None
+        closed = values['status'] in CLOSED_STATUSES
+        lead_days = (resolved - created).total_seconds() / (24 * 3600) if closed and created and resolved else None
+        timespent = values['timespent']
+        return [
+            created.astimezone(timezone.utc).strftime('%Y-%m-%d') if created else None,
+            resolved.astimezone(timezone.utc).strftime('%Y-%m-%d') if resolved else None,
+            closed, values['assignee'], values['reporter'], values['priority'], lead_days,
+            timespent / 3600 if closed and timespent else None,
+            values['status'],
+        ]
+    
+    def _apply(self, contribution, sign):
+        created, resolved, closed, assignee, reporter, priority = contribution[:6]
+        counters = self.counters
+        for name, value in (('created', created), ('resolved', resolved)):
+            if value is not None:
+                counters[name][value] += sign
+                if not counters[name][value]:
+                    del counters[name][value]
+        if closed:
+            for name, value in (('assignee', assignee), ('reporter', reporter), ('priority', priority)):
+                counters[name][value] += sign
+                if not counters[name][value]:
+                    del counters[name][value]
+    
+    def update(self, issues):
+        """Замена вклада задач: старый вклад вычитается, новый прибавляется; возвращает число задач"""
+        count = 0
+        for issue in issues:
+            new = self.contribution(issue)
+            self._replace(issue['key'], new)
+            self.pending[issue['key']] = new
+            count += 1
+        return count
+    
+    def _replace(self, key, contribution):
+        old = self.contributions.get(key)
+        if old is not None:
+            self._apply(old, -1)
+        self._apply(contribution, 1)
+        self.contributions[key] = contribution
+    
+    @property
+    def closed(self):
+        return sum(self.counters['priority'].values())
+    
+    def daily_counts(self, name):
+        """Дни и число задач по счетчику created или resolved"""
+        counter = self.counters[name]
+        days = np.array(sorted(counter), dtype='datetime64[D]')
+        return days, np.array([counter[str(day)] for day in days], dtype=np.int64)
+    
+    def lead_times(self):
+        """Время выполнения закрытых задач в днях"""
+        return np.array([c[6] for c in self.contributions.values() if c[6] is not None], dtype=np.float64)
+    
+    def closed_stats(self, top_n=30):
+        """ClosedIssueStats для отчетов top-users, worklog и priority без прохода по задачам
+        
+        Счетчики здесь точные, поэтому приближенный SpaceSaving не используется.
+        """
+        stats = ClosedIssueStats(top_n)
+        stats.closed = self.closed
+        stats.assignee.update(self.counters['assignee'])
+        stats.reporter.update(self.counters['reporter'])
+        stats.priority.update(self.counters['priority'])
+        stats.worklog_hours.extend(c[7] for c in self.contributions.values() if c[7])
+        return stats
+    
+    def dwell_frame(self):
+        """Все задачи с ключом, приоритетом и исполнителем для измерений времени в статусах"""
+        return pd.DataFrame({
+            'key': list(self.contributions),
+            'priority': [c[5] for c in self.contributions.values()],
+            'assignee': [c[3] for c in self.contributions.values()],
+        })
+    
+    def closed_frame(self):
+        """Закрытые задачи для статистик распределений: статус, приоритет, исполнитель, время выполнения, worklog"""
+        closed = [c for c in self.contributions.values() if c[2]]
+        return pd.DataFrame({
+            'status': pd.Categorical([c[8] for c in closed]),
+            'priority': pd.Categorical([c[5] for c in closed]),
+            'assignee': pd.Categorical([c[3] for c in closed]),
+            'lead_days': pd.Series([c[6] for c in closed], dtype='float64'),
+            'worklog_hours': pd.Series([c[7] for c in closed], dtype='float64'),
+        })
+    
+    @staticmethod
+    def journal_path(path):
+        return f"{os.path.splitext(path)[0]}.jsonl"
+    
+    def save(self, path):
+        """Полная запись агрегатов в базовый файл с удалением журнала"""
+        data = {
+            'version': self.VERSION,
+            'source': self.source,
+            'counters': self.counters,
+            'contributions': self.contributions,
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        if os.path.exists(self.journal_path(path)):
+            os.remove(self.journal_path(path))
+        self.pending = {}
+        self.journal_size = 0
+    
+    def persist(self, path):
+        """Запись изменений: строка журнала с вкладом измененных задач или сжатие в базовый файл"""
+        journal_size = self.journal_size + len(self.pending)
+        if not os.path.exists(path) or journal_size > self.COMPACT_RATIO * len(self.contributions):
+            self.save(path)
+            return
+        with open(self.journal_path(path), 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'source': self.source, 'contributions': self.pending}, ensure_ascii=False))
+            f.write('\n')
+        self.pending = {}
+        self.journal_size = journal_size
+    
+    @classmethod
+    def load(cls, path):
+        """Агрегаты из базового файла и журнала или None, если файла нет, он поврежден или другой версии"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get('version') != cls.VERSION:
+            return None
+        aggregates = cls(data['source'])
+        aggregates.contributions = data['contributions']
+        aggregates.counters = {name: Counter(data['counters'][name]) for name in cls.COUNTERS}
+        
+        # Недописанная строка журнала (сбой во время записи) дает пересборку агрегатов
+        try:
+            with open(cls.journal_path(path), 'r', encoding='utf-8') as f:
+                for line in f:
+                    entry = json.loads(line)
+                    for key, contribution in entry['contributions'].items():
+                        aggregates._replace(key, contribution)
+                    aggregates.source = entry['source']
+                    aggregates.journal_size += len(entry['contributions'])
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError):
+            return None
+        return aggregates
+
+
+class IssueIndex:
+    """Встроенный индекс задач SQLite: индексированные столбцы отчетов и переходы статусов
+    
+    Отчеты выбирают из него только нужный срез (закрытые задачи за период, задачи одного
+    исполнителя и т.п.), не загружая весь проект в память. Даты хранятся строками в UTC
+    ('2024-01-31 12:00:00.000000'), поэтому сравниваются и индексируются как текст.
+    """
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS issues (
+            key TEXT PRIMARY KEY, status TEXT, priority TEXT, assignee TEXT, reporter TEXT,
+            created TEXT, updated TEXT, resolved TEXT, timespent REAL, is_closed INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS issues_status ON issues (status);
+        CREATE INDEX IF NOT EXISTS issues_priority ON issues (priority);
+        CREATE INDEX IF NOT EXISTS issues_assignee ON issues (assignee);
+        CREATE INDEX IF NOT EXISTS issues_created ON issues (created);
+        CREATE INDEX IF NOT EXISTS issues_updated ON issues (updated);
+        CREATE INDEX IF NOT EXISTS issues_closed_resolved ON issues (is_closed, resolved);
+        CREATE TABLE IF NOT EXISTS transitions (key TEXT NOT NULL, time TEXT, from_status TEXT, to_status TEXT);
+        CREATE INDEX IF NOT EXISTS transitions_key ON transitions (key);
+        CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT);
+    """
+    COLUMNS = ['key', 'status', 'priority', 'assignee', 'reporter', 'created', 'updated', 'resolved',
+               'timespent', 'is_closed']
+    CATEGORICAL = ('status', 'priority', 'assignee', 'reporter')
+    DATES = ('created', 'updated', 'resolved')
+    # Фильтры среза: имя аргумента query -> условие SQL; *_from включительно, *_to - нет
+    FILTERS = {
+        'status': 'status = ?',
+        'priority': 'priority = ?',
+        'assignee': 'assignee = ?',
+        'reporter': 'reporter = ?',
+        'closed': 'is_closed = ?',
+        'created_from': 'created >= ?',
+        'created_to': 'created < ?',
+        'updated_from': 'updated >= ?',
+        'updated_to': 'updated < ?',
+        'resolved_from': 'resolved >= ?',
+        'resolved_to': 'resolved < ?',
+    }
+    
+    def __init__(self, path):
+        self.path = path
+    
+    def connect(self):
+        """Соединение с созданной схемой; изменения фиксирует вызывающий код через commit()"""
+        conn = sqlite3.connect(self.path)
+        conn.executescript(self.SCHEMA)
+        return conn
+    
+    def get_source(self, conn):
+        row = conn.execute("SELECT value FROM meta WHERE name = 'source'").fetchone()
+        return row[0] if row else None
+    
+    def set_source(self, conn, source):
+        conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('source', ?)", (source,))
+    
+    def clear(self, conn):
+        conn.execute("DELETE FROM issues")
+        conn.execute("DELETE FROM transitions")
+    
+    def _sql_datetime(self, value):
+        if not value:
+            return None
+        return parse_jira_datetime(value).astimezone(timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f')
+    
+    def upsert(self, conn, issues):
+        """Вставка или замена задач; переходы заменяются только у задач с changelog или transitions"""
+        rows = []
+        changelog_keys = []
+        transitions = []
+        for issue in issues:
+            fields = issue['fields']
+            values = issue_column_values(issue)
+            rows.append((
+                values['key'], values['status'], values['priority'], values['assignee'], values['reporter'],
+                self._sql_datetime(fields.get('created')), self._sql_datetime(fields.get('updated')),
+                self._sql_datetime(fields.get('resolutiondate')), values['timespent'],
+                int(values['status'] in CLOSED_STATUSES),
+            ))
+            if 'changelog' in issue or 'transitions' in issue:
+                changelog_keys.append((issue['key'],))
+                transitions += [
+                    (issue['key'], self._sql_datetime(when), from_status or 'Неизвестно', to_status or 'Неизвестно')
+                    for when, from_status, to_status in status_transitions(issue)
+                ]
+        
+        conn.executemany(f"INSERT OR REPLACE INTO issues VALUES ({', '.join('?' * len(self.COLUMNS))})", rows)
+        conn.executemany("DELETE FROM transitions WHERE key = ?", changelog_keys)
+        conn.executemany("INSERT INTO transitions VALUES (?, ?, ?, ?)", transitions)
+        return len(rows)
+    
+    def _where(self, filters):
+        unknown = set(filters) - set(self.FILTERS)
+        if unknown:
+            raise ValueError(f"Неизвестные фильтры среза: {', '.join(sorted(unknown))}")
+        conditions = [self.FILTERS[name] for name in filters if filters[name] is not None]
+        params = [int(value) if isinstance(value, bool) else str(value)
+                  for value in filters.values() if value is not None]
+        return (f" WHERE {' AND '.join(conditions)}" if conditions else ''), params
+    
+    def query(self, columns=None, **filters):
+        """Срез задач в виде таблицы как у build_issue_table (только запрошенные столбцы)"""
+        columns = list(columns or self.COLUMNS)
+        where, params = self._where(filters)
+        conn = sqlite3.connect(self.path)
+        try:
+            rows = conn.execute(f"SELECT {', '.join(columns)} FROM issues{where} ORDER BY rowid", params).fetchall()
+        finally:
+            conn.close()
+        
+        values = dict(zip(columns, zip(*rows))) if rows else {name: () for name in columns}
+        table = {}
+        for name in columns:
+            column = list(values[name])
+            if name in self.CATEGORICAL:
+                table[name] = pd.Categorical(column)
+            elif name in self.DATES:
+                table[name] = pd.to_datetime(pd.Series(column, dtype=object), format='%Y-%m-%d %H:%M:%S.%f')
+            elif name == 'timespent':
+                table[name] = pd.Series(column, dtype='float64')
+            elif name == 'is_closed':
+                table[name] = pd.Series(column, dtype=bool)
+            else:
+                table[name] = pd.Series(column, dtype=object)
+        return pd.DataFrame(table, columns=columns)
+    
+    def query_transitions(self, **filters):
+        """Переходы статусов задач среза: key, time, from_status, to_status"""
+        where, params = self._where(filters)
+        conn = sqlite3.connect(self.path)
+        try:
+            rows = conn.execute(
+                "SELECT t.key, t.time, t.from_status, t.to_status FROM transitions t "
+                f"WHERE t.key IN (SELECT key FROM issues{where})", params).fetchall()
+        finally:
+            conn.close()
+        return pd.DataFrame(rows, columns=['key', 'time', 'from_status', 'to_status'], dtype=object)
 
 
 class JiraAnalytics:
-    """Класс для анализа данных из JIRA с сохранением в JSON"""
+    """Класс для анализа данных из JIRA с сохранением в JSON Lines"""
     
     def __init__(self, config_path="config.json"):
 
         self.load_config(config_path)
-        self.session = requests.Session()
-        self.output_dir = "outputs"
-        self.data_dir = "data"
-        Path(self.output_dir).mkdir(exist_ok=True)
-        Path(self.data_dir).mkdir(exist_ok=True)
-        self.issues_file = f"{self.data_dir}/issues_{self.project_key}.json"
+        self.limiter = ConnectionLimiter(self.max_connections, self.max_connections_per_host)
+        self.tracer = Tracer(self.instrumentation)
+        self._session = SharedSession(self._create_session)
+        # Размер страницы после таймаутов общий для всех диапазонов: следующие запросы начинают с него
+        self._page_size = None
+        self._page_size_lock = threading.Lock()
+        self._init_paths()
+        
+    def _init_paths(self):
+        """Папки и файлы текущего проекта"""
+        Path(self.output_dir).mkdir(parents=True, exist_ok=True)
+        Path(self.data_dir).mkdir(parents=True, exist_ok=True)
+        self.issues_file = f"{self.data_dir}/issues_{self.project_key}.jsonl"
+        self.meta_file = f"{self.data_dir}/issues_{self.project_key}.meta.json"
+        self.legacy_issues_file = f"{self.data_dir}/issues_{self.project_key}.json"
+        self.chart_manifest_file = f"{self.output_dir}/manifest.json"
+        self.snapshots_dir = f"{self.data_dir}/snapshots/{self.project_key}"
+        self.columnar_file = f"{self.data_dir}/issues_{self.project_key}.npz"
+        self.index_file = f"{self.data_dir}/issues_{self.project_key}.sqlite"
+        self.issue_index = IssueIndex(self.index_file)
+        self.aggregates_file = f"{self.data_dir}/issues_{self.project_key}.aggregates.json"
+        self.shards_dir = f"{self.data_dir}/shards/{self.project_key}"
+        self._aggregates = None
+        self.last_sync_stats = None
+        self.last_distribution_stats = None
+        self.last_render_summary = None
+    
+    @property
+    def session(self):
+        """HTTP-сессия, создаваемая при первом запросе (requests импортируется только для работы с сетью)"""
+        return self._session.get()
+    
+    def _create_session(self):
+        """HTTP-сессия с keep-alive пулом соединений под число одновременных запросов"""
+        pool_size = max(self.max_workers, self.max_connections_per_host)
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+    
+    def for_project(self, project_key):
+        """Экземпляр для другого проекта с общими сессией и ограничителем соединений"""
+        # Копия разделяет объект SharedSession: сессия создается один раз и только при первом запросе
+        analytics = copy.copy(self)
+        analytics.project_key = project_key
+        analytics.output_dir = f"{self.output_dir}/{project_key}"
+        analytics._init_paths()
+        return analytics
+    
+    def for_snapshot(self, name):
+        """Экземпляр, читающий сохраненный снимок хранилища; графики пишутся в outputs/snapshots/<name>"""
+        snapshot_dir = f"{self.snapshots_dir}/{name}"
+        if not os.path.isdir(snapshot_dir):
+            raise StoreError(f"Снимок {name} не найден в {self.snapshots_dir}")
+        
+        analytics = copy.copy(self)
+        analytics.output_dir = f"{self.output_dir}/snapshots/{name}"
+        analytics._init_paths()
+        analytics.issues_file = f"{snapshot_dir}/{os.path.basename(self.issues_file)}"
+        analytics.meta_file = f"{snapshot_dir}/{os.path.basename(self.meta_file)}"
+        analytics.legacy_issues_file = f"{snapshot_dir}/{os.path.basename(self.legacy_issues_file)}"
+        analytics.columnar_file = f"{snapshot_dir}/{os.path.basename(self.columnar_file)}"
+        analytics.index_file = f"{snapshot_dir}/{os.path.basename(self.index_file)}"
+        analytics.issue_index = IssueIndex(analytics.index_file)
+        analytics.aggregates_file = f"{snapshot_dir}/{os.path.basename(self.aggregates_file)}"
+        # Снимок исторический по определению, его возраст не проверяется
+        analytics.max_staleness_hours = None
+        analytics.keep_snapshots = 0
+        return analytics
+    
+    def load_config(self, config_path):
+
+        try:
+            with open(config_path, 'r') as f:
+                config = json.load(f)
+            self.jira_server = config['jira_server']
+            self.project_key = config['project_key']
+            self.max_results = config.get('max_results', 1000)
+            self.project_keys = config.get('project_keys') or [self.project_key]
+            self.max_workers = config.get('max_workers', 4)
+            self.max_connections = config.get('max_connections', 16)
+            self.max_connections_per_host = config.get('max_connections_per_host', 8)
+            self.request_timeout = config.get('request_timeout', 30)
+            self.max_retries = config.get('max_retries', 5)
+            self.backoff_base = config.get('backoff_base', 1.0)
+            self.backoff_max = config.get('backoff_max', 60.0)
+            self.adaptive_page_size = config.get('adaptive_page_size', True)
+            self.min_page_size = config.get('min_page_size', 25)
+            self.render_workers = config.get('render_workers') or os.cpu_count() or 1
+            self.chart_cache = config.get('chart_cache', True)
+            self.chart_formats = config.get('chart_formats') or ['png']
+            self.chart_dpi = config.get('chart_dpi', CHART_DPI)
+            self.chart_preview_dpi = config.get('chart_preview_dpi')
+            self.chart_bundle = config.get('chart_bundle')
+            self.status_layout = config.get('status_layout', 'separate')
+            self.changelog_batch_size = config.get('changelog_batch_size', 50)
+            self.full_refresh = config.get('full_refresh', False)
+            self.incremental_overlap_hours = config.get('incremental_overlap_hours', 24)
+            self.output_dir = config.get('output_dir', 'outputs')
+            self.data_dir = config.get('data_dir', 'data')
+            self.offline = config.get('offline', False)
+            self.max_staleness_hours = config.get('max_staleness_hours', 24)
+            self.keep_snapshots = config.get('keep_snapshots', 0)
+            self.columnar_snapshot = config.get('columnar_snapshot', True)
+            self.sqlite_index = config.get('sqlite_index', False)
+            self.top_users_count = config.get('top_users_count', 30)
+            self.top_users_sketch_capacity = config.get('top_users_sketch_capacity')
+            self.report_filters = config.get('report_filters') or {}
+            self.incremental_aggregates = config.get('incremental_aggregates', False)
+            self.instrumentation = config.get('instrumentation', True)
+            self.trace_file = config.get('trace_file', f"{self.output_dir}/trace.json")
+            self.shard_sync = config.get('shard_sync', False)
+            self.shard_months = config.get('shard_months', 3)
+            self.shard_max_issues = config.get('shard_max_issues', 5000)
+            self.shard_workers = config.get('shard_workers', 4)
+            self.shard_plan_max_age_hours = config.get('shard_plan_max_age_hours', 24)
+            self.distribution_stats = config.get('distribution_stats', True)
+            self.daemon_interval = config.get('daemon_interval', 300)
+            self.daemon_host = config.get('daemon_host', '127.0.0.1')
+            self.daemon_port = config.get('daemon_port', 8765)
+            logger.info(f"Конфигурация загружена: проект {self.project_key}")
+        except Exception as e:
+            logger.error(f"Ошибка загрузки конфигурации: {e}")
+            raise
+    
+    def _write_store(self, issues, profile='full', unchanged=None):
+        """Потоковая запись задач в хранилище JSON Lines с метаданными; ошибки пробрасываются
+        
+        unchanged - проверка после записи всех задач: если она вернула True, прежний файл
+        хранилища остается нетронутым (его отметка не меняется), а в метаданных обновляется
+        только lastUpdated.
+        """
+        with self.tracer.span('store.write', 'io') as span, IssueStoreWriter(self.issues_file) as writer:
+            for issue in issues:
+                writer.write(issue)
+            span['issues'] = writer.count
+            writer.discard = unchanged is not None and unchanged()
+        
+        if writer.discard:
+            self._write_meta(dict(self.load_store_meta() or {}, lastUpdated=datetime.now().isoformat()))
+            logger.info("Изменений нет, хранилище не перезаписывается")
+            return writer.count
+        
+        meta = {
+            "project": self.project_key,
+            "lastUpdated": datetime.now().isoformat(),
+            "totalIssues": writer.count,
+            "watermark": writer.watermark,
+            "profile": profile,
+            "format": "jsonl"
+        }
+        self._write_meta(meta)
+        return writer.count
+    
+    def _write_meta(self, meta):
+        """Запись метаданных через временный файл и os.replace: жесткие ссылки снимков сохраняют прежний файл"""
+        tmp_path = f"{self.meta_file}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.meta_file)
+    
+    def save_issues_to_json(self, issues):
+
+        try:
+            count = self._write_store(issues)
+            logger.info(f"Задачи сохранены в {self.issues_file} ({count} задач)")
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка сохранения задач в JSON: {e}")
+            return False
+    
+    def import_legacy_store(self):
+        """Импорт хранилища старого формата (один JSON-документ) в JSON Lines"""
+        if not os.path.exists(self.legacy_issues_file):
+            return False
+        
+        logger.info(f"Импорт хранилища старого формата {self.legacy_issues_file}...")
+        with open(self.legacy_issues_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return self.save_issues_to_json(data['issues'])
+    
+    def iter_issues(self):
+        """Потоковое чтение хранилища: задачи выдаются по одной, без загрузки файла целиком"""
+        if not os.path.exists(self.issues_file) and not self.import_legacy_store():
+            logger.warning(f"Файл {self.issues_file} не найден")
+            return
+        
+        with open(self.issues_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    
+    def load_issues_from_json(self):
+
+        try:
+            issues = list(self.iter_issues())
+        except Exception as e:
+            logger.error(f"Ошибка загрузки задач из JSON: {e}")
+            return None
+        
+        if not issues:
+            return None
+        logger.info(f"Загружено {len(issues)} задач из {self.issues_file}")
+        return issues
+    
+    def load_store_meta(self):
+        """Метаданные локального хранилища или None, если хранилища нет"""
+        if not os.path.exists(self.issues_file) and not self.import_legacy_store():
+            return None
+        
+        try:
+            with open(self.meta_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Метаданные хранилища недоступны ({e}), отметка будет вычислена по задачам")
+            return {}
+    
+    def list_snapshots(self):
+        """Имена сохраненных снимков хранилища от старых к новым"""
+        if not os.path.isdir(self.snapshots_dir):
+            return []
+        return sorted(name for name in os.listdir(self.snapshots_dir)
+                      if os.path.isdir(os.path.join(self.snapshots_dir, name)))
+    
+    def save_snapshot(self):
+        """Снимок текущего хранилища в data/snapshots/<PROJECT>/<время>; хранятся keep_snapshots последних
+        
+        Хранилище и метаданные всегда перезаписываются через os.replace (новый inode), поэтому
+        снимку достаточно жестких ссылок на файлы; копия делается, только если ФС не поддерживает ссылки.
+        """
+        stamp = datetime.now().strftime('%Y%m%dT%H%M%S')
+        name, suffix = stamp, 1
+        while os.path.exists(f"{self.snapshots_dir}/{name}"):
+            suffix += 1
+            name = f"{stamp}-{suffix}"
+        snapshot_dir = f"{self.snapshots_dir}/{name}"
+        Path(snapshot_dir).mkdir(parents=True)
+        
+        for path in (self.issues_file, self.meta_file):
+            target = f"{snapshot_dir}/{os.path.basename(path)}"
+            try:
+                os.link(path, target)
+            except OSError:
+                shutil.copy2(path, target)
+        
+        for old_name in self.list_snapshots()[:-self.keep_snapshots]:
+            shutil.rmtree(f"{self.snapshots_dir}/{old_name}", ignore_errors=True)
+        logger.info(f"Снимок хранилища сохранен: {snapshot_dir}")
+        return name
+    
+    def validate_store(self, profile='full'):
+        """Проверка хранилища перед работой без сети: наличие, профиль и возраст (max_staleness_hours)"""
+        meta = self.load_store_meta()
+        if meta is None:
+            raise StoreError(f"Локальное хранилище {self.issues_file} не найдено, нужна синхронизация")
+        if profile == 'full' and meta.get('profile', 'full') != 'full':
+            raise StoreError(f"Хранилище {self.issues_file} загружено без changelog (профиль {meta['profile']}), "
+                             f"а выбранным отчетам он нужен")
+        
+        if self.max_staleness_hours is not None:
+            if meta.get('lastUpdated'):
+                last_updated = datetime.fromisoformat(meta['lastUpdated'])
+            else:
+                last_updated = datetime.fromtimestamp(os.path.getmtime(self.issues_file))
+            age = datetime.now() - last_updated
+            if age > timedelta(hours=self.max_staleness_hours):
+                raise StoreError(f"Хранилище {self.issues_file} устарело: последняя синхронизация "
+                                 f"{last_updated:%Y-%m-%d %H:%M}, допустимо не старше {self.max_staleness_hours} ч")
+        return meta
+    
+    def store_stats(self):
+        """Сводка по локальному хранилищу без чтения задач: метаданные, снимки и размеры файлов"""
+        meta = self.load_store_meta()
+        files = {
+            'store': self.issues_file,
+            'columnar': self.columnar_file,
+            'index': self.index_file,
+            'aggregates': self.aggregates_file,
+            'aggregates_journal': ReportAggregates.journal_path(self.aggregates_file),
+        }
+        return {
+            'project': self.project_key,
+            'exists': meta is not None,
+            'totalIssues': (meta or {}).get('totalIssues'),
+            'watermark': (meta or {}).get('watermark'),
+            'lastUpdated': (meta or {}).get('lastUpdated'),
+            'profile': (meta or {}).get('profile'),
+            'snapshots': self.list_snapshots(),
+            'fileSizes': {name: os.path.getsize(path) for name, path in files.items() if os.path.exists(path)},
+        }
+    
+    def _store_source(self):
+        """Отметка файла хранилища (размер и время изменения) для проверки актуальности снимка"""
+        stat = os.stat(self.issues_file)
+        return f"{stat.st_size}:{stat.st_mtime_ns}"
+    
+    @traced('columnar.write', 'io')
+    def write_columnar_snapshot(self):
+        """Колоночный снимок хранилища за один потоковый проход: таблица задач и переходы статусов"""
+        source = self._store_source()
+        issues = CompactIssues(self.iter_issues())
+        table = self.build_issue_table(issues)
+        snapshot = ColumnarSnapshot(self.columnar_file)
+        snapshot.write(table, issues.transitions(), source)
+        logger.info(f"Колоночный снимок сохранен: {self.columnar_file} ({len(table)} задач)")
+        return snapshot
+    
+    def open_columnar_snapshot(self):
+        """Актуальный колоночный снимок хранилища; устаревший или отсутствующий снимок строится заново
+        
+        Возвращает None, если снимки отключены (columnar_snapshot) или хранилища нет.
+        """
+        if not self.columnar_snapshot:
+            return None
+        if not os.path.exists(self.issues_file) and not self.import_legacy_store():
+            return None
+        
+        snapshot = ColumnarSnapshot(self.columnar_file)
+        try:
+            if snapshot.exists() and snapshot.source == self._store_source():
+                return snapshot
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Колоночный снимок {self.columnar_file} не читается ({e}), будет построен заново")
+        return self.write_columnar_snapshot()
+    
+    def _index_is_current(self):
+        """Построен ли индекс SQLite по текущему файлу хранилища"""
+        if not os.path.exists(self.index_file) or not os.path.exists(self.issues_file):
+            return False
+        conn = self.issue_index.connect()
+        try:
+            return self.issue_index.get_source(conn) == self._store_source()
+        finally:
+            conn.close()
+    
+    @contextmanager
+    def _index_updates(self, keys=None, enabled=True):
+        """Обертка потока задач, которая upsert-ит их в индекс SQLite по мере прохождения страниц
+        
+        keys=None - индекс перестраивается целиком, иначе обновляются только задачи с этими
+        ключами. Транзакция фиксируется после выхода из блока, т.е. после записи хранилища;
+        при ошибке индекс остается прежним, как и само хранилище.
+        """
+        if not enabled:
+            yield lambda issues: issues
+            return
+        
+        conn = self.issue_index.connect()
+        window = self.changelog_batch_size * self.max_workers
+        
+        def upsert_pages(issues):
+            batch = []
+            for issue in issues:
+                if keys is None or issue['key'] in keys:
+                    batch.append(issue)
+                    if len(batch) >= window:
+                        self.issue_index.upsert(conn, batch)
+                        batch = []
+                yield issue
+            if batch:
+                self.issue_index.upsert(conn, batch)
+        
+        try:
+            if keys is None:
+                self.issue_index.clear(conn)
+            yield upsert_pages
+            # Хранилище не перезаписано и обновлять нечего - индекс не трогаем
+            source = self._store_source()
+            if keys is None or keys or self.issue_index.get_source(conn) != source:
+                self.issue_index.set_source(conn, source)
+                conn.commit()
+        finally:
+            conn.close()
+    
+    def open_issue_index(self):
+        """Индекс SQLite, актуальный для хранилища; отставший индекс перестраивается одним проходом"""
+        if not os.path.exists(self.issues_file) and not self.import_legacy_store():
+            return None
+        if not self._index_is_current():
+            logger.info(f"Построение индекса SQLite {self.index_file}...")
+            with self.tracer.span('index.build', 'io'), self._index_updates() as index_issues:
+                for _ in index_issues(self.iter_issues()):
+                    pass
+        return self.issue_index
+    
+    def query_issues(self, columns=None, **filters):
+        """Срез задач из индекса SQLite, например query_issues(closed=True, resolved_from='2024-01-01')
+        
+        Фильтры - IssueIndex.FILTERS; таблица совместима с charts_* и plot_* (build_issue_table).
+        """
+        index = self.open_issue_index()
+        if index is None:
+            raise StoreError(f"Локальное хранилище {self.issues_file} не найдено, нужна синхронизация")
+        with self.tracer.span('index.query', 'io', filters=filters) as span:
+            table = index.query(columns, **filters)
+            span['issues'] = len(table)
+        return table
+    
+    def status_intervals_for_slice(self, as_of=None, **filters):
+        """Интервалы статусов только для задач среза из индекса SQLite"""
+        table = self.query_issues(REPORTS['time-in-status']['columns'], **filters)
+        table = table[table['created'].notna()].reset_index(drop=True)
+        if table.empty:
+            return pd.DataFrame(columns=INTERVAL_COLUMNS)
+        
+        transitions = self.issue_index.query_transitions(**filters)
+        row_of_key = pd.Series(np.arange(len(table)), index=table['key'])
+        transitions = transitions[transitions['key'].isin(row_of_key.index)]
+        return self._compute_status_intervals(
+            table['key'].to_numpy(dtype=object), table['status'].to_numpy(dtype=object),
+            table['created'].to_numpy(), table['updated'].to_numpy(),
+            row_of_key[transitions['key']].to_numpy(dtype=np.int64),
+            pd.to_datetime(transitions['time'], format='%Y-%m-%d %H:%M:%S.%f').to_numpy(),
+            transitions['from_status'].to_numpy(dtype=object), transitions['to_status'].to_numpy(dtype=object),
+            as_of)
+    
+    def _load_current_aggregates(self):
+        """Сохраненные агрегаты отчетов, если они построены по текущему файлу хранилища, иначе None
+        
+        Последние агрегаты держатся в памяти, поэтому повторные вызовы (например, в режиме
+        демона) не перечитывают файл, пока хранилище не изменилось.
+        """
+        if not os.path.exists(self.issues_file):
+            return None
+        source = self._store_source()
+        if self._aggregates is not None and self._aggregates.source == source:
+            return self._aggregates
+        aggregates = ReportAggregates.load(self.aggregates_file)
+        if aggregates is None or aggregates.source != source:
+            return None
+        self._aggregates = aggregates
+        return aggregates
+    
+    @contextmanager
+    def _aggregate_updates(self, keys=None, enabled=True):
+        """Обертка потока задач, которая пересчитывает вклад задач в агрегаты отчетов по мере записи
+        
+        keys=None - агрегаты строятся заново, иначе пересчитывается вклад только задач с этими
+        ключами; если сохраненные агрегаты отстали от хранилища, они тоже строятся заново.
+        После выхода из блока (т.е. после записи хранилища) вклад измененных задач дописывается
+        в журнал агрегатов, а пересобранные агрегаты записываются целиком.
+        """
+        if not enabled:
+            yield lambda issues: issues
+            return
+        
+        aggregates = self._load_current_aggregates() if keys is not None else None
+        if aggregates is None:
+            aggregates, keys = ReportAggregates(), None
+        
+        def update_issues(issues):
+            for issue in issues:
+                if keys is None or issue['key'] in keys:
+                    aggregates.update([issue])
+                yield issue
+        
+        # Агрегаты в памяти меняются по ходу записи, поэтому при ошибке их нельзя переиспользовать
+        self._aggregates = None
+        with self.tracer.span('aggregates.update', 'io') as span:
+            yield update_issues
+            source = self._store_source()
+            if keys is not None and not aggregates.pending and aggregates.source == source:
+                # Хранилище не перезаписано, измененных задач нет - файл агрегатов не трогаем
+                span['issues'] = 0
+                self._aggregates = aggregates
+                return
+            aggregates.source = source
+            if keys is None:
+                aggregates.save(self.aggregates_file)
+            else:
+                aggregates.persist(self.aggregates_file)
+            span['issues'] = len(aggregates.contributions) if keys is None else len(keys)
+        self._aggregates = aggregates
+    
+    def open_report_aggregates(self):
+        """Агрегаты отчетов, актуальные для хранилища; отставшие агрегаты строятся заново одним проходом
+        
+        Возвращает None, если агрегаты отключены (incremental_aggregates) или хранилища нет.
+        """
+        if not self.incremental_aggregates:
+            return None
+        if not os.path.exists(self.issues_file) and not self.import_legacy_store():
+            return None
+        
+        aggregates = self._load_current_aggregates()
+        if aggregates is None:
+            logger.info(f"Построение агрегатов отчетов {self.aggregates_file}...")
+            aggregates = ReportAggregates(self._store_source())
+            with self.tracer.span('aggregates.build', 'io') as span:
+                span['issues'] = aggregates.update(self.iter_issues())
+            aggregates.save(self.aggregates_file)
+            self._aggregates = aggregates
+        return aggregates
+    
+    def get_store_watermark(self, meta):
+        """Отметка последнего обновления хранилища: максимальный fields.updated или lastUpdated"""
+        if meta.get('watermark'):
+            return parse_jira_datetime(meta['watermark']).astimezone(timezone.utc)
+        
+        updated_values = [
+            parse_jira_datetime(issue['fields']['updated']) for issue in self.iter_issues()
+            if issue.get('fields', {}).get('updated')
+        ]
+        if updated_values:
+            return max(updated_values).astimezone(timezone.utc)
+        
+        # lastUpdated записан по локальным часам, поэтому это лишь запасной вариант
+        last_updated = meta.get('lastUpdated')
+        if last_updated:
+            return datetime.fromisoformat(last_updated).replace(tzinfo=timezone.utc)
+        return None
+    
+    def build_incremental_jql(self, watermark):
+        """JQL для задач, обновленных начиная с отметки (с запасом на расхождение часовых поясов)"""
+        since = watermark - timedelta(hours=self.incremental_overlap_hours)
+        return f'project = {self.project_key} AND updated >= "{since.strftime("%Y/%m/%d %H:%M")}"'
+    
+    def merge_issues(self, stored_issues, fetched_issues, stats, changed_keys=None):
+        """Слияние по ключу за один проход: сохраненные задачи читаются потоком, в памяти только изменения
+        
+        В changed_keys (если передан) ключи новых и измененных задач добавляются до того, как
+        задача отдается дальше по потоку.
+        """
+        fetched = {issue['key']: issue for issue in fetched_issues}
+        if changed_keys is None:
+            changed_keys = set()
+        
+        for issue in stored_issues:
+            fresh = fetched.pop(issue['key'], None)
+            if fresh is not None and fresh['fields'].get('updated') != issue['fields'].get('updated'):
+                stats['changed'] += 1
+                changed_keys.add(issue['key'])
+                yield fresh
+            else:
+                stats['unchanged'] += 1
+                yield issue
         
-    def load_config(self, config_path):
-
-        try:
-            with open(config_path, 'r') as f:
-                config = json.load(f)
-            self.jira_server = config['jira_server']
-            self.project_key = config['project_key']
-            self.max_results = config.get('max_results', 1000)
-            logger.info(f"Конфигурация загружена: проект {self.project_key}")
-        except Exception as e:
-            logger.error(f"Ошибка загрузки конфигурации: {e}")
-            raise
+        for issue in fetched.values():
+            stats['new'] += 1
+            changed_keys.add(issue['key'])
+            yield issue
     
-    def save_issues_to_json(self, issues):
-
-        try:
-            data = {
-                "project": self.project_key,
-                "lastUpdated": datetime.now().isoformat(),
-                "totalIssues": len(issues),
-                "issues": issues
-            }
-            with open(self.issues_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-            logger.info(f"Задачи сохранены в {self.issues_file} ({len(issues)} задач)")
-            return True
-        except Exception as e:
-            logger.error(f"Ошибка сохранения задач в JSON: {e}")
-            return False
+    def _backoff_delay(self, attempt):
+        """Экспоненциальная задержка с полным случайным разбросом"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
     
-    def load_issues_from_json(self):
-
+    def _parse_retry_after(self, value):
+        """Значение заголовка Retry-After в секундах (число или HTTP-дата)"""
+        if not value:
+            return None
         try:
-            if not os.path.exists(self.issues_file):
-                logger.warning(f"Файл {self.issues_file} не найден")
-                return None
-            
-            with open(self.issues_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            logger.info(f"Загружено {data['totalIssues']} задач из {self.issues_file}")
-            return data['issues']
-        except Exception as e:
-            logger.error(f"Ошибка загрузки задач из JSON: {e}")
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
             return None
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
     
-    def get_issues(self, jql):
-        all_issues = []
-        start_at = 0
+    def _request_page(self, jql, start_at, max_results, profile='full'):
+        """Запрос одной страницы с повторами при ошибках сети, 429 и 5xx"""
+        params = {
+            'jql': jql,
+            'startAt': start_at,
+            'maxResults': max_results,
+        }
+        params.update(FETCH_PROFILES[profile])
+        # Таймаут большой страницы отдаем вызывающему коду, чтобы он уменьшил maxResults
+        shrinkable = self.adaptive_page_size and max_results > self.min_page_size
         
-        while True:
-            params = {
-                'jql': jql,
-                'startAt': start_at,
-                'maxResults': self.max_results,
-                'fields': 'key,created,updated,status,resolutiondate,assignee,reporter,timespent,priority,changelog',
-                'expand': 'changelog'
-            }
+        for attempt in range(self.max_retries + 1):
+            delay = None
+            try:
+                url = f"{self.jira_server}/rest/api/2/search"
+                with self.tracer.span('http.page', 'network', startAt=start_at, maxResults=max_results) as span:
+                    with self.limiter.slot(url):
+                        response = self.session.get(url, params=params, timeout=self.request_timeout)
+                    span['status'] = response.status_code
+                    span['bytes'] = len(response.content)
+            except requests.Timeout as e:
+                if shrinkable:
+                    raise
+                error = e
+            except requests.ConnectionError as e:
+                error = e
+            else:
+                if response.status_code not in RETRY_STATUS_CODES:
+                    try:
+                        response.raise_for_status()
+                    except requests.HTTPError as e:
+                        raise JiraSyncError(f"Страница startAt={start_at} отклонена сервером: {e}") from e
+                    with self.tracer.span('http.decode', 'network') as span:
+                        data = response.json()
+                        span['issues'] = len(data.get('issues', []))
+                    return data
+                error = f"HTTP {response.status_code}"
+                delay = self._parse_retry_after(response.headers.get('Retry-After'))
             
+            if attempt == self.max_retries:
+                break
+            if delay is None:
+                delay = self._backoff_delay(attempt)
+            logger.warning(f"Страница startAt={start_at}: {error}, повтор {attempt + 1}/{self.max_retries} через {delay:.1f} с")
+            time.sleep(delay)
+        
+        raise JiraSyncError(f"Не удалось получить страницу startAt={start_at} после {self.max_retries} повторов: {error}")
+    
+    def _fetch_range(self, jql, start_at, count, fill=True, profile='full'):
+        """Получение задач [start_at, start_at + count) с уменьшением страницы при таймаутах
+        
+        При fill=False диапазон заканчивается на первой неполной странице: так первый
+        запрос узнает, сколько задач сервер реально отдает за раз.
+        """
+        issues = []
+        total = None
+        
+        while len(issues) < count:
+            offset = start_at + len(issues)
+            with self._page_size_lock:
+                page_size = self._page_size or count
+            requested = min(page_size, count - len(issues))
             try:
-                response = self.session.get(f"{self.jira_server}/rest/api/2/search", params=params, timeout=30)
-                response.raise_for_status()
-                data = response.json()
-                issues = data['issues']
-                all_issues.extend(issues)
-                logger.info(f"Получено {len(issues)} задач (всего: {len(all_issues)})")
-                
-                if start_at + len(issues) >= data['total']:
-                    break
-                start_at += len(issues)
-            except Exception as e:
-                logger.error(f"Ошибка получения задач: {e}")
+                data = self._request_page(jql, offset, requested, profile)
+            except requests.Timeout:
+                self._shrink_page_size(requested, offset)
+                continue
+            
+            issues.extend(data['issues'])
+            total = data['total']
+            if not data['issues'] or start_at + len(issues) >= total:
                 break
+            if not fill and len(data['issues']) < requested:
+                break
+        
+        return issues, total
+    
+    def _shrink_page_size(self, requested, offset):
+        """Уменьшение общего размера страницы вдвое после таймаута запроса requested задач"""
+        with self._page_size_lock:
+            page_size = max(self.min_page_size, requested // 2)
+            # Параллельные диапазоны могли уже уменьшить страницу сильнее
+            if self._page_size is None or page_size < self._page_size:
+                self._page_size = page_size
+            page_size = self._page_size
+        logger.warning(f"Таймаут на странице startAt={offset}, maxResults уменьшен до {page_size}")
+    
+    def iter_issue_pages(self, jql, profile='full'):
+        """Страницы задач по JQL в порядке startAt; при неустранимой ошибке выбрасывает JiraSyncError"""
+        first_page, total = self._fetch_range(jql, 0, self.max_results, fill=False, profile=profile)
+        fetched = len(first_page)
+        logger.info(f"Получено {len(first_page)} задач (всего: {fetched} из {total})")
+        yield first_page
+        
+        if not first_page or fetched >= total:
+            return
         
+        # Сервер может урезать maxResults, поэтому шаг берем по фактически полной первой странице
+        page_size = len(first_page)
+        offsets = iter(range(page_size, total, page_size))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            # Окно запрошенных страниц ограничено, чтобы память не росла с размером проекта
+            pending = deque(
+                executor.submit(self._fetch_range, jql, start_at, page_size, True, profile)
+                for start_at in islice(offsets, 2 * self.max_workers)
+            )
+            try:
+                while pending:
+                    issues, _ = pending.popleft().result()
+                    for start_at in islice(offsets, 1):
+                        pending.append(executor.submit(self._fetch_range, jql, start_at, page_size, True, profile))
+                    fetched += len(issues)
+                    logger.info(f"Получено {len(issues)} задач (всего: {fetched} из {total})")
+                    yield issues
+            finally:
+                for future in pending:
+                    future.cancel()
+    
+    @traced('get_issues', 'network')
+    def get_issues(self, jql, profile='full'):
+        """Загрузка всех задач по JQL списком"""
+        all_issues = []
+        for issues in self.iter_issue_pages(jql, profile):
+            all_issues.extend(issues)
         return all_issues
     
-    def prepare_data(self):
-
+    def _fetch_changelogs(self, keys):
+        """changelog задач по списку ключей: пакеты key in (...) запрашиваются параллельно"""
+        batches = [keys[i:i + self.changelog_batch_size] for i in range(0, len(keys), self.changelog_batch_size)]
+        
+        def fetch_batch(batch):
+            issues, _ = self._fetch_range(f"key in ({','.join(batch)})", 0, len(batch), profile='changelog')
+            return issues
+        
+        changelogs = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for issues in executor.map(fetch_batch, batches):
+                for issue in issues:
+                    changelogs[issue['key']] = issue.get('changelog', {'histories': []})
+        return changelogs
+    
+    def _attach_changelogs(self, issues):
+        """Дозагрузка changelog только для задач, у которых его нет (новые, измененные, загруженные без истории)
+        
+        Задачи обрабатываются окнами, поэтому в памяти одновременно находится ограниченное их число.
+        """
+        issues = iter(issues)
+        window = self.changelog_batch_size * self.max_workers
+        fetched = 0
+        while True:
+            chunk = list(islice(issues, window))
+            if not chunk:
+                break
+            missing = [issue['key'] for issue in chunk if 'changelog' not in issue]
+            if missing:
+                changelogs = self._fetch_changelogs(missing)
+                for issue in chunk:
+                    if issue['key'] in changelogs:
+                        issue['changelog'] = changelogs[issue['key']]
+                fetched += len(changelogs)
+            yield from chunk
+        
+        if fetched:
+            logger.info(f"Дозагружен changelog для {fetched} задач")
+    
+    @traced('sync_store')
+    def sync_store(self, full_refresh=None, profile='full'):
+        """Синхронизация хранилища с JIRA; страницы пишутся на диск по мере поступления
+        
+        Поиск идет по профилю lean; при profile='full' changelog догружается только тем задачам,
+        у которых его нет. Исключение - полная перезагрузка с full: там changelog дешевле получить
+        сразу через expand=changelog в поиске.
+        """
+        if full_refresh is None:
+            full_refresh = self.full_refresh
+        
+        meta = None if full_refresh else self.load_store_meta()
+        watermark = self.get_store_watermark(meta) if meta is not None else None
+        stats = {'new': 0, 'changed': 0, 'unchanged': 0}
+        unchanged = None
+        
+        if watermark is not None:
+            logger.info(f"Инкрементальная синхронизация: задачи, обновленные после {watermark}")
+            changed_issues = self.get_issues(self.build_incremental_jql(watermark), profile='lean')
+            # Без changelog для всего хранилища (lean -> full) файл переписывается только при новых
+            # или измененных задачах; запрос с перекрытием почти всегда возвращает последние задачи
+            # хранилища, поэтому решение принимается по итогу слияния, а не по пустому ответу
+            attach_all = profile == 'full' and meta.get('profile') != 'full'
+            if not changed_issues and not attach_all:
+                stats['unchanged'] = meta.get('totalIssues', 0)
+                return stats
+            
+            def unchanged():
+                return not attach_all and not stats['new'] and not stats['changed']
+            
+            # Индекс и агрегаты, построенные по текущему хранилищу, достаточно дополнить новыми и
+            # измененными задачами; множество заполняется слиянием раньше, чем задача дойдет до них
+            changed_keys = set()
+            index_keys = None
+            if meta.get('profile') == profile and self.sqlite_index and self._index_is_current():
+                index_keys = changed_keys
+            issues = self.merge_issues(self.iter_issues(), changed_issues, stats, changed_keys)
+        elif self.shard_sync:
+            logger.info(f"Получение всех задач по окнам created (профиль {profile})...")
+            issues = self.iter_sharded_issues(profile)
+            index_keys = changed_keys = None
+        else:
+            logger.info(f"Получение всех задач для анализа (профиль {profile})...")
+            pages = self.iter_issue_pages(f'project = {self.project_key}', profile)
+            issues = (issue for page in pages for issue in page)
+            index_keys = changed_keys = None
+        
+        if profile == 'full':
+            issues = self._attach_changelogs(issues)
+        with self._index_updates(index_keys, enabled=self.sqlite_index) as index_issues, \
+                self._aggregate_updates(changed_keys, enabled=self.incremental_aggregates) as aggregate_issues:
+            count = self._write_store(aggregate_issues(index_issues(issues)), profile, unchanged)
+        if unchanged is not None and unchanged():
+            return stats
+        if watermark is None:
+            stats['new'] = count
+            if self.shard_sync:
+                shutil.rmtree(self.shards_dir, ignore_errors=True)
+        if self.keep_snapshots:
+            self.save_snapshot()
+        
+        logger.info(f"Задачи сохранены в {self.issues_file}")
+        return stats
+    
+    def _created_jql(self, start, end):
+        """JQL задач проекта, созданных в окне [start, end); datetime.min и datetime.max - открытые границы"""
+        conditions = [f'project = {self.project_key}']
+        if start != datetime.min:
+            conditions.append(f'created >= "{start:%Y/%m/%d %H:%M}"')
+        if end != datetime.max:
+            conditions.append(f'created < "{end:%Y/%m/%d %H:%M}"')
+        return f"{' AND '.join(conditions)} ORDER BY created ASC"
+    
+    def plan_shards(self):
+        """Окна created по shard_months месяцев; окна больше shard_max_issues задач делятся пополам
+        
+        Число задач окна узнается запросом с maxResults=0, окна одного уровня проверяются
+        параллельно. Возвращает список (начало, конец, задач) только для непустых окон.
+        Границы считаются в UTC, а JIRA читает даты JQL в часовом поясе пользователя, поэтому
+        нижняя граница первого окна и верхняя граница последнего открыты (datetime.min и
+        datetime.max): сдвиг пояса не теряет задачи на краях. Внутренние границы общие у
+        соседних окон, и сдвиг лишь перекладывает задачи из одного окна в другое.
+        """
+        first = self._request_page(f'project = {self.project_key} ORDER BY created ASC', 0, 1, 'lean')['issues']
+        if not first:
+            return []
+        
+        start = parse_jira_datetime(first[0]['fields']['created']).astimezone(timezone.utc)
+        start = start.replace(day=1, hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+        # Конец последнего окна - завтрашняя полночь; созданное позже заберет инкрементальная синхронизация
+        end = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+        end += timedelta(days=1)
+        
+        lower, upper = start, end
+        windows = []
+        while start < end:
+            month = start.month - 1 + self.shard_months
+            window_end = min(end, start.replace(year=start.year + month // 12, month=month % 12 + 1))
+            windows.append((start, window_end))
+            start = window_end
+        
+        def bounds(window_start, window_end):
+            return (datetime.min if window_start == lower else window_start,
+                    datetime.max if window_end == upper else window_end)
+        
+        def count(window):
+            return self._request_page(self._created_jql(*bounds(*window)), 0, 0, 'lean')['total']
+        
+        shards = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while windows:
+                totals = executor.map(count, windows)
+                oversized = []
+                for (window_start, window_end), total in zip(windows, totals):
+                    middle = window_start + (window_end - window_start) / 2
+                    middle = middle.replace(second=0, microsecond=0)
+                    if total > self.shard_max_issues and window_start < middle:
+                        oversized += [(window_start, middle), (middle, window_end)]
+                    elif total:
+                        shards.append((window_start, window_end, total))
+                windows = oversized
+        shards.sort()
+        if shards:
+            # Пустые крайние окна отброшены, поэтому открываются границы крайних непустых
+            shards[0] = (datetime.min, *shards[0][1:])
+            shards[-1] = (shards[-1][0], datetime.max, shards[-1][2])
+        logger.info(f"План синхронизации по окнам created: {len(shards)} шардов, "
+                    f"{sum(total for _, _, total in shards)} задач")
+        return shards
+    
+    def _shard_path(self, start, end):
+        return f"{self.shards_dir}/{start:%Y%m%dT%H%M}_{end:%Y%m%dT%H%M}.jsonl"
+    
+    def _load_shard_plan(self, profile):
+        """План шардов прерванной синхронизации с тем же профилем или новый план, сохраненный на диск
+        
+        План старше shard_plan_max_age_hours отбрасывается вместе с готовыми шардами: задачи в
+        них могли измениться после загрузки.
+        """
+        plan_file = f"{self.shards_dir}/plan.json"
+        try:
+            with open(plan_file, 'r', encoding='utf-8') as f:
+                plan = json.load(f)
+            age = datetime.now() - datetime.fromisoformat(plan['createdAt'])
+            if self.shard_plan_max_age_hours is not None and age > timedelta(hours=self.shard_plan_max_age_hours):
+                logger.info(f"План шардов устарел ({age.total_seconds() / 3600:.1f} ч), строится новый")
+            elif plan['profile'] == profile:
+                shards = [(datetime.fromisoformat(start), datetime.fromisoformat(end), total)
+                          for start, end, total in plan['shards']]
+                done = sum(os.path.exists(self._shard_path(start, end)) for start, end, _ in shards)
+                logger.info(f"Продолжение синхронизации по шардам: готово {done} из {len(shards)}")
+                return shards
+        except (OSError, ValueError, KeyError):
+            pass
+        
+        shutil.rmtree(self.shards_dir, ignore_errors=True)
+        Path(self.shards_dir).mkdir(parents=True, exist_ok=True)
+        shards = self.plan_shards()
+        with open(plan_file, 'w', encoding='utf-8') as f:
+            json.dump({'profile': profile, 'createdAt': datetime.now().isoformat(),
+                       'shards': [(start.isoformat(), end.isoformat(), total) for start, end, total in shards]}, f)
+        return shards
+    
+    @traced('sync shard', 'network')
+    def _fetch_shard(self, start, end, profile):
+        """Загрузка одного окна created в файл шарда; готовый шард (контрольная точка) пропускается"""
+        path = self._shard_path(start, end)
+        if os.path.exists(path):
+            return 0
+        with IssueStoreWriter(path) as writer:
+            for page in self.iter_issue_pages(self._created_jql(start, end), profile):
+                for issue in page:
+                    writer.write(issue)
+        return writer.count
+    
+    def iter_sharded_issues(self, profile='full'):
+        """Все задачи проекта через параллельную загрузку окон created с контрольными точками
+        
+        Каждое окно пишется в свой файл в data/shards/<PROJECT>; после сбоя повторный запуск
+        загружает только недостающие окна. Задачи выдаются в порядке окон без повторов по
+        ключу: если задача попала в два окна, остается версия с наибольшим updated.
+        """
+        shards = self._load_shard_plan(profile)
+        failures = []
+        with ThreadPoolExecutor(max_workers=self.shard_workers) as executor:
+            futures = {executor.submit(self._fetch_shard, start, end, profile): (start, end)
+                       for start, end, _ in shards}
+            for future in as_completed(futures):
+                error = future.exception()
+                if isinstance(error, JiraSyncError):
+                    start, end = futures[future]
+                    logger.error(f"Шард {start:%Y-%m-%d}..{end:%Y-%m-%d} не получен: {error}")
+                    failures.append(f"{start:%Y-%m-%d}..{end:%Y-%m-%d}")
+                elif error is not None:
+                    raise error
+        if failures:
+            raise JiraSyncError(f"Не получены шарды ({len(failures)}), готовые сохранены для продолжения: "
+                                f"{', '.join(sorted(failures))}")
+        
+        paths = [self._shard_path(start, end) for start, end, _ in shards]
+        
+        def read(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+        
+        # Первый проход выбирает по каждому ключу самую свежую версию, второй выдает задачи
+        newest = {}
+        read_count = 0
+        for shard, path in enumerate(paths):
+            for issue in read(path):
+                read_count += 1
+                updated = issue['fields'].get('updated')
+                updated = parse_jira_datetime(updated) if updated else None
+                kept = newest.get(issue['key'])
+                if kept is None or (updated is not None and (kept[1] is None or updated > kept[1])):
+                    newest[issue['key']] = (shard, updated)
+        
+        duplicates = read_count - len(newest)
+        for shard, path in enumerate(paths):
+            for issue in read(path):
+                kept = newest.get(issue['key'])
+                if kept is not None and kept[0] == shard:
+                    del newest[issue['key']]
+                    yield issue
+        if duplicates:
+            logger.info(f"Повторов по ключу между шардами отброшено: {duplicates}")
+    
+    def sync_data(self, full_refresh=None, profile='full'):
+        """Синхронизация хранилища с выводом статистики в лог"""
         logger.info("=== НАЧАЛО ПОДГОТОВКИ ДАННЫХ ===")
         
-        logger.info("Получение всех задач для анализа...")
-        jql_all = f'project = {self.project_key}'
-        all_issues = self.get_issues(jql_all)
+        stats = self.sync_store(full_refresh, profile)
+        self.last_sync_stats = stats
+        logger.info(f" Новых: {stats['new']}, измененных: {stats['changed']}, без изменений: {stats['unchanged']}")
+        return stats
+    
+    def prepare_data(self, full_refresh=None, profile='full'):
+
+        self.sync_data(full_refresh, profile)
+        return self.load_report_data()
+    
+    def load_offline_data(self, profile='full'):
+        """Данные для отчетов только из локального хранилища, без HTTP-запросов; ошибки - StoreError"""
+        logger.info(f"=== РАБОТА БЕЗ СЕТИ: хранилище {self.issues_file} ===")
+        meta = self.validate_store(profile)
+        try:
+            data = self.load_report_data()
+        except ValueError as e:
+            raise StoreError(f"Хранилище {self.issues_file} повреждено: {e}") from e
+        
+        loaded = len(data[2]) if data[2] else 0
+        if 'totalIssues' in meta and loaded != meta['totalIssues']:
+            raise StoreError(f"Хранилище {self.issues_file} неполное: прочитано {loaded} задач "
+                             f"из {meta['totalIssues']} по метаданным")
+        return data
+    
+    def load_report_data(self):
+        """Один потоковый проход по хранилищу: все задачи в CompactIssues и закрытые как view() без копий"""
+        logger.info("Чтение хранилища и фильтрация закрытых задач...")
+        with self.tracer.span('store.load', 'io') as span:
+            all_issues = CompactIssues(self.iter_issues())
+            span['issues'] = len(all_issues)
         
         if not all_issues:
             logger.error("Не найдено задач для анализа")
             return None, None, None
         
-        logger.info(f" Загружено {len(all_issues)} задач")
+        closed_issues = all_issues.closed()
+        logger.info(f" Загружено {len(all_issues)} задач ({all_issues.nbytes / (1024 * 1024):.1f} МБ в памяти)")
+        logger.info(f" Закрытых задач: {len(closed_issues)}")
         
-        logger.info("Фильтрация закрытых задач в памяти...")
-        closed_issues = [
-            issue for issue in all_issues
-            if issue['fields'].get('status', {}).get('name') in 
-               ('Closed', 'Resolved', 'Done')
-        ]
+        logger.info("=== ПОДГОТОВКА ДАННЫХ ЗАВЕРШЕНА ===\n")
         
-        logger.info(f" Закрытых задач: {len(closed_issues)}")
+        return all_issues, closed_issues, all_issues
+    
+    @traced('build_issue_table')
+    def build_issue_table(self, issues):
+        """Нормализация задач в типизированную таблицу pandas, общую для всех отчетов
         
-        all_status_issues = all_issues
+        Строки разбираются за один проход по задачам, а даты created/updated/resolutiondate -
+        одним векторизованным вызовом pd.to_datetime для всех трех столбцов сразу.
+        CompactIssues уже хранит разобранные столбцы и переводится в таблицу без прохода по задачам.
+        """
+        if isinstance(issues, CompactIssues):
+            return issues.to_table()
         
-
-        self.save_issues_to_json(all_issues)
+        columns = {name: [] for name in TABLE_COLUMNS}
+        created, updated, resolved = [], [], []
         
-        logger.info("=== ПОДГОТОВКА ДАННЫХ ЗАВЕРШЕНА ===\n")
+        for issue in issues:
+            fields = issue['fields']
+            columns['key'].append(issue['key'])
+            for name, (field, attr, default) in TABLE_COLUMNS.items():
+                if field is None:
+                    continue
+                value = fields.get(field)
+                if isinstance(value, dict):
+                    value = value.get(attr)
+                columns[name].append(value if value is not None else default)
+            created.append(fields.get('created'))
+            updated.append(fields.get('updated'))
+            resolved.append(fields.get('resolutiondate'))
         
-        return all_status_issues, closed_issues, all_issues
+        count = len(columns['key'])
+        dates = pd.to_datetime(pd.Series(created + updated + resolved, dtype=object),
+                               utc=True, format='ISO8601').dt.tz_convert(None)
+        
+        table = pd.DataFrame({
+            'key': pd.Series(columns['key'], dtype=object),
+            'status': pd.Categorical(columns['status']),
+            'priority': pd.Categorical(columns['priority']),
+            'assignee': pd.Categorical(columns['assignee']),
+            'reporter': pd.Categorical(columns['reporter']),
+            'timespent': pd.to_numeric(pd.Series(columns['timespent'], dtype=object)).astype('float64'),
+            'created': dates.iloc[:count].to_numpy(),
+            'updated': dates.iloc[count:2 * count].to_numpy(),
+            'resolved': dates.iloc[2 * count:].to_numpy(),
+        })
+        table['is_closed'] = table['status'].isin(CLOSED_STATUSES)
+        return table
     
-    def plot_lead_time_histogram(self, closed_issues):
-
-        if not closed_issues:
-            logger.warning("Нет закрытых задач для анализа")
-            return
+    @traced('aggregate closed issues')
+    def aggregate_closed_issues(self, issues):
+        """Один проход по закрытым задачам для отчетов top-users, worklog и priority
         
-        lead_times = []
-        for issue in closed_issues:
-            fields = issue['fields']
-            created = fields.get('created')
-            resolved = fields.get('resolutiondate')
-            
-            if created and resolved:
-                created_dt = pd.to_datetime(created)
-                resolved_dt = pd.to_datetime(resolved)
-                lead_time_days = (resolved_dt - created_dt).total_seconds() / (24 * 3600)
-                lead_times.append(lead_time_days)
+        issues - таблица build_issue_table, CompactIssues или поток задач (например, self.iter_issues()).
+        """
+        stats = ClosedIssueStats(self.top_users_count, self.top_users_sketch_capacity)
+        if isinstance(issues, CompactIssues):
+            stats.update_table(issues.closed().to_table(['assignee', 'reporter', 'priority', 'timespent', 'is_closed']))
+        elif isinstance(issues, pd.DataFrame):
+            stats.update_table(issues)
+        else:
+            stats.update_issues(issues or [])
+        return stats
+    
+    def _as_closed_stats(self, issues):
+        """Агрегаты закрытых задач из готового ClosedIssueStats, таблицы или списка задач"""
+        if isinstance(issues, ClosedIssueStats):
+            return issues
+        return self.aggregate_closed_issues(issues)
+    
+    def _as_table(self, issues):
+        """Таблица задач из DataFrame или списка задач REST API"""
+        if isinstance(issues, pd.DataFrame):
+            return issues
+        return self.build_issue_table(issues or [])
+    
+    @traced('compute lead-time')
+    def charts_lead_time_histogram(self, issue_table):
+        """Данные гистограммы времени выполнения закрытых задач (по таблице или ReportAggregates)"""
+        if isinstance(issue_table, ReportAggregates):
+            if not issue_table.closed:
+                logger.warning("Нет закрытых задач для анализа")
+                return []
+            lead_times = pd.Series(issue_table.lead_times())
+        else:
+            table = self._as_table(issue_table)
+            closed = table[table['is_closed']]
+            if closed.empty:
+                logger.warning("Нет закрытых задач для анализа")
+                return []
+            lead_times = ((closed['resolved'] - closed['created']).dt.total_seconds() / (24 * 3600)).dropna()
         
-        if not lead_times:
+        if lead_times.empty:
             logger.warning("Нет данных для гистограммы времени выполнения")
-            return
+            return []
         
-        plt.figure(figsize=(12, 6))
-        plt.hist(lead_times, bins=30, alpha=0.7, edgecolor='black')
-        plt.xlabel('Время выполнения (дни)')
-        plt.ylabel('Количество задач')
-        plt.title(f'Гистограмма времени выполнения задач ({self.project_key})\nВсего задач: {len(lead_times)}')
-        plt.grid(True, alpha=0.3)
-        plt.tight_layout()
-        plt.savefig(f'{self.output_dir}/01_lead_time_histogram.png', dpi=150, bbox_inches='tight')
-        plt.close()
-        logger.info(" Гистограмма времени выполнения сохранена")
+        return [{
+            'kind': 'histogram',
+            'path': f'{self.output_dir}/01_lead_time_histogram.png',
+            'figsize': (12, 6),
+            'values': lead_times.to_numpy(),
+            'bins': 30,
+            'xlabel': 'Время выполнения (дни)',
+            'ylabel': 'Количество задач',
+            'title': f'Гистограмма времени выполнения задач ({self.project_key})\nВсего задач: {len(lead_times)}',
+            'message': " Гистограмма времени выполнения сохранена",
+        }]
     
-    def plot_time_in_status(self, all_status_issues):
+    def plot_lead_time_histogram(self, issue_table):
 
-        if not all_status_issues:
-            logger.warning("Нет задач для анализа времени в статусах")
-            return
+        self.render_charts(self.charts_lead_time_histogram(issue_table))
+    
+    @traced('build_status_intervals')
+    def build_status_intervals(self, issues, as_of=None):
+        """Интервалы пребывания задач в статусах по переходам из changelog
+        
+        Возвращает таблицу key/status/start/end/duration_days: по строке на каждый переход
+        (статус, из которого задачу перевели) и по строке на текущий статус каждой задачи.
+        Интервалы считаются векторно по отсортированным массивам переходов. Текущий интервал
+        длится до as_of (по умолчанию - максимальный updated), а для закрытых статусов
+        остается открытым (end = NaT), чтобы не учитывать время после закрытия.
+        """
+        if isinstance(issues, CompactIssues):
+            return self._status_intervals_from_columns(
+                issues.to_table(REPORTS['time-in-status']['columns']), issues.transitions(), as_of)
+        
+        keys, statuses, created, updated = [], [], [], []
+        trans_issue, trans_time, trans_from, trans_to = [], [], [], []
         
-        status_stats = {}
-        for issue in all_status_issues:
+        for issue in issues:
             fields = issue['fields']
-            status = fields.get('status', {}).get('name', 'Неизвестно')
-            created = fields.get('created')
-            updated = fields.get('updated')
-            
-            if not created or not updated:
+            if not fields.get('created'):
                 continue
-            
-            created_dt = pd.to_datetime(created)
-            updated_dt = pd.to_datetime(updated)
-            time_in_status_days = (updated_dt - created_dt).total_seconds() / (24 * 3600)
-            
-            if status not in status_stats:
-                status_stats[status] = []
-            
-            status_stats[status].append(time_in_status_days)
+            index = len(keys)
+            keys.append(issue['key'])
+            status = fields.get('status')
+            statuses.append(status.get('name', 'Неизвестно') if isinstance(status, dict) else 'Неизвестно')
+            created.append(fields['created'])
+            updated.append(fields.get('updated'))
+            for when, from_status, to_status in status_transitions(issue):
+                trans_issue.append(index)
+                trans_time.append(when)
+                trans_from.append(from_status or 'Неизвестно')
+                trans_to.append(to_status or 'Неизвестно')
+        
+        if not keys:
+            return pd.DataFrame(columns=INTERVAL_COLUMNS)
+        
+        issues_count = len(keys)
+        times = pd.to_datetime(pd.Series(created + updated + trans_time, dtype=object),
+                               utc=True, format='ISO8601').dt.tz_convert(None).to_numpy()
+        return self._compute_status_intervals(
+            np.asarray(keys, dtype=object), np.asarray(statuses, dtype=object),
+            times[:issues_count], times[issues_count:2 * issues_count],
+            np.asarray(trans_issue, dtype=np.int64), times[2 * issues_count:],
+            np.asarray(trans_from, dtype=object), np.asarray(trans_to, dtype=object), as_of)
+    
+    def status_intervals_from_snapshot(self, snapshot, as_of=None):
+        """Интервалы статусов по колоночному снимку, без разбора JSON и дат"""
+        return self._status_intervals_from_columns(
+            snapshot.load_table(REPORTS['time-in-status']['columns']), snapshot.load_transitions(), as_of)
+    
+    def _status_intervals_from_columns(self, table, transitions, as_of=None):
+        """Интервалы статусов по готовой таблице (key/status/created/updated) и массивам переходов"""
+        # Задачи без даты создания пропускаются, как в build_status_intervals
+        has_created = ~np.isnat(table['created'].to_numpy())
+        if not has_created.any():
+            return pd.DataFrame(columns=INTERVAL_COLUMNS)
+        row_index = np.cumsum(has_created) - 1
+        kept = has_created[transitions['issue']]
+        
+        table = table[has_created]
+        return self._compute_status_intervals(
+            table['key'].to_numpy(dtype=object), table['status'].to_numpy(dtype=object),
+            table['created'].to_numpy(), table['updated'].to_numpy(),
+            row_index[transitions['issue'][kept]], transitions['time'][kept],
+            transitions['from'][kept], transitions['to'][kept], as_of)
+    
+    def _compute_status_intervals(self, keys, statuses, created_at, updated_at,
+                                  trans_issue, trans_at, trans_from, trans_to, as_of=None):
+        """Векторный расчет интервалов: массивы задач и переходов, trans_issue - номер задачи в keys"""
+        if as_of is None:
+            as_of = updated_at.max()
+        as_of = np.datetime64(pd.Timestamp(as_of), 'ns')
+        
+        order = np.lexsort((trans_at, trans_issue))
+        trans_issue = trans_issue[order]
+        trans_at = trans_at[order]
+        trans_from = trans_from[order]
+        trans_to = trans_to[order]
+        
+        # Интервал перехода начинается с предыдущего перехода той же задачи или с создания
+        first = np.ones(len(trans_issue), dtype=bool)
+        first[1:] = trans_issue[1:] != trans_issue[:-1]
+        last = np.ones(len(trans_issue), dtype=bool)
+        last[:-1] = trans_issue[:-1] != trans_issue[1:]
+        previous_at = np.roll(trans_at, 1)
+        trans_start = np.where(first, created_at[trans_issue], previous_at)
         
-        if not status_stats:
+        current_status = statuses.copy()
+        current_status[trans_issue[last]] = trans_to[last]
+        current_start = created_at.copy()
+        current_start[trans_issue[last]] = trans_at[last]
+        current_end = np.where(np.isin(current_status, CLOSED_STATUSES), np.datetime64('NaT', 'ns'), as_of)
+        
+        intervals = pd.DataFrame({
+            'key': pd.Categorical(np.concatenate([keys[trans_issue], keys])),
+            'status': pd.Categorical(np.concatenate([trans_from, current_status])),
+            'start': np.concatenate([trans_start, current_start]),
+            'end': np.concatenate([trans_at, current_end]),
+        })
+        intervals['duration_days'] = ((intervals['end'] - intervals['start']).dt.total_seconds() / (24 * 3600)).clip(lower=0)
+        return intervals
+    
+    def _as_status_intervals(self, status_intervals):
+        """Интервалы статусов из готовой таблицы или списка задач REST API"""
+        if isinstance(status_intervals, pd.DataFrame):
+            return status_intervals
+        return self.build_status_intervals(status_intervals or [])
+    
+    @traced('compute time-in-status')
+    def charts_time_in_status(self, status_intervals):
+        """Данные гистограмм времени в статусе: по одной на каждый статус или одна сетка (status_layout='faceted')"""
+        intervals = self._as_status_intervals(status_intervals)
+        if intervals.empty:
+            logger.warning("Нет задач для анализа времени в статусах")
+            return []
+        
+        dwell = self.status_dwell(intervals)
+        
+        if dwell.empty:
             logger.warning("Нет данных для анализа времени по статусам")
-            return
+            return []
         
-        graphs_created = 0
-        for status, times in status_stats.items():
+        charts = []
+        for status, times in dwell.groupby(level='status', observed=True, sort=False):
             if len(times) < 2:
                 continue
             
-            try:
-                plt.figure(figsize=(10, 6))
-                plt.hist(times, bins=15, alpha=0.7, color='skyblue', edgecolor='black')
-                plt.xlabel('Время в статусе (дни)')
-                plt.ylabel('Количество задач')
-                plt.title(f'Распределение времени для статуса: {status}\nЗадач: {len(times)}')
-                plt.grid(True, alpha=0.3)
-                
-                safe_status = "".join(c if c.isalnum() or c in (' ', '-', '_') else '_' for c in str(status)).rstrip()
-                filename = f'{self.output_dir}/02_time_in_status_{safe_status}.png'
-                
-                plt.tight_layout()
-                plt.savefig(filename, dpi=150, bbox_inches='tight')
-                plt.close()
-                
-                graphs_created += 1
-                logger.info(f" Создана диаграмма для статуса: {status} ({len(times)} задач)")
-            except Exception as e:
-                logger.error(f"Ошибка создания графика для статуса {status}: {e}")
-                continue
+            safe_status = "".join(c if c.isalnum() or c in (' ', '-', '_') else '_' for c in str(status)).rstrip()
+            charts.append({
+                'kind': 'histogram',
+                'path': f'{self.output_dir}/02_time_in_status_{safe_status}.png',
+                'figsize': (10, 6),
+                'values': times.to_numpy(),
+                'bins': 15,
+                'color': 'skyblue',
+                'xlabel': 'Время в статусе (дни)',
+                'ylabel': 'Количество задач',
+                'title': f'Распределение времени для статуса: {status}\nЗадач: {len(times)}',
+                'message': f" Создана диаграмма для статуса: {status} ({len(times)} задач)",
+            })
         
-        logger.info(f" Создано {graphs_created} диаграмм распределения времени по статусам")
+        if self.status_layout == 'faceted' and charts:
+            columns = min(3, len(charts))
+            rows = -(-len(charts) // columns)
+            logger.info(f" Подготовлена общая диаграмма времени по {len(charts)} статусам")
+            return [{
+                'kind': 'facets',
+                'path': f'{self.output_dir}/02_time_in_status.png',
+                'figsize': (6 * columns, 4 * rows),
+                'columns': columns,
+                'panels': [{name: chart[name] for name in ('values', 'bins', 'color', 'xlabel', 'ylabel', 'title')}
+                           for chart in charts],
+                'title': f'Распределение времени в статусах ({self.project_key})',
+                'message': f" Создана общая диаграмма по статусам ({len(charts)} статусов)",
+            }]
+        
+        logger.info(f" Подготовлено {len(charts)} диаграмм распределения времени по статусам")
+        return charts
+    
+    def status_dwell(self, intervals):
+        """Суммарное время каждой задачи в статусе с учетом повторных возвратов в него (индекс status, key)"""
+        return (
+            intervals.dropna(subset=['duration_days'])
+            .groupby(['status', 'key'], observed=True, sort=False)['duration_days'].sum()
+        )
     
-    def plot_daily_issue_flow(self, all_issues):
+    def plot_time_in_status(self, status_intervals):
 
-        if not all_issues:
-            return
-        
-        created_dates = []
-        resolved_dates = []
+        self.render_charts(self.charts_time_in_status(status_intervals))
+    
+    def compute_daily_issue_flow(self, issue_table, freq='D', start=None, end=None):
+        """Поток созданных и закрытых задач с накопительным итогом
         
-        for issue in all_issues:
-            fields = issue['fields']
-            created = fields.get('created')
-            resolved = fields.get('resolutiondate')
-            
-            if created:
-                created_dates.append(pd.to_datetime(created).date())
-            
-            if resolved:
-                resolved_dates.append(pd.to_datetime(resolved).date())
+        Счетчики строятся через np.bincount по номеру дня, то есть за O(задач + дней); по
+        ReportAggregates - из готовых счетчиков по дням, за O(дней).
+        freq: 'D', 'W' или 'M'; start/end ограничивают окно дат (включительно), при этом
+        накопительный итог учитывает задачи и до начала окна.
+        """
+        if freq not in FLOW_FREQUENCIES:
+            raise ValueError(f"Неизвестная частота {freq!r}, допустимы: {', '.join(FLOW_FREQUENCIES)}")
         
-        all_dates = created_dates + resolved_dates
-        if not all_dates:
-            return
+        if isinstance(issue_table, ReportAggregates):
+            created_days, created_weights = issue_table.daily_counts('created')
+            resolved_days, resolved_weights = issue_table.daily_counts('resolved')
+        else:
+            table = self._as_table(issue_table)
+            created_days = table['created'].dropna().to_numpy().astype('datetime64[D]')
+            resolved_days = table['resolved'].dropna().to_numpy().astype('datetime64[D]')
+            created_weights = resolved_weights = None
         
-        min_date = min(all_dates)
-        max_date = max(all_dates)
-        date_range = pd.date_range(start=min_date, end=max_date, freq='D')
+        if not len(created_days) and not len(resolved_days):
+            return pd.DataFrame(columns=FLOW_COLUMNS)
         
-        daily_data = []
-        for date in date_range:
-            date_str = date.date()
-            created_count = created_dates.count(date_str)
-            resolved_count = resolved_dates.count(date_str)
-            
-            daily_data.append({
-                'date': date,
-                'created': created_count,
-                'resolved': resolved_count
-            })
+        all_days = np.concatenate([created_days, resolved_days])
+        first_day = all_days.min()
+        days_count = int((all_days.max() - first_day).astype(np.int64)) + 1
         
-        df = pd.DataFrame(daily_data)
+        df = pd.DataFrame({
+            'date': pd.date_range(start=first_day, periods=days_count, freq='D'),
+            'created': np.bincount((created_days - first_day).astype(np.int64), created_weights,
+                                   minlength=days_count).astype(np.int64),
+            'resolved': np.bincount((resolved_days - first_day).astype(np.int64), resolved_weights,
+                                    minlength=days_count).astype(np.int64),
+        })
         df['created_cumulative'] = df['created'].cumsum()
         df['resolved_cumulative'] = df['resolved'].cumsum()
         
-        fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(14, 10))
+        if start is not None:
+            df = df[df['date'] >= pd.Timestamp(start)]
+        if end is not None:
+            df = df[df['date'] <= pd.Timestamp(end)]
         
-        ax1.plot(df['date'], df['created'], label='Создано', linewidth=2)
-        ax1.plot(df['date'], df['resolved'], label='Закрыто', linewidth=2)
-        ax1.set_title('Ежедневное количество созданных и закрытых задач')
-        ax1.set_ylabel('Количество задач')
-        ax1.legend()
-        ax1.grid(True, alpha=0.3)
+        if freq != 'D' and not df.empty:
+            df = df.resample(FLOW_FREQUENCIES[freq], on='date').agg({
+                'created': 'sum',
+                'resolved': 'sum',
+                'created_cumulative': 'last',
+                'resolved_cumulative': 'last',
+            }).dropna().astype(np.int64).reset_index()
         
-        ax2.plot(df['date'], df['created_cumulative'], label='Всего создано', linewidth=2)
-        ax2.plot(df['date'], df['resolved_cumulative'], label='Всего закрыто', linewidth=2)
-        ax2.set_title('Накопительный итог задач')
-        ax2.set_xlabel('Дата')
-        ax2.set_ylabel('Количество задач')
-        ax2.legend()
-        ax2.grid(True, alpha=0.3)
+        return df.reset_index(drop=True)
+    
+    def export_daily_issue_flow(self, df, name='03_daily_issue_flow'):
+        """Сохранение ряда потока задач в CSV и, если доступен движок, в Parquet рядом с графиком"""
+        df.to_csv(f'{self.output_dir}/{name}.csv', index=False)
+        try:
+            df.to_parquet(f'{self.output_dir}/{name}.parquet', index=False)
+        except ImportError:
+            logger.info(" Parquet не сохранен: не установлен pyarrow или fastparquet")
+    
+    @traced('compute daily-flow')
+    def charts_daily_issue_flow(self, issue_table, freq='D', start=None, end=None):
+        """Данные графика потока задач; ряд заодно выгружается в CSV/Parquet"""
+        df = self.compute_daily_issue_flow(issue_table, freq=freq, start=start, end=end)
+        if df.empty:
+            return []
         
-        plt.tight_layout()
-        plt.savefig(f'{self.output_dir}/03_daily_issue_flow.png', dpi=150, bbox_inches='tight')
-        plt.close()
+        self.export_daily_issue_flow(df)
         
-        logger.info(" График ежедневного потока задач сохранен")
+        return [{
+            'kind': 'daily_flow',
+            'path': f'{self.output_dir}/03_daily_issue_flow.png',
+            'figsize': (14, 10),
+            'dates': df['date'].to_numpy(),
+            'created': df['created'].to_numpy(),
+            'resolved': df['resolved'].to_numpy(),
+            'created_cumulative': df['created_cumulative'].to_numpy(),
+            'resolved_cumulative': df['resolved_cumulative'].to_numpy(),
+            'title': f'{FLOW_TITLES[freq]} количество созданных и закрытых задач',
+            'message': " График ежедневного потока задач сохранен",
+        }]
     
-    def plot_top_users(self, closed_issues):
+    def plot_daily_issue_flow(self, issue_table, freq='D', start=None, end=None):
 
-        if not closed_issues:
-            return
+        self.render_charts(self.charts_daily_issue_flow(issue_table, freq=freq, start=start, end=end))
+    
+    @traced('compute top-users')
+    def charts_top_users(self, issue_table):
+        """Данные графика топ-30 пользователей по закрытым задачам"""
+        top_users = self._as_closed_stats(issue_table).top_users()
+        if not top_users:
+            return []
         
-        user_stats = {}
-        for issue in closed_issues:
-            fields = issue['fields']
-            
-            assignee_data = fields.get('assignee')
-            if assignee_data and isinstance(assignee_data, dict):
-                assignee = assignee_data.get('displayName', 'Не назначен')
+        users, assignee_counts, reporter_counts = zip(*top_users)
+        return [{
+            'kind': 'top_users',
+            'path': f'{self.output_dir}/04_top_users.png',
+            'figsize': (12, 10),
+            'users': [str(user) for user in users],
+            'assignee_counts': np.array(assignee_counts),
+            'reporter_counts': np.array(reporter_counts),
+            'title': 'Топ 30 пользователей по количеству задач\n(Исполнитель + Репортер)',
+            'message': " График топ пользователей сохранен",
+        }]
+    
+    def plot_top_users(self, issue_table):
+
+        self.render_charts(self.charts_top_users(issue_table))
+    
+    @traced('compute worklog')
+    def charts_user_worklog_histogram(self, issue_table):
+        """Данные гистограммы затраченного времени по закрытым задачам"""
+        stats = self._as_closed_stats(issue_table)
+        if not stats.closed:
+            return []
+        
+        all_times = np.array(stats.worklog_hours, dtype=np.float64)
+        if not len(all_times):
+            logger.warning("Нет данных о затраченном времени")
+            return []
+        
+        return [{
+            'kind': 'histogram',
+            'path': f'{self.output_dir}/05_user_worklog_histogram.png',
+            'figsize': (12, 6),
+            'values': all_times,
+            'bins': 30,
+            'xlabel': 'Затраченное время (часы)',
+            'ylabel': 'Количество задач',
+            'title': 'Распределение затраченного времени на задачи',
+            'message': " Гистограмма затраченного времени сохранена",
+        }]
+    
+    def plot_user_worklog_histogram(self, issue_table):
+
+        self.render_charts(self.charts_user_worklog_histogram(issue_table))
+    
+    @traced('compute priority')
+    def charts_issues_by_priority(self, issue_table):
+        """Данные графика распределения закрытых задач по приоритетам"""
+        priority_count = self._as_closed_stats(issue_table).priority_counts()
+        if not priority_count:
+            return []
+        
+        return [{
+            'kind': 'priority',
+            'path': f'{self.output_dir}/06_issues_by_priority.png',
+            'figsize': (10, 6),
+            'priorities': [str(priority) for priority, _ in priority_count],
+            'counts': [count for _, count in priority_count],
+            'title': 'Распределение задач по приоритетам',
+            'message': " График по приоритетам сохранен",
+        }]
+    
+    def plot_issues_by_priority(self, issue_table):
+
+        self.render_charts(self.charts_issues_by_priority(issue_table))
+    
+    def distribution_frames(self, inputs, reports):
+        """Значения распределений отчетов lead-time, worklog и time-in-status со столбцами группировки
+        
+        Возвращает {отчет: (таблица со столбцом value, измерения)}; измерения - всегда
+        DISTRIBUTION_DIMENSIONS, поэтому таблица без этих столбцов дает ValueError (загрузчики
+        добавляют их через report_columns). Для времени в статусах статус - это статус интервала,
+        а приоритет и исполнитель - текущие значения задачи, присоединенные по ключу.
+        """
+        frames = {}
+        table = inputs.get('table')
+        value_reports = [report for report in ('lead-time', 'worklog') if report in reports]
+        if table is not None and value_reports:
+            if isinstance(table, ReportAggregates):
+                closed = table.closed_frame()
+                lead_days, worklog_hours = closed['lead_days'], closed['worklog_hours']
             else:
-                assignee = 'Не назначен'
+                closed = table[table['is_closed']]
+                lead_days = worklog_hours = None
+                if 'created' in closed and 'resolved' in closed:
+                    lead_days = (closed['resolved'] - closed['created']).dt.total_seconds() / (24 * 3600)
+                if 'timespent' in closed:
+                    worklog_hours = closed['timespent'].where(closed['timespent'] > 0) / 3600
             
-            reporter_data = fields.get('reporter')
-            if reporter_data and isinstance(reporter_data, dict):
-                reporter = reporter_data.get('displayName', 'Неизвестно')
+            dimensions = DISTRIBUTION_DIMENSIONS
+            for report, values in (('lead-time', lead_days), ('worklog', worklog_hours)):
+                if report not in value_reports:
+                    continue
+                missing = [name for name in dimensions if name not in closed]
+                if values is None:
+                    missing += [name for name in DISTRIBUTION_VALUE_COLUMNS[report] if name not in closed]
+                if missing:
+                    raise ValueError(f"Для статистик распределений отчета {report} нет столбцов: {', '.join(missing)}")
+                frame = closed[dimensions].assign(value=values.to_numpy())
+                frames[report] = (frame[frame['value'].notna()], dimensions)
+        
+        if 'time-in-status' in reports and inputs.get('intervals') is not None and not inputs['intervals'].empty:
+            if isinstance(table, ReportAggregates):
+                issues = table.dwell_frame()
             else:
-                reporter = 'Неизвестно'
-            
-            if assignee not in user_stats:
-                user_stats[assignee] = {'assignee': 0, 'reporter': 0}
-            user_stats[assignee]['assignee'] += 1
-            
-            if reporter not in user_stats:
-                user_stats[reporter] = {'assignee': 0, 'reporter': 0}
-            user_stats[reporter]['reporter'] += 1
-        
-        user_list = []
-        for user, stats in user_stats.items():
-            total = stats['assignee'] + stats['reporter']
-            user_list.append({
-                'user': user,
-                'total': total,
-                'assignee': stats['assignee'],
-                'reporter': stats['reporter']
-            })
+                missing = [name for name in DISTRIBUTION_DWELL_COLUMNS if table is None or name not in table]
+                if missing:
+                    raise ValueError(f"Для статистик распределений отчета time-in-status нет столбцов: "
+                                     f"{', '.join(missing)}")
+                issues = table[DISTRIBUTION_DWELL_COLUMNS]
+            dwell = self.status_dwell(inputs['intervals']).rename('value').reset_index()
+            dwell['key'] = dwell['key'].astype(object)
+            frame = dwell.merge(issues.astype({'key': object}), on='key', how='left')
+            frames['time-in-status'] = (frame[[*DISTRIBUTION_DIMENSIONS, 'value']], DISTRIBUTION_DIMENSIONS)
+        return frames
+    
+    @traced('compute distribution stats')
+    def compute_distribution_stats(self, frames, compression=100):
+        """Количество, среднее, min/max и квантили DISTRIBUTION_QUANTILES по отчетам и измерениям
         
-        user_list.sort(key=lambda x: x['total'], reverse=True)
-        top_users = user_list[:30]
+        Статистики считаются векторно через groupby, а для каждой группы строится QuantileSketch,
+        чтобы выгрузки разных проектов и периодов можно было слить (merge_distribution_stats).
+        """
+        rows = []
+        sketches = {}
+        for report, (frame, dimensions) in frames.items():
+            for dimension in ['all', *dimensions]:
+                by = pd.Series('all', index=frame.index) if dimension == 'all' else frame[dimension]
+                grouped = frame['value'].groupby(by, observed=True, sort=True)
+                summary = grouped.agg(['count', 'mean', 'min', 'max'])
+                if summary.empty:
+                    continue
+                quantiles = grouped.quantile(list(DISTRIBUTION_QUANTILES.values())).unstack()
+                quantiles.columns = list(DISTRIBUTION_QUANTILES)
+                summary = summary.join(quantiles)
+                for group, values in grouped:
+                    sketches[f'{report}|{dimension}|{group}'] = QuantileSketch(compression).add(values.to_numpy())
+                for group, row in summary.iterrows():
+                    rows.append({'report': report, 'dimension': dimension, 'group': str(group),
+                                 **{column: row[column] for column in DISTRIBUTION_COLUMNS[3:]}})
         
-        if not top_users:
-            return
+        table = pd.DataFrame(rows, columns=DISTRIBUTION_COLUMNS)
+        table['count'] = table['count'].astype(np.int64)
+        return table, {name: sketch.to_dict() for name, sketch in sketches.items()}
+    
+    def export_distribution_stats(self, inputs, reports, name='07_distribution_stats'):
+        """Выгрузка статистик распределений в CSV и JSON (строки и скетчи для слияния) рядом с графиками"""
+        frames = self.distribution_frames(inputs, reports)
+        if not frames:
+            return None
+        table, sketches = self.compute_distribution_stats(frames)
+        document = {
+            'project': self.project_key,
+            'generatedAt': datetime.now().isoformat(),
+            'rows': json.loads(table.to_json(orient='records')),
+            'sketches': sketches,
+        }
+        table.to_csv(f'{self.output_dir}/{name}.csv', index=False)
+        with open(f'{self.output_dir}/{name}.json', 'w', encoding='utf-8') as f:
+            json.dump(document, f, ensure_ascii=False)
+        logger.info(f" Статистики распределений сохранены: {name}.csv, {name}.json ({len(table)} строк)")
+        self.last_distribution_stats = document
+        return document
+    
+    def load_chart_manifest(self):
+        """Манифест кэша графиков: хеш входных данных и время отрисовки по имени файла"""
+        try:
+            with open(self.chart_manifest_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def save_chart_manifest(self, manifest):
+        with open(self.chart_manifest_file, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+    
+    @traced('render')
+    def render_charts(self, charts, workers=1):
+        """Отрисовка подготовленных графиков; при workers > 1 - параллельно в пуле процессов
+        
+        Графики, у которых хеш входных данных совпадает с манифестом и все файлы (форматы и
+        превью) на месте, не перерисовываются. При последовательной отрисовке одна фигура переиспользуется для
+        всех графиков, а при chart_bundle все графики собираются в один многостраничный PDF.
+        Итог запуска сохраняется в self.last_render_summary.
+        """
+        manifest = self.load_chart_manifest()
+        summary = {'rendered': [], 'reused': [], 'failed': []}
+        pending = []
+        charts = [self._with_output_options(chart) for chart in charts]
         
-        users = [u['user'] for u in top_users]
-        assignee_counts = [u['assignee'] for u in top_users]
-        reporter_counts = [u['reporter'] for u in top_users]
+        if self.chart_bundle and charts:
+            charts = [self._bundle_chart(charts)]
+        
+        for chart in charts:
+            name = os.path.basename(chart['path'])
+            fingerprint = chart_fingerprint(chart)
+            entry = manifest.get(name)
+            if (self.chart_cache and entry and entry['hash'] == fingerprint
+                    and all(os.path.exists(path) for path in chart_output_paths(chart))):
+                summary['reused'].append(name)
+                continue
+            pending.append((chart, name, fingerprint))
         
-        plt.figure(figsize=(12, 10))
-        y_pos = range(len(users))
+        def finish(chart, name, fingerprint, timing, error):
+            if error is not None:
+                logger.error(f"Ошибка создания графика {chart['path']}: {error}")
+                summary['failed'].append(name)
+                return
+            logger.info(chart['message'])
+            summary['rendered'].append(name)
+            started, seconds, pid = timing
+            self.tracer.record(f'render {name}', started, seconds, 'render', pid=pid, tid=pid)
+            manifest[name] = {
+                'hash': fingerprint,
+                'renderSeconds': round(seconds, 3),
+                'renderedAt': datetime.now().isoformat(),
+            }
         
-        plt.barh(y_pos, assignee_counts, alpha=0.7, label='Исполнитель', color='blue')
-        plt.barh(y_pos, reporter_counts, left=assignee_counts, alpha=0.7, label='Репортер', color='orange')
+        workers = min(workers, len(pending))
+        if self.chart_bundle:
+            for chart, name, fingerprint in pending:
+                try:
+                    timing = render_chart_bundle(chart['pages'], chart['path'])
+                except Exception as e:
+                    finish(chart, name, fingerprint, None, e)
+                else:
+                    finish(chart, name, fingerprint, timing, None)
+        elif workers <= 1:
+            figure = new_figure() if pending else None
+            for chart, name, fingerprint in pending:
+                try:
+                    timing = render_chart_timed(chart, figure)
+                except Exception as e:
+                    finish(chart, name, fingerprint, None, e)
+                else:
+                    finish(chart, name, fingerprint, timing, None)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {executor.submit(render_chart_timed, chart): (chart, name, fingerprint)
+                           for chart, name, fingerprint in pending}
+                for future in as_completed(futures):
+                    error = future.exception()
+                    finish(*futures[future], None if error else future.result(), error)
         
-        plt.ylabel('Пользователь')
-        plt.xlabel('Количество задач')
-        plt.title('Топ 30 пользователей по количеству задач\n(Исполнитель + Репортер)')
-        plt.yticks(y_pos, users)
-        plt.legend()
-        plt.grid(True, alpha=0.3)
-        plt.tight_layout()
-        plt.savefig(f'{self.output_dir}/04_top_users.png', dpi=150, bbox_inches='tight')
-        plt.close()
+        if pending:
+            self.save_chart_manifest(manifest)
+        if summary['reused']:
+            logger.info(f" Без изменений, взяты из кэша ({len(summary['reused'])}): {', '.join(summary['reused'])}")
         
-        logger.info(" График топ пользователей сохранен")
+        self.last_render_summary = summary
+        return len(summary['rendered'])
     
-    def plot_user_worklog_histogram(self, closed_issues):
-
-        if not closed_issues:
-            return
+    def _with_output_options(self, chart):
+        """График с форматами, разрешением и превью из конфигурации (только отличные от умолчаний)"""
+        chart = dict(chart)
+        if self.chart_formats != ['png']:
+            chart['formats'] = list(self.chart_formats)
+            chart['path'] = f"{os.path.splitext(chart['path'])[0]}.{self.chart_formats[0]}"
+        if self.chart_dpi != CHART_DPI:
+            chart['dpi'] = self.chart_dpi
+        if self.chart_preview_dpi:
+            chart['preview_dpi'] = self.chart_preview_dpi
+        return chart
+    
+    def _bundle_chart(self, charts):
+        """Один элемент отрисовки для многостраничного PDF chart_bundle со всеми графиками как страницами"""
+        return {
+            'kind': 'bundle',
+            'path': f'{self.output_dir}/{self.chart_bundle}',
+            'pages': charts,
+            'message': f" Графики собраны в {self.chart_bundle} ({len(charts)} стр.)",
+        }
+    
+    def required_profile(self, reports):
+        """Профиль загрузки, достаточный для всех выбранных отчетов"""
+        return 'full' if any(REPORTS[name]['profile'] == 'full' for name in reports) else 'lean'
+    
+    def build_report_inputs(self, all_issues, profile):
+        """Входные данные отчетов из списка задач: таблица и (для профиля full) интервалы статусов"""
+        logger.info("Нормализация задач в таблицу...")
+        inputs = {'table': self.build_issue_table(all_issues)}
+        if profile == 'full':
+            inputs['intervals'] = self.build_status_intervals(all_issues)
+        return inputs
+    
+    def report_columns(self, reports):
+        """Столбцы таблицы задач, нужные выбранным табличным отчетам (и их статистикам распределений), без повторов"""
+        columns = []
+        for name in reports:
+            needed = REPORTS[name]['columns'] if REPORTS[name]['input'] != 'intervals' else []
+            if self.distribution_stats and name in DISTRIBUTION_VALUE_COLUMNS:
+                needed = [*needed, 'is_closed', *DISTRIBUTION_DIMENSIONS, *DISTRIBUTION_VALUE_COLUMNS[name]]
+            elif self.distribution_stats and name == 'time-in-status':
+                needed = DISTRIBUTION_DWELL_COLUMNS
+            for column in needed:
+                if column not in columns:
+                    columns.append(column)
+        return columns
+    
+    def load_report_inputs(self, reports, profile, offline=False):
+        """Входные данные выбранных отчетов из локального хранилища; None, если задач нет
         
-        user_times = {}
-        for issue in closed_issues:
-            fields = issue['fields']
-            timespent = fields.get('timespent', 0)
-            
-            assignee_data = fields.get('assignee')
-            if assignee_data and isinstance(assignee_data, dict):
-                assignee = assignee_data.get('displayName', 'Не назначен')
+        При включенном incremental_aggregates отчеты строятся по сохраненным агрегатам, при
+        columnar_snapshot читаются только нужные отчетам столбцы колоночного снимка, иначе
+        хранилище JSON Lines читается целиком. При offline хранилище сначала
+        проверяется (validate_store), ошибки - StoreError.
+        """
+        if offline:
+            self.validate_store(profile)
+        if self.report_filters:
+            return self.load_report_slice(reports, profile)
+        if self.incremental_aggregates:
+            return self.load_aggregate_inputs(reports, profile, offline)
+        snapshot = self.open_columnar_snapshot()
+        if snapshot is None:
+            _, _, all_issues = self.load_offline_data(profile) if offline else self.load_report_data()
+            return self.build_report_inputs(all_issues, profile) if all_issues else None
+        
+        columns = self.report_columns(reports)
+        
+        if not snapshot.count:
+            logger.error("Не найдено задач для анализа")
+            return None
+        
+        inputs = {}
+        with self.tracer.span('columnar.load', 'io', columns=columns) as span:
+            if columns:
+                inputs['table'] = snapshot.load_table(columns)
+            if profile == 'full':
+                inputs['intervals'] = self.status_intervals_from_snapshot(snapshot)
+            span['issues'] = snapshot.count
+        logger.info(f" Загружено из колоночного снимка: {snapshot.count} задач, столбцы: {', '.join(columns)}")
+        return inputs
+    
+    def load_aggregate_inputs(self, reports, profile, offline=False):
+        """Входные данные отчетов из сохраненных агрегатов (ReportAggregates) без прохода по задачам
+        
+        Отчеты lead-time и daily-flow получают сами агрегаты вместо таблицы, отчеты по закрытым
+        задачам - готовый ClosedIssueStats. Интервалы статусов для профиля full берутся из
+        колоночного снимка или из хранилища.
+        """
+        aggregates = self.open_report_aggregates()
+        if aggregates is None or not aggregates.contributions:
+            logger.error("Не найдено задач для анализа")
+            return None
+        
+        if offline:
+            meta = self.load_store_meta() or {}
+            loaded = len(aggregates.contributions)
+            if 'totalIssues' in meta and loaded != meta['totalIssues']:
+                raise StoreError(f"Хранилище {self.issues_file} неполное: в агрегатах {loaded} задач "
+                                 f"из {meta['totalIssues']} по метаданным")
+        
+        inputs = {'table': aggregates}
+        if any(REPORTS[name]['input'] == 'closed_stats' for name in reports):
+            inputs['closed_stats'] = aggregates.closed_stats(self.top_users_count)
+        if profile == 'full':
+            snapshot = self.open_columnar_snapshot()
+            if snapshot is not None:
+                inputs['intervals'] = self.status_intervals_from_snapshot(snapshot)
             else:
-                assignee = 'Не назначен'
-            
-            if timespent and timespent > 0:
-                time_hours = timespent / 3600
-                
-                if assignee not in user_times:
-                    user_times[assignee] = []
-                
-                user_times[assignee].append(time_hours)
-        
-        all_times = []
-        for times in user_times.values():
-            all_times.extend(times)
-        
-        if not all_times:
-            logger.warning("Нет данных о затраченном времени")
-            return
+                inputs['intervals'] = self.build_status_intervals(self.iter_issues())
+        logger.info(f" Загружено из агрегатов отчетов: {len(aggregates.contributions)} задач")
+        return inputs
+    
+    def load_report_slice(self, reports, profile):
+        """Входные данные отчетов по срезу report_filters из индекса SQLite: только нужные строки и столбцы"""
+        logger.info(f"Срез задач для отчетов: {self.report_filters}")
+        columns = self.report_columns(reports)
+        
+        inputs = {}
+        if columns:
+            inputs['table'] = self.query_issues(columns, **self.report_filters)
+        if profile == 'full':
+            inputs['intervals'] = self.status_intervals_for_slice(**self.report_filters)
+        if all(data.empty for data in inputs.values()):
+            return None
+        return inputs
+    
+    def render_reports(self, inputs, reports):
+        """Подготовка и отрисовка графиков выбранных отчетов по готовым входным данным"""
+        logger.info("\nПодготовка данных графиков...")
+        if 'closed_stats' not in inputs and any(REPORTS[name]['input'] == 'closed_stats' for name in reports):
+            inputs['closed_stats'] = self.aggregate_closed_issues(inputs['table'])
+        charts = []
+        for name in reports:
+            report = REPORTS[name]
+            charts += getattr(self, report['charts'])(inputs[report['input']])
         
-        plt.figure(figsize=(12, 6))
-        plt.hist(all_times, bins=30, alpha=0.7, edgecolor='black')
-        plt.xlabel('Затраченное время (часы)')
-        plt.ylabel('Количество задач')
-        plt.title('Распределение затраченного времени на задачи')
-        plt.grid(True, alpha=0.3)
-        plt.tight_layout()
-        plt.savefig(f'{self.output_dir}/05_user_worklog_histogram.png', dpi=150, bbox_inches='tight')
-        plt.close()
+        if self.distribution_stats:
+            self.export_distribution_stats(inputs, reports)
         
-        logger.info(" Гистограмма затраченного времени сохранена")
+        logger.info(f"\nГенерация графиков: {len(charts)} шт., процессов: {min(self.render_workers, len(charts))}...")
+        self.render_charts(charts, workers=self.render_workers)
+        summary = self.last_render_summary
+        logger.info(f" Графиков отрисовано: {len(summary['rendered'])}, из кэша: {len(summary['reused'])}, "
+                    f"с ошибками: {len(summary['failed'])}")
     
-    def plot_issues_by_priority(self, closed_issues):
-
-        if not closed_issues:
-            return
+    async def _sync_projects_async(self, projects, full_refresh, profile):
+        """Одновременная синхронизация проектов; число запросов ограничивает общий ConnectionLimiter"""
+        loop = asyncio.get_running_loop()
         
-        priority_count = {}
-        for issue in closed_issues:
-            fields = issue['fields']
-            priority = fields.get('priority', {}).get('name', 'Не установлен')
+        with ThreadPoolExecutor(max_workers=len(projects)) as executor:
+            async def sync(analytics):
+                try:
+                    analytics.last_sync_stats = await loop.run_in_executor(
+                        executor, analytics.sync_store, full_refresh, profile)
+                except JiraSyncError as e:
+                    logger.error(f"[{analytics.project_key}] Синхронизация прервана: {e}")
+                    return analytics.project_key, e
+                stats = analytics.last_sync_stats
+                logger.info(f"[{analytics.project_key}] Новых: {stats['new']}, измененных: {stats['changed']}, "
+                            f"без изменений: {stats['unchanged']}")
+                return analytics.project_key, None
             
-            if priority not in priority_count:
-                priority_count[priority] = 0
-            
-            priority_count[priority] += 1
+            results = await asyncio.gather(*(sync(analytics) for analytics in projects))
+        return {key: error for key, error in results if error is not None}
+    
+    def sync_projects(self, projects, full_refresh=None, profile='full'):
+        """Синхронизация нескольких проектов одновременно; возвращает ошибки по ключам проектов"""
+        return asyncio.run(self._sync_projects_async(projects, full_refresh, profile))
+    
+    def write_combined_store(self, projects):
+        """Общее хранилище JSON Lines по всем проектам (потоковая склейка хранилищ проектов)"""
+        combined_file = f"{self.data_dir}/issues_combined.jsonl"
+        with IssueStoreWriter(combined_file) as writer:
+            for analytics in projects:
+                for issue in analytics.iter_issues():
+                    writer.write(issue)
+        logger.info(f"Общее хранилище {combined_file}: {writer.count} задач")
+        return combined_file
+    
+    def generate_multi_project_reports(self, project_keys, full_refresh=None, reports=None, offline=False):
+        """Отчеты по нескольким проектам: общая синхронизация, отчеты в outputs/<PROJECT>"""
+        reports = list(reports or REPORTS)
+        profile = self.required_profile(reports)
+        projects = [self.for_project(key) for key in project_keys]
         
-        sorted_priorities = sorted(priority_count.items(), key=lambda x: x[1], reverse=True)
-        priorities = [p[0] for p in sorted_priorities]
-        counts = [p[1] for p in sorted_priorities]
+        if offline:
+            failures = {}
+        else:
+            logger.info(f"Синхронизация проектов: {', '.join(project_keys)}")
+            failures = self.sync_projects(projects, full_refresh, profile)
         
-        plt.figure(figsize=(10, 6))
-        bars = plt.bar(priorities, counts, alpha=0.7, edgecolor='black')
+        for analytics in projects:
+            if analytics.project_key in failures:
+                continue
+            logger.info(f"\n=== Отчеты проекта {analytics.project_key} ===")
+            try:
+                inputs = analytics.load_report_inputs(reports, profile, offline)
+            except StoreError as e:
+                logger.error(f"[{analytics.project_key}] {e}")
+                failures[analytics.project_key] = e
+                continue
+            if inputs:
+                analytics.render_reports(inputs, reports)
+        
+        succeeded = [analytics for analytics in projects if analytics.project_key not in failures]
+        self.write_combined_store(succeeded)
+        documents = [analytics.last_distribution_stats for analytics in succeeded if analytics.last_distribution_stats]
+        if documents:
+            combined = merge_distribution_stats(documents)
+            combined['projects'] = [document['project'] for document in documents]
+            with open(f'{self.output_dir}/07_distribution_stats_combined.json', 'w', encoding='utf-8') as f:
+                json.dump(combined, f, ensure_ascii=False)
+        
+        if failures and offline:
+            raise StoreError(f"Нет пригодного локального хранилища для проектов: {', '.join(failures)}")
+        if failures:
+            raise JiraSyncError(f"Не синхронизированы проекты: {', '.join(failures)}")
+    
+    def generate_project_reports(self, full_refresh=None, reports=None, offline=False):
+        """Отчеты по текущему проекту: синхронизация (или локальное хранилище при offline) и графики"""
+        reports = list(reports or REPORTS)
+        profile = self.required_profile(reports)
+        
+        logger.info(f"\n{'='*80}")
+        logger.info(f"Начало генерации отчетов для проекта {self.project_key}")
+        logger.info(f"{'='*80}\n")
+        
+        if not offline:
+            self.sync_data(full_refresh, profile)
+        inputs = self.load_report_inputs(reports, profile, offline)
         
-        for bar, count in zip(bars, counts):
-            plt.text(bar.get_x() + bar.get_width()/2, bar.get_height() + 0.1,
-                    str(count), ha='center', va='bottom')
+        if not inputs:
+            logger.error("Не найдено задач для анализа")
+            return
         
-        plt.xlabel('Приоритет')
-        plt.ylabel('Количество задач')
-        plt.title('Распределение задач по приоритетам')
-        plt.xticks(rotation=45)
-        plt.grid(True, alpha=0.3)
-        plt.tight_layout()
-        plt.savefig(f'{self.output_dir}/06_issues_by_priority.png', dpi=150, bbox_inches='tight')
-        plt.close()
+        self.render_reports(inputs, reports)
         
-        logger.info(" График по приоритетам сохранен")
+        logger.info(f"\n{'='*80}")
+        logger.info(f" ВСЕ ОТЧЕТЫ УСПЕШНО СГЕНЕРИРОВАНЫ в папке '{self.output_dir}'")
+        logger.info(f"{'='*80}\n")
     
-    def generate_all_reports(self):
-        """Генерация всех 6 отчетов"""
+    def generate_all_reports(self, full_refresh=None, reports=None, projects=None, offline=None, snapshot=None):
+        """Генерация всех 6 отчетов (или только выбранных из REPORTS) по одному или нескольким проектам
+        
+        offline=True (или "offline" в конфигурации) строит отчеты по локальному хранилищу без
+        обращения к JIRA; snapshot - имя снимка из list_snapshots() для повторного построения
+        отчетов по историческим данным (всегда без сети).
+        
+        Возвращает False, если генерация прервалась непредвиденной ошибкой (она только пишется
+        в лог); ошибки синхронизации и хранилища выбрасываются как JiraSyncError и StoreError.
+        """
         try:
-            logger.info(f"\n{'='*80}")
-            logger.info(f"Начало генерации отчетов для проекта {self.project_key}")
-            logger.info(f"{'='*80}\n")
+            offline = self.offline if offline is None else offline
+            if snapshot is not None:
+                self.for_snapshot(snapshot).generate_project_reports(reports=reports, offline=True)
+                return True
             
-            all_status_issues, closed_issues, all_issues = self.prepare_data()
+            projects = list(projects or self.project_keys)
+            if projects != [self.project_key]:
+                self.generate_multi_project_reports(projects, full_refresh, reports, offline)
+                logger.info(f" ОТЧЕТЫ ПО {len(projects)} ПРОЕКТАМ СГЕНЕРИРОВАНЫ в папке '{self.output_dir}'")
+                return True
             
-            if not all_status_issues:
-                logger.error("Не найдено задач для анализа")
-                return
-            
-            logger.info("\nГенерация графиков...")
-            self.plot_lead_time_histogram(closed_issues)
-            self.plot_time_in_status(all_status_issues)
-            self.plot_daily_issue_flow(all_issues)
-            self.plot_top_users(closed_issues)
-            self.plot_user_worklog_histogram(closed_issues)
-            self.plot_issues_by_priority(closed_issues)
-            
-            logger.info(f"\n{'='*80}")
-            logger.info(" ВСЕ ОТЧЕТЫ УСПЕШНО СГЕНЕРИРОВАНЫ в папке 'outputs'")
-            logger.info(f"{'='*80}\n")
+            self.generate_project_reports(full_refresh, reports, offline)
+            return True
+        except JiraSyncError as e:
+            logger.error(f"Синхронизация прервана, локальное хранилище не изменено: {e}")
+            raise
+        except StoreError as e:
+            logger.error(f"Работа без сети невозможна: {e}")
+            raise
         except Exception as e:
             logger.error(f"Ошибка при генерации отчетов: {e}")
+            return False
+        finally:
+            self.report_instrumentation()
+    
+    def report_instrumentation(self):
+        """Сводная таблица этапов в лог и трасса Chrome trace event в self.trace_file"""
+        if not self.tracer.enabled or not self.tracer.events:
+            return
+        logger.info(f"Замеры этапов:\n{self.tracer.format_summary()}")
+        try:
+            Path(self.trace_file).parent.mkdir(parents=True, exist_ok=True)
+            self.tracer.write_chrome_trace(self.trace_file)
+            logger.info(f"Трасса сохранена в {self.trace_file} (chrome://tracing или ui.perfetto.dev)")
+        except OSError as e:
+            logger.error(f"Ошибка сохранения трассы: {e}")
+
+
 
+def build_parser():
+    parser = argparse.ArgumentParser(description='Аналитика задач JIRA: синхронизация хранилища и отчеты')
+    parser.add_argument('--config', default='config.json', help='файл конфигурации')
+    commands = parser.add_subparsers(dest='command')
+    
+    sync = commands.add_parser('sync', help='синхронизировать локальное хранилище без построения отчетов')
+    sync.add_argument('--full', action='store_true', help='полная перезагрузка вместо инкрементальной')
+    sync.add_argument('--profile', choices=['lean', 'full'], default='full',
+                      help='профиль загрузки (lean - без changelog)')
+    
+    report = commands.add_parser('report', help='синхронизировать хранилище и построить отчеты (по умолчанию)')
+    report.add_argument('--only', nargs='+', choices=list(REPORTS), help='только выбранные отчеты')
+    report.add_argument('--full', action='store_true', help='полная перезагрузка вместо инкрементальной')
+    report.add_argument('--offline', action='store_true', help='только по локальному хранилищу, без сети')
+    report.add_argument('--snapshot', help='построить отчеты по сохраненному снимку хранилища')
+    
+    commands.add_parser('stats', help='сводка по локальному хранилищу (JSON), без сети и без pandas')
+    
+    serve = commands.add_parser('serve', help='режим демона: периодическая синхронизация и отчеты по HTTP')
+    serve.add_argument('--only', nargs='+', choices=list(REPORTS), help='только выбранные отчеты')
+    serve.add_argument('--interval', type=float, help='период синхронизации, с (по умолчанию daemon_interval)')
+    serve.add_argument('--port', type=int, help='порт HTTP (по умолчанию daemon_port)')
+    return parser
 
 
-def main():
-    """Основная функция запуска"""
-    analytics = JiraAnalytics()
-    analytics.generate_all_reports()
+def main(argv=None):
+    """Основная функция запуска: команды sync, report, stats и serve; без команды - report"""
+    args = build_parser().parse_args(argv)
+    analytics = JiraAnalytics(args.config)
+    command = args.command or 'report'
+    projects = [analytics] if analytics.project_keys == [analytics.project_key] else \
+        [analytics.for_project(key) for key in analytics.project_keys]
+    
+    if command == 'sync':
+        failures = analytics.sync_projects(projects, args.full or None, args.profile)
+        return 1 if failures else 0
+    
+    if command == 'stats':
+        print(json.dumps([project.store_stats() for project in projects], indent=2, ensure_ascii=False))
+        return 0
+    
+    if command == 'serve':
+        from report_daemon import ReportDaemon
+        ReportDaemon(analytics, args.only, args.interval, port=args.port).serve_forever()
+        return 0
+    
+    try:
+        succeeded = analytics.generate_all_reports(full_refresh=args.full or None, reports=args.only,
+                                                   offline=args.offline or None, snapshot=args.snapshot)
+    except (JiraSyncError, StoreError):
+        return 1
+    return 0 if succeeded else 1
 
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
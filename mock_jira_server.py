@@ -0,0 +1,215 @@
+import json
+import logging
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+
+logger = logging.getLogger(__name__)
+
+STATUS_FLOW = ['Open', 'In Progress', 'Patch Available', 'Resolved', 'Closed']
+PRIORITIES = ['Blocker', 'Critical', 'Major', 'Minor', 'Trivial']
+START_DATE = datetime(2011, 8, 1, tzinfo=timezone.utc)
+PROJECT_DAYS = 13 * 365
+
+
+
+def format_jira_datetime(value):
+    """Дата в формате JIRA: 2024-01-31T12:00:00.000+0000"""
+    return value.strftime('%Y-%m-%dT%H:%M:%S.000+0000')
+
+
+class SyntheticIssues:
+    """Детерминированный набор синтетических задач: задача с номером i всегда одна и та же"""
+
+    def __init__(self, project_key='KAFKA', total=1000, seed=42, users=300):
+        self.project_key = project_key
+        self.total = total
+        self.seed = seed
+        self.users = [f'User {i}' for i in range(users)]
+        self._selections = {}
+
+    def key(self, index):
+        return f'{self.project_key}-{index + 1}'
+
+    def index(self, key):
+        return int(key.rsplit('-', 1)[1]) - 1
+
+    def issue(self, index, with_changelog=True):
+        """Задача в формате REST API; changelog - цепочка переходов по STATUS_FLOW с возвратами"""
+        rng = random.Random(self.seed * 1_000_003 + index)
+        created = START_DATE + timedelta(days=PROJECT_DAYS * index / max(self.total, 1),
+                                         seconds=rng.randint(0, 86400))
+
+        histories = []
+        moment = created
+        position = 0
+        status = STATUS_FLOW[0]
+        steps = rng.choice([0, 1, 2, 3, 4, 4, 4])
+        for _ in range(steps):
+            moment += timedelta(hours=rng.expovariate(1 / 240))
+            reopened = position >= 3 and rng.random() < 0.1
+            position = 0 if reopened else min(position + 1, len(STATUS_FLOW) - 1)
+            target = 'Reopened' if reopened else STATUS_FLOW[position]
+            histories.append({
+                'id': str(len(histories)),
+                'created': format_jira_datetime(moment),
+                'items': [{'field': 'status', 'fromString': status, 'toString': target}],
+            })
+            status = target
+
+        closed = status in ('Resolved', 'Closed')
+        fields = {
+            'created': format_jira_datetime(created),
+            'updated': format_jira_datetime(moment + timedelta(hours=rng.random() * 48)),
+            'resolutiondate': format_jira_datetime(moment) if closed else None,
+            'status': {'name': status},
+            'priority': {'name': rng.choice(PRIORITIES)},
+            'assignee': {'displayName': rng.choice(self.users)} if rng.random() < 0.8 else None,
+            'reporter': {'displayName': rng.choice(self.users)},
+            'timespent': rng.randint(1, 80) * 1800 if rng.random() < 0.2 else None,
+        }
+        issue = {'key': self.key(index), 'fields': fields}
+        if with_changelog:
+            issue['changelog'] = {'startAt': 0, 'maxResults': len(histories), 'total': len(histories),
+                                  'histories': histories}
+        return issue
+
+    def select(self, jql):
+        """Номера задач, подходящих под поддерживаемое подмножество JQL (с кэшем по тексту запроса)"""
+        if jql not in self._selections:
+            self._selections[jql] = self._select(jql)
+        return self._selections[jql]
+
+    def _select(self, jql):
+        keys = re.search(r'key in \(([^)]*)\)', jql)
+        if keys:
+            return [self.index(key.strip()) for key in keys.group(1).split(',') if key.strip()]
+
+        # Задачи идут по возрастанию created, поэтому ORDER BY created уже соблюден
+        indices = range(self.total)
+        for field, operator, value in re.findall(r'(updated|created) (>=|<) "([^"]+)"', jql):
+            bound = datetime.strptime(value, '%Y/%m/%d %H:%M').replace(tzinfo=timezone.utc)
+            bound = format_jira_datetime(bound)
+            # Строки одного формата и часового пояса можно сравнивать лексикографически
+            indices = [
+                i for i in indices
+                if (self.issue(i, with_changelog=False)['fields'][field] >= bound) == (operator == '>=')
+            ]
+        return indices
+
+
+class MockJiraServer:
+    """Локальная замена /rest/api/2/search с настраиваемыми задержкой и долей ошибок
+
+    Используется в тестах и бенчмарках: `with MockJiraServer(total=10000) as server:` и
+    jira_server = server.url в конфигурации.
+    """
+
+    def __init__(self, project_key='KAFKA', total=1000, latency=0.0, error_rate=0.0,
+                 max_page_size=100, seed=42, host='127.0.0.1', port=0):
+        self.issues = SyntheticIssues(project_key, total, seed)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.max_page_size = max_page_size
+        self.requests_served = 0
+        self.errors_served = 0
+        self.bytes_served = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def search(self, params):
+        """Ответ на поисковый запрос: страница задач и служебные поля пагинации"""
+        jql = params.get('jql', '')
+        start_at = int(params.get('startAt', 0))
+        max_results = min(int(params.get('maxResults', 50)), self.max_page_size)
+        with_changelog = 'changelog' in params.get('expand', '')
+
+        indices = self.issues.select(jql)
+        page = [self.issues.issue(i, with_changelog) for i in indices[start_at:start_at + max_results]]
+        return {'startAt': start_at, 'maxResults': max_results, 'total': len(indices), 'issues': page}
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlsplit(self.path)
+                if self.simulate_latency_and_errors():
+                    return
+                if url.path != '/rest/api/2/search':
+                    self.respond(404, {'errorMessages': [f'Unknown path {url.path}']})
+                    return
+                params = {name: values[0] for name, values in parse_qs(url.query).items()}
+                self.respond(200, server.search(params))
+
+            def simulate_latency_and_errors(self):
+                if server.latency:
+                    time.sleep(server.latency)
+                with server._lock:
+                    server.requests_served += 1
+                    failed = server._rng.random() < server.error_rate
+                    if failed:
+                        server.errors_served += 1
+                if failed:
+                    self.respond(503, {'errorMessages': ['Service Unavailable']}, {'Retry-After': '0'})
+                return failed
+
+            def respond(self, status, payload, headers=None):
+                body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json;charset=UTF-8')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+                with server._lock:
+                    server.bytes_served += len(body)
+
+            def log_message(self, format, *args):
+                logger.debug(format, *args)
+
+        return Handler
+
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    with MockJiraServer(total=10000, latency=0.05, port=8080) as mock_server:
+        logger.info(f"Mock JIRA запущен на {mock_server.url}, Ctrl+C для остановки")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
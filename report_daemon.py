@@ -0,0 +1,213 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, unquote
+
+from jira_analytics import JiraAnalytics, REPORTS, StoreError
+
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPES = {
+    '.png': 'image/png',
+    '.svg': 'image/svg+xml',
+    '.pdf': 'application/pdf',
+    '.csv': 'text/csv;charset=UTF-8',
+    '.json': 'application/json;charset=UTF-8',
+    '.parquet': 'application/octet-stream',
+}
+
+
+
+class ReportDaemon:
+    """Долгоживущий режим: периодическая дельта-синхронизация и горячие отчеты по HTTP
+
+    Между циклами в памяти остаются HTTP-сессия и агрегаты отчетов: демон всегда включает
+    incremental_aggregates, поэтому после дельты пересчитывается вклад только измененных задач.
+    Цикл без изменений в JIRA только сверяет ответ с хранилищем (один потоковый проход слияния),
+    не перезаписывает его, не загружает входные данные отчетов и ничего не рисует; при изменениях
+    входные данные берутся из агрегатов, а перерисовываются только графики, чьи данные изменились
+    (кэш render_charts).
+    Последние PNG и метрики отдаются по HTTP:
+
+        GET /metrics                     - метрики последнего цикла (JSON)
+        GET /charts/<PROJECT>/<файл>     - график или выгрузка из outputs проекта
+    """
+
+    def __init__(self, analytics, reports=None, interval=None, host=None, port=None):
+        self.analytics = analytics
+        self.reports = list(reports or REPORTS)
+        self.profile = analytics.required_profile(self.reports)
+        self.interval = analytics.daemon_interval if interval is None else interval
+        if analytics.project_keys == [analytics.project_key]:
+            self.projects = [analytics]
+        else:
+            self.projects = [analytics.for_project(key) for key in analytics.project_keys]
+        for project in self.projects:
+            project.incremental_aggregates = True
+        self.cycles = 0
+        # Проекты, графики которых уже построены в этом процессе
+        self._rendered = set()
+        self._metrics = {'cycle': 0, 'intervalSeconds': self.interval, 'projects': {}}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._httpd = ThreadingHTTPServer((host or analytics.daemon_host,
+                                           analytics.daemon_port if port is None else port),
+                                          self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def metrics(self):
+        with self._lock:
+            return self._metrics
+
+    def run_cycle(self):
+        """Один цикл: синхронизация всех проектов и обновление графиков тех, где есть изменения"""
+        started = time.time()
+        # Первый цикл учитывает full_refresh из конфигурации, дальше - только дельты
+        full_refresh = None if self.cycles == 0 else False
+        failures = self.analytics.sync_projects(self.projects, full_refresh, self.profile)
+
+        projects = {}
+        for analytics in self.projects:
+            key = analytics.project_key
+            stats = analytics.last_sync_stats
+            entry = {'sync': stats, 'lastSync': datetime.now().isoformat(), 'error': None}
+            if key in failures:
+                entry['error'] = str(failures[key])
+            else:
+                try:
+                    entry.update(self._refresh_project(analytics))
+                except StoreError as e:
+                    logger.error(f"[{key}] {e}")
+                    entry['error'] = str(e)
+            projects[key] = entry
+
+        self.cycles += 1
+        self.analytics.report_instrumentation()
+        self.analytics.tracer.clear()
+        metrics = {
+            'cycle': self.cycles,
+            'lastCycle': datetime.now().isoformat(),
+            'cycleSeconds': round(time.time() - started, 3),
+            'intervalSeconds': self.interval,
+            'projects': projects,
+        }
+        with self._lock:
+            self._metrics = metrics
+        return metrics
+
+    def _refresh_project(self, analytics):
+        key = analytics.project_key
+        stats = analytics.last_sync_stats or {}
+        changed = stats.get('new', 0) + stats.get('changed', 0)
+        if changed or key not in self._rendered:
+            inputs = analytics.load_report_inputs(self.reports, self.profile)
+            if not inputs:
+                return {'issues': 0, 'rendered': [], 'reused': [], 'failed': []}
+            analytics.render_reports(inputs, self.reports)
+            self._rendered.add(key)
+            summary = analytics.last_render_summary
+        else:
+            logger.info(f"[{key}] Изменений нет, графики не пересчитываются")
+            summary = {'rendered': [], 'reused': [], 'failed': []}
+
+        meta = analytics.load_store_meta() or {}
+        return {
+            'issues': meta.get('totalIssues'),
+            'watermark': meta.get('watermark'),
+            'charts': sorted(analytics.load_chart_manifest()),
+            'rendered': summary['rendered'],
+            'reused': summary['reused'],
+            'failed': summary['failed'],
+        }
+
+    def chart_path(self, project_key, name):
+        """Путь к файлу из outputs проекта или None (неизвестный проект, тип или выход за папку)"""
+        analytics = next((a for a in self.projects if a.project_key == project_key), None)
+        if analytics is None or name != os.path.basename(name):
+            return None
+        if os.path.splitext(name)[1] not in CONTENT_TYPES:
+            return None
+        path = os.path.join(analytics.output_dir, name)
+        return path if os.path.isfile(path) else None
+
+    def start(self):
+        """Запуск HTTP-сервера в фоновом потоке"""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"Отчеты доступны на {self.url}/metrics")
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def serve_forever(self):
+        """Циклы синхронизации каждые interval секунд до stop() или Ctrl+C"""
+        self.start()
+        try:
+            while not self._stop.is_set():
+                try:
+                    self.run_cycle()
+                except Exception as e:
+                    logger.error(f"Ошибка цикла обновления отчетов: {e}")
+                self._stop.wait(self.interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if not self._stop.is_set():
+                self.stop()
+
+    def _make_handler(self):
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = unquote(urlsplit(self.path).path)
+                if path in ('/', '/metrics'):
+                    self.respond(200, json.dumps(daemon.metrics, ensure_ascii=False).encode('utf-8'),
+                                 CONTENT_TYPES['.json'])
+                    return
+                parts = path.strip('/').split('/')
+                if len(parts) == 3 and parts[0] == 'charts':
+                    file_path = daemon.chart_path(parts[1], parts[2])
+                    if file_path is not None:
+                        with open(file_path, 'rb') as f:
+                            body = f.read()
+                        self.respond(200, body, CONTENT_TYPES[os.path.splitext(file_path)[1]])
+                        return
+                self.respond(404, json.dumps({'error': f'Not found: {path}'}).encode('utf-8'),
+                             CONTENT_TYPES['.json'])
+
+            def respond(self, status, body, content_type):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('Cache-Control', 'no-cache')
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(format, *args)
+
+        return Handler
+
+
+
+if __name__ == "__main__":
+    ReportDaemon(JiraAnalytics(sys.argv[1] if len(sys.argv) > 1 else "config.json")).serve_forever()
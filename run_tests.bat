@@ -24,7 +24,7 @@ echo ========================================
 echo РЕЗУЛЬТАТЫ ТЕСТИРОВАНИЯ
 echo ========================================
 if %TEST_RESULT% equ 0 (
-    echo  ВСЕ 5 ТЕСТОВ ПРОЙДЕНЫ УСПЕШНО!
+    echo  ВСЕ ТЕСТЫ ПРОЙДЕНЫ УСПЕШНО!
     echo.
     echo Статус тестирования:
     echo - Тест 1: Загрузка конфигурации 
@@ -32,6 +32,37 @@ if %TEST_RESULT% equ 0 (
     echo - Тест 3: Создание выходной директории 
     echo - Тест 4: Инициализация HTTP-сессии 
     echo - Тест 5: Генерация безопасных имен файлов 
+    echo - Тест 6: Слияние инкрементальной выборки 
+    echo - Тест 7: JQL инкрементальной синхронизации 
+    echo - Тест 8: Параллельная загрузка страниц 
+    echo - Тест 9: Повторы с учетом Retry-After 
+    echo - Тест 10: Адаптивный размер страницы 
+    echo - Тест 11: Сохранность хранилища при сбое 
+    echo - Тест 12: Хранилище JSON Lines и импорт старого формата 
+    echo - Тест 13: Потоковая инкрементальная синхронизация 
+    echo - Тест 14: Таблица задач 
+    echo - Тест 15: Отчеты из таблицы задач 
+    echo - Тест 16: Поток задач по дням и неделям 
+    echo - Тест 17: Интервалы статусов по changelog 
+    echo - Тест 18: Параллельная отрисовка графиков 
+    echo - Тест 19: Кэш графиков 
+    echo - Тест 20: Профили загрузки 
+    echo - Тест 21: Отчеты по нескольким проектам 
+    echo - Тест 22: Синхронизация с mock-сервером 
+    echo - Тест 23: Результаты бенчмарка 
+    echo - Тест 24: Замеры этапов и трасса 
+    echo - Тест 25: Отчеты без сети и снимки хранилища 
+    echo - Тест 26: Колоночный снимок хранилища 
+    echo - Тест 27: Индекс SQLite и срезы задач 
+    echo - Тест 28: Однопроходная агрегация закрытых задач 
+    echo - Тест 29: Инкрементальные агрегаты отчетов 
+    echo - Тест 30: Режим демона и HTTP-отдача отчетов 
+    echo - Тест 31: Ленивые импорты и командная строка 
+    echo - Тест 32: Статистики распределений и скетчи квантилей 
+    echo - Тест 33: Синхронизация по окнам created 
+    echo - Тест 34: Составные графики и форматы вывода 
+    echo - Тест 35: Компактная модель задач в памяти 
+    echo - Тест 36: Снимки хранилища после повторной синхронизации 
     echo.
     echo  МОДУЛЬНОЕ ТЕСТИРОВАНИЕ ЗАВЕРШЕНО УСПЕШНО!
 ) else (
@@ -1,13 +1,80 @@
 import unittest
 import json
 import os
+import re
+import subprocess
 import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta
 from pathlib import Path
+from unittest import mock
 
 # Добавляем корневую папку в путь для импорта
 sys.path.insert(0, str(Path(__file__).parent))
 
-from jira_analytics import JiraAnalytics
+import numpy as np
+import pandas as pd
+import requests
+
+from jira_analytics import (JiraAnalytics, JiraSyncError, StoreError, SpaceSaving, ReportAggregates, chart_fingerprint,
+                            build_parser, QuantileSketch, merge_distribution_stats, CompactIssues,
+                            status_transitions)
+from mock_jira_server import MockJiraServer, SyntheticIssues
+from report_daemon import ReportDaemon
+import benchmark
+
+# Бюджет времени импорта jira_analytics без тяжелых зависимостей, с
+IMPORT_TIME_BUDGET = 0.5
+
+
+def make_analytics(tmp_dir, **overrides):
+    """Создание экземпляра JiraAnalytics с конфигурацией во временной папке"""
+    config = {
+        'jira_server': 'http://localhost',
+        'project_key': 'KAFKA',
+        'max_results': 2,
+        'output_dir': os.path.join(tmp_dir, 'outputs'),
+        'data_dir': os.path.join(tmp_dir, 'data'),
+    }
+    config.update(overrides)
+    config_path = os.path.join(tmp_dir, 'config.json')
+    with open(config_path, 'w', encoding='utf-8') as f:
+        json.dump(config, f)
+    return JiraAnalytics(config_path)
+
+
+def make_issue(key, updated='2024-01-02T10:00:00.000+0000', status='Open', **fields):
+    """Минимальная задача в формате REST API"""
+    issue_fields = {
+        'created': '2024-01-01T10:00:00.000+0000',
+        'updated': updated,
+        'status': {'name': status},
+    }
+    issue_fields.update(fields)
+    return {'key': key, 'fields': issue_fields}
+
+
+def make_search_response(issues, start_at, max_results):
+    """Ответ /rest/api/2/search для страницы из заданного списка задач"""
+    response = mock.Mock(status_code=200, headers={}, content=b'{}')
+    response.raise_for_status.return_value = None
+    response.json.return_value = {
+        'startAt': start_at,
+        'maxResults': max_results,
+        'total': len(issues),
+        'issues': issues[start_at:start_at + max_results],
+    }
+    return response
+
+
+def make_error_response(status_code, headers=None):
+    """Ответ сервера с кодом ошибки"""
+    response = mock.Mock(status_code=status_code, headers=headers or {}, content=b'')
+    response.raise_for_status.side_effect = requests.HTTPError(f"HTTP {status_code}")
+    return response
 
 
 class TestJiraAnalytics(unittest.TestCase):
@@ -123,6 +190,983 @@ class TestJiraAnalytics(unittest.TestCase):
                     f"Опасный символ '{char}' найден в '{safe_name}'"
                 )
 
+    
+    def test_6_incremental_merge(self):
+        """Тест 6: Слияние инкрементальной выборки с хранилищем по ключу"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            analytics = make_analytics(tmp_dir)
+            stored = [make_issue('KAFKA-1'), make_issue('KAFKA-2')]
+            fetched = [
+                make_issue('KAFKA-2', updated='2024-02-01T10:00:00.000+0000', status='Closed'),
+                make_issue('KAFKA-3'),
+            ]
+            
+            stats = {'new': 0, 'changed': 0, 'unchanged': 0}
+            merged = list(analytics.merge_issues(iter(stored), fetched, stats))
+            
+            self.assertEqual([issue['key'] for issue in merged], ['KAFKA-1', 'KAFKA-2', 'KAFKA-3'])
+            self.assertEqual(merged[1]['fields']['status']['name'], 'Closed')
+            self.assertEqual(stats, {'new': 1, 'changed': 1, 'unchanged': 1})
+    
+    def test_7_incremental_jql(self):
+        """Тест 7: JQL инкрементальной синхронизации строится от максимального updated"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            analytics = make_analytics(tmp_dir, incremental_overlap_hours=1)
+            analytics.save_issues_to_json([
+                make_issue('KAFKA-1', updated='2024-03-05T12:30:00.000+0000'),
+                make_issue('KAFKA-2', updated='2024-03-05T15:45:00.000+0300'),
+            ])
+            
+            watermark = analytics.get_store_watermark(analytics.load_store_meta())
+            jql = analytics.build_incremental_jql(watermark)
+            
+            self.assertEqual(jql, 'project = KAFKA AND updated >= "2024/03/05 11:45"')
+
+    
+    def test_8_concurrent_pages_keep_order(self):
+        """Тест 8: Параллельная загрузка страниц сохраняет порядок задач"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            analytics = make_analytics(tmp_dir, max_workers=4)
+            issues = [make_issue(f'KAFKA-{i}') for i in range(9)]
+            
+            def fake_get(url, params, timeout):
+                # Первые страницы отвечают медленнее последних
+                time.sleep(0.01 * (len(issues) - params['startAt']) / len(issues))
+                return make_search_response(issues, params['startAt'], params['maxResults'])
+            
+            with mock.patch.object(analytics.session, 'get', side_effect=fake_get) as get:
+                result = analytics.get_issues('project = KAFKA')
+            
+            self.assertEqual([issue['key'] for issue in result], [issue['key'] for issue in issues])
+            self.assertEqual(get.call_count, 5)
+
+    
+    def test_9_retry_after_and_page_resume(self):
+        """Тест 9: Страница с 503 запрашивается повторно с учетом Retry-After"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            analytics = make_analytics(tmp_dir, max_workers=2)
+            issues = [make_issue(f'KAFKA-{i}') for i in range(6)]
+            failures = {2: [make_error_response(503, {'Retry-After': '3'}), make_error_response(429)]}
+            
+            def fake_get(url, params, timeout):
+                pending = failures.get(params['startAt'])
+                if pending:
+                    return pending.pop(0)
+                return make_search_response(issues, params['startAt'], params['maxResults'])
+            
+            with mock.patch.object(analytics.session, 'get', side_effect=fake_get), \
+                    mock.patch('jira_analytics.time.sleep') as sleep:
+                result = analytics.get_issues('project = KAFKA')
+            
+            self.assertEqual(len(result), len(issues))
+            self.assertEqual(sleep.call_count, 2)
+            self.assertEqual(sleep.call_args_list[0], mock.call(3.0))
+    
+    def test_10_adaptive_page_size(self):
+        """Тест 10: При таймауте тяжелой страницы уменьшается maxResults"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            analytics = make_analytics(tmp_dir, max_results=8, min_page_size=2, max_workers=1)
+            issues = [make_issue(f'KAFKA-{i}') for i in range(20)]
+            requested = []
+            
+            def fake_get(url, params, timeout):
+                requested.append((params['startAt'], params['maxResults']))
+                if params['maxResults'] > 2:
+                    raise requests.Timeout("read timeout")
+                return make_search_response(issues, params['startAt'], params['maxResults'])
+            
+            with mock.patch.object(analytics.session, 'get', side_effect=fake_get):
+                result = analytics.get_issues('project = KAFKA')
+            
+            self.assertEqual([issue['key'] for issue in result], [issue['key'] for issue in issues])
+            # Уменьшенный размер страницы сохраняется: второй диапазон (startAt=8) сразу просит 2 задачи
+            self.assertEqual(requested[:3], [(0, 8), (0, 4), (0, 2)])
+            self.assertIn((8, 2), requested)
+            self.assertEqual([size for _, size in requested[3:]], [2] * (len(requested) - 3))
+    
+    def test_11_failed_sync_keeps_store(self):
+        """Тест 11: Неустранимая ошибка прерывает синхронизацию и не портит хранилище"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            analytics = make_analytics(tmp_dir, max_retries=2, full_refresh=True)
+            analytics.save_issues_to_json([make_issue('KAFKA-1')])
+            with open(analytics.issues_file, encoding='utf-8') as f:
+                saved = f.read()
+            
+            with mock.patch.object(analytics.session, 'get', return_value=make_error_response(503)), \
+                    mock.patch('jira_analytics.time.sleep'):
+                with self.assertRaises(JiraSyncError):
+                    analytics.prepare_data()
+            
+            with open(analytics.issues_file, encoding='utf-8') as f:
+                self.assertEqual(f.read(), saved)
+
+    
+    def test_12_jsonl_store_and_legacy_import(self):
+        """Тест 12: Хранилище JSON Lines читается потоком, старый формат импортируется"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            analytics = make_analytics(tmp_dir)
+            legacy = {
+                'project': 'KAFKA',
+                'lastUpdated': '2024-01-01T00:00:00',
+                'totalIssues': 2,
+                'issues': [make_issue('KAFKA-1'), make_issue('KAFKA-2')],
+            }
+            with open(analytics.legacy_issues_file, 'w', encoding='utf-8') as f:
+                json.dump(legacy, f, indent=2)
+            
+            issues = analytics.iter_issues()
+            self.assertNotIsInstance(issues, list)
+            self.assertEqual([issue['key'] for issue in issues], ['KAFKA-1', 'KAFKA-2'])
+            
+            with open(analytics.issues_file, encoding='utf-8') as f:
+                self.assertEqual(len(f.readlines()), 2)
+            self.assertEqual(analytics.load_store_meta()['totalIssues'], 2)
+    
+    def test_13_streaming_incremental_sync(self):
+        """Тест 13: Полная, затем инкрементальная синхронизация через потоковое хранилище"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            analytics = make_analytics(tmp_dir)
+            remote = [make_issue('KAFKA-1'), make_issue('KAFKA-2', status='Closed'), make_issue('KAFKA-3')]
+            
+            def fake_get(url, params, timeout):
+                return make_search_response(remote, params['startAt'], params['maxResults'])
+            
+            with mock.patch.object(analytics.session, 'get', side_effect=fake_get):
+                all_issues, closed_issues, _ = analytics.prepare_data()
+                self.assertEqual(analytics.last_sync_stats, {'new': 3, 'changed': 0, 'unchanged': 0})
+                self.assertEqual([issue['key'] for issue in closed_issues], ['KAFKA-2'])
+                self.assertNotIn('changelog', all_issues[0])
+                
+                remote = [
+                    make_issue('KAFKA-3', updated='2024-02-01T10:00:00.000+0000', status='Closed'),
+                    make_issue('KAFKA-4'),
+                ]
+                all_issues, closed_issues, _ = analytics.prepare_data()
+            
+            self.assertEqual(analytics.last_sync_stats, {'new': 1, 'changed': 1, 'unchanged': 2})
+            self.assertEqual([issue['key'] for issue in all_issues], ['KAFKA-1', 'KAFKA-2', 'KAFKA-3', 'KAFKA-4'])
+            self.assertEqual([issue['key'] for issue in closed_issues], ['KAFKA-2', 'KAFKA-3'])
+            
+            # Ответ с перекрытием без новых и измененных задач не перезаписывает хранилище и не устаревает снимок
+            analytics.open_columnar_snapshot()
+            stamp = analytics._store_source()
+            with mock.patch.object(analytics.session, 'get', side_effect=fake_get), \
+                    mock.patch.object(analytics, 'write_columnar_snapshot') as rebuild:
+                self.assertEqual(analytics.sync_store(), {'new': 0, 'changed': 0, 'unchanged': 4})
+                analytics.open_columnar_snapshot()
+            self.assertEqual(analytics._store_source(), stamp)
+            self.assertFalse(rebuild.called)
+            self.assertFalse(os.path.exists(f"{analytics.issues_file}.tmp"))
+
+    
+    def test_14_issue_table(self):
+        """Тест 14: Таблица задач с типизированными столбцами дат"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            analytics = make_analytics(tmp_dir)
+            issues = [
+                make_issue('KAFKA-1', status='Closed', resolutiondate='2024-01-03T10:00:00.000+0000',
+                           assignee={'displayName': 'Alice'}, priority={'name': 'Major'}, timespent=7200),
+                make_issue('KAFKA-2', assignee=None),
+            ]
+            
+            table = analytics.build_issue_table(issues)
+            
+            self.assertEqual(list(table['key']), ['KAFKA-1', 'KAFKA-2'])
+            self.assertEqual(str(table['created'].dtype), str(table['resolved'].dtype))
+            self.assertTrue(str(table['created'].dtype).startswith('datetime64'))
+            self.assertEqual(list(table['assignee']), ['Alice', 'Не назначен'])
+            self.assertEqual(list(table['priority']), ['Major', 'Не установлен'])
+            self.assertEqual(list(table['is_closed']), [True, False])
+            self.assertTrue(pd.isna(table['resolved'].iloc[1]))
+            self.assertEqual((table['resolved'] - table['created']).iloc[0], pd.Timedelta(days=2))
+    
+    def test_15_reports_from_table(self):
+        """Тест 15: Все отчеты строятся из таблицы задач"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            analytics = make_analytics(tmp_dir)
+            issues = [
+                make_issue(f'KAFKA-{i}', status='Closed' if i % 2 else 'Open',
+                           resolutiondate=f'2024-01-{i + 2:02d}T10:00:00.000+0000' if i % 2 else None,
+                           assignee={'displayName': f'User {i % 3}'}, reporter={'displayName': 'Bob'},
+                           priority={'name': 'Major'}, timespent=3600 * i)
+                for i in range(8)
+            ]
+            table = analytics.build_issue_table(issues)
+            
+            analytics.plot_lead_time_histogram(table)
+            analytics.plot_time_in_status(analytics.build_status_intervals(issues))
+            analytics.plot_daily_issue_flow(table)
+            analytics.plot_top_users(table)
+            analytics.plot_user_worklog_histogram(table)
+            analytics.plot_issues_by_priority(table)
+            
+            charts = sorted(name for name in os.listdir(analytics.output_dir) if name.endswith('.png'))
+            self.assertEqual(charts, [
+                '01_lead_time_histogram.png',
+                '02_time_in_status_Open.png',
+                '03_daily_issue_flow.png',
+                '04_top_users.png',
+                '05_user_worklog_histogram.png',
+                '06_issues_by_priority.png',
+            ])
+
+    
+    def test_16_daily_issue_flow(self):
+        """Тест 16: Поток задач по дням, неделям и в окне дат"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            analytics = make_analytics(tmp_dir)
+            issues = [
+                make_issue('KAFKA-1', created='2024-01-01T10:00:00.000+0000',
+                           resolutiondate='2024-01-03T10:00:00.000+0000'),
+                make_issue('KAFKA-2', created='2024-01-01T12:00:00.000+0000'),
+                make_issue('KAFKA-3', created='2024-01-10T12:00:00.000+0000',
+                           resolutiondate='2024-01-10T18:00:00.000+0000'),
+            ]
+            table = analytics.build_issue_table(issues)
+            
+            daily = analytics.compute_daily_issue_flow(table)
+            self.assertEqual(len(daily), 10)
+            self.assertEqual(daily['created'].tolist()[:3], [2, 0, 0])
+            self.assertEqual(daily['resolved'].tolist()[:3], [0, 0, 1])
+            self.assertEqual(daily['created_cumulative'].iloc[-1], 3)
+            
+            weekly = analytics.compute_daily_issue_flow(table, freq='W')
+            self.assertEqual(weekly['created'].tolist(), [2, 1])
+            self.assertEqual(weekly['resolved_cumulative'].tolist(), [1, 2])
+            
+            window = analytics.compute_daily_issue_flow(table, start='2024-01-05', end='2024-01-10')
+            self.assertEqual(window['date'].iloc[0], pd.Timestamp('2024-01-05'))
+            self.assertEqual(window['created_cumulative'].iloc[0], 2)
+            
+            analytics.plot_daily_issue_flow(table)
+            exported = pd.read_csv(os.path.join(analytics.output_dir, '03_daily_issue_flow.csv'))
+            self.assertEqual(exported['created'].sum(), 3)
+
+    
+    def test_17_status_intervals_from_changelog(self):
+        """Тест 17: Интервалы пребывания в статусах по переходам из changelog"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            analytics = make_analytics(tmp_dir)
+            closed = make_issue('KAFKA-1', status='Closed', updated='2024-01-10T10:00:00.000+0000')
+            closed['changelog'] = {'histories': [
+                {'created': '2024-01-06T10:00:00.000+0000',
+                 'items': [{'field': 'status', 'fromString': 'In Progress', 'toString': 'Closed'}]},
+                {'created': '2024-01-02T10:00:00.000+0000',
+                 'items': [{'field': 'assignee', 'fromString': None, 'toString': 'Alice'},
+                           {'field': 'status', 'fromString': 'Open', 'toString': 'In Progress'}]},
+            ]}
+            still_open = make_issue('KAFKA-2', created='2024-01-08T10:00:00.000+0000')
+            
+            # Задача с готовым списком transitions (из CompactIssues) и задача без changelog
+            intervals = analytics.build_status_intervals([CompactIssues([closed])[0], still_open])
+            dwell = intervals.dropna(subset=['end']).set_index(['key', 'status'])['duration_days']
+            
+            self.assertEqual(dwell[('KAFKA-1', 'Open')], 1.0)
+            self.assertEqual(dwell[('KAFKA-1', 'In Progress')], 4.0)
+            self.assertEqual(dwell[('KAFKA-2', 'Open')], 2.0)
+            closed_interval = intervals[(intervals['key'] == 'KAFKA-1') & (intervals['status'] == 'Closed')]
+            self.assertTrue(closed_interval['end'].isna().all())
+            
+            analytics.plot_time_in_status(intervals)
+            self.assertTrue(os.path.exists(os.path.join(analytics.output_dir, '02_time_in_status_Open.png')))
+
+    
+    def test_18_parallel_chart_rendering(self):
+        """Тест 18: Графики отрисовываются в пуле процессов через объектный API Agg"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            analytics = make_analytics(tmp_dir)
+            issues = [
+                make_issue(f'KAFKA-{i}', status='Closed', resolutiondate=f'2024-01-{i + 2:02d}T10:00:00.000+0000',
+                           priority={'name': 'Major' if i % 2 else 'Minor'}, timespent=3600 * (i + 1))
+                for i in range(6)
+            ]
+            table = analytics.build_issue_table(issues)
+            charts = (analytics.charts_lead_time_histogram(table)
+                      + analytics.charts_daily_issue_flow(table)
+                      + analytics.charts_top_users(table)
+                      + analytics.charts_issues_by_priority(table))
+            
+            rendered = analytics.render_charts(charts, workers=2)
+            
+            self.assertEqual(rendered, 4)
+            for chart in charts:
+                self.assertTrue(os.path.getsize(chart['path']) > 0)
+            self.assertNotIn('matplotlib.pyplot', sys.modules)
+
+    
+    def test_19_chart_cache(self):
+        """Тест 19: Неизменившиеся графики берутся из кэша по хешу входных данных"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            analytics = make_analytics(tmp_dir)
+            issues = [
+                make_issue(f'KAFKA-{i}', status='Closed', resolutiondate=f'2024-01-{i + 2:02d}T10:00:00.000+0000',
+                           priority={'name': 'Major'})
+                for i in range(4)
+            ]
+            table = analytics.build_issue_table(issues)
+            charts = analytics.charts_lead_time_histogram(table) + analytics.charts_issues_by_priority(table)
+            
+            self.assertEqual(analytics.render_charts(charts), 2)
+            manifest = analytics.load_chart_manifest()
+            self.assertEqual(sorted(manifest), ['01_lead_time_histogram.png', '06_issues_by_priority.png'])
+            
+            issues[0]['fields']['priority'] = {'name': 'Minor'}
+            table = analytics.build_issue_table(issues)
+            charts = analytics.charts_lead_time_histogram(table) + analytics.charts_issues_by_priority(table)
+            
+            self.assertEqual(analytics.render_charts(charts), 1)
+            self.assertEqual(analytics.last_render_summary['reused'], ['01_lead_time_histogram.png'])
+            self.assertEqual(analytics.last_render_summary['rendered'], ['06_issues_by_priority.png'])
+
+    
+    def test_20_fetch_profiles(self):
+        """Тест 20: Профиль lean без changelog, затем дозагрузка changelog только недостающим задачам"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            analytics = make_analytics(tmp_dir, max_results=10, changelog_batch_size=2)
+            remote = [make_issue(f'KAFKA-{i}') for i in range(3)]
+            requests_log = []
+            
+            def fake_get(url, params, timeout):
+                requests_log.append(params)
+                if params['jql'].startswith('key in'):
+                    keys = params['jql'][len('key in ('):-1].split(',')
+                    found = [dict(make_issue(key), changelog={'histories': []}) for key in keys]
+                    return make_search_response(found, params['startAt'], params['maxResults'])
+                if 'updated >=' in params['jql']:
+                    return make_search_response([], params['startAt'], params['maxResults'])
+                return make_search_response(remote, params['startAt'], params['maxResults'])
+            
+            with mock.patch.object(analytics.session, 'get', side_effect=fake_get):
+                analytics.prepare_data(profile='lean')
+                self.assertNotIn('expand', requests_log[0])
+                self.assertNotIn('changelog', requests_log[0]['fields'])
+                self.assertEqual(analytics.load_store_meta()['profile'], 'lean')
+                
+                requests_log.clear()
+                analytics.prepare_data(profile='full')
+            
+            changelog_requests = [params for params in requests_log if params['jql'].startswith('key in')]
+            self.assertEqual(len(changelog_requests), 2)
+            self.assertTrue(all(params['expand'] == 'changelog' for params in changelog_requests))
+            self.assertTrue(all('changelog' in issue for issue in analytics.iter_issues()))
+            self.assertEqual(analytics.required_profile(['lead-time', 'priority']), 'lean')
+            self.assertEqual(analytics.required_profile(['lead-time', 'time-in-status']), 'full')
+
+    
+    def test_21_multi_project_reports(self):
+        """Тест 21: Несколько проектов синхронизируются одновременно в пределах лимита соединений"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            analytics = make_analytics(tmp_dir, project_keys=['KAFKA', 'ZOOKEEPER'], max_results=2,
+                                       max_connections_per_host=2, render_workers=1)
+            remote = {
+                key: [make_issue(f'{key}-{i}', status='Closed', resolutiondate='2024-01-05T10:00:00.000+0000',
+                                 changelog={'histories': []})
+                      for i in range(4)]
+                for key in ('KAFKA', 'ZOOKEEPER')
+            }
+            lock = threading.Lock()
+            active = {'now': 0, 'max': 0, 'projects': set(), 'overlap': False}
+            
+            def fake_get(url, params, timeout):
+                project = params['jql'].split()[2]
+                with lock:
+                    active['now'] += 1
+                    active['max'] = max(active['max'], active['now'])
+                    active['projects'].add(project)
+                    active['overlap'] |= len(active['projects']) > 1
+                time.sleep(0.02)
+                with lock:
+                    active['now'] -= 1
+                    active['projects'].discard(project)
+                return make_search_response(remote[project], params['startAt'], params['maxResults'])
+            
+            with mock.patch.object(analytics.session, 'get', side_effect=fake_get):
+                analytics.generate_all_reports(reports=['lead-time', 'priority'])
+            
+            self.assertTrue(active['overlap'])
+            self.assertLessEqual(active['max'], 2)
+            for key in ('KAFKA', 'ZOOKEEPER'):
+                self.assertTrue(os.path.exists(os.path.join(analytics.output_dir, key, '01_lead_time_histogram.png')))
+            with open(os.path.join(analytics.data_dir, 'issues_combined.jsonl'), encoding='utf-8') as f:
+                self.assertEqual(len(f.readlines()), 8)
+
+    
+    def test_22_mock_server_sync(self):
+        """Тест 22: Синхронизация с локальным mock-сервером JIRA при 20% ответов 503"""
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+                MockJiraServer(total=250, error_rate=0.2, max_page_size=40) as server:
+            analytics = make_analytics(tmp_dir, jira_server=server.url, max_results=100, backoff_base=0.001)
+            
+            all_issues, closed_issues, _ = analytics.prepare_data(full_refresh=True)
+            
+            self.assertEqual(len(all_issues), 250)
+            self.assertEqual(len({issue['key'] for issue in all_issues}), 250)
+            self.assertGreater(server.errors_served, 0)
+            self.assertTrue(closed_issues)
+            self.assertTrue(any(issue['transitions'] for issue in all_issues))
+    
+    def test_23_benchmark_results(self):
+        """Тест 23: Бенчмарк записывает время, память и скорость запросов в JSON"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            results = benchmark.run_benchmark(120, stages=['get_issues', 'build_issue_table'])
+            results_path = os.path.join(tmp_dir, 'bench_results.json')
+            benchmark.save_results(results_path, {'commit': 'a', 'results': results})
+            benchmark.save_results(results_path, {'commit': 'b', 'results': results})
+            
+            with open(results_path, encoding='utf-8') as f:
+                history = json.load(f)
+            
+            self.assertEqual([run['commit'] for run in history], ['a', 'b'])
+            self.assertEqual([record['stage'] for record in results], ['get_issues', 'build_issue_table'])
+            self.assertGreater(results[0]['requests'], 0)
+            self.assertIsNotNone(results[0]['peak_memory_mb'])
+            self.assertGreater(results[0]['requests_per_second'], 0)
+            self.assertIsNone(results[0]['error'])
+            
+            # Упавшая генерация отчетов записывается как ошибка этапа, а не как успешный замер
+            with mock.patch.object(JiraAnalytics, 'generate_project_reports', side_effect=RuntimeError('boom')):
+                failed = benchmark.run_benchmark(50, stages=['generate_all_reports'])
+            self.assertIn('generate_all_reports', failed[0]['error'] or '')
+    
+    def test_24_stage_instrumentation(self):
+        """Тест 24: Замеры этапов и трасса Chrome trace event после генерации отчетов"""
+        with tempfile.TemporaryDirectory() as tmp_dir, MockJiraServer(total=150, max_page_size=50) as server:
+            analytics = make_analytics(tmp_dir, jira_server=server.url, max_results=50, render_workers=1)
+            
+            analytics.generate_all_reports(full_refresh=True, reports=['lead-time', 'priority'])
+            
+            with open(analytics.trace_file, encoding='utf-8') as f:
+                events = [event for event in json.load(f)['traceEvents'] if event['ph'] == 'X']
+            names = {event['name'] for event in events}
+            summary = {row['stage']: row for row in analytics.tracer.summary()}
+            
+            for stage in ['http.page', 'http.decode', 'sync_store', 'store.write', 'columnar.write', 'columnar.load',
+                          'build_issue_table', 'compute lead-time', 'compute priority', 'render']:
+                self.assertIn(stage, names)
+            self.assertTrue(any(name.startswith('render 01_') for name in names))
+            self.assertEqual(summary['http.page']['calls'], 3)
+            self.assertEqual(summary['http.page']['bytes'], server.bytes_served)
+            self.assertEqual(summary['store.write']['issues'], 150)
+            self.assertTrue(all(event['dur'] >= 0 for event in events))
+    
+    def test_25_offline_reports_and_snapshots(self):
+        """Тест 25: Отчеты без сети по локальному хранилищу, проверка возраста и повтор по снимку"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with MockJiraServer(total=60) as server:
+                analytics = make_analytics(tmp_dir, jira_server=server.url, max_results=50, keep_snapshots=2)
+                for _ in range(3):
+                    analytics.sync_store(full_refresh=True)
+            snapshots = analytics.list_snapshots()
+            
+            with mock.patch.object(analytics.session, 'get', side_effect=AssertionError('HTTP-запрос')) as get:
+                analytics.generate_all_reports(reports=['lead-time', 'time-in-status'], offline=True)
+                analytics.generate_all_reports(reports=['lead-time'], snapshot=snapshots[0])
+                self.assertFalse(get.called)
+            
+            self.assertEqual(len(snapshots), 2)
+            self.assertTrue(os.path.exists(os.path.join(analytics.output_dir, '01_lead_time_histogram.png')))
+            self.assertTrue(os.path.exists(os.path.join(
+                analytics.output_dir, 'snapshots', snapshots[0], '01_lead_time_histogram.png')))
+            
+            analytics.max_staleness_hours = 0
+            with self.assertRaises(StoreError):
+                analytics.generate_all_reports(offline=True)
+            with self.assertRaises(StoreError):
+                analytics.generate_all_reports(snapshot='19990101T000000')
+            
+            empty = make_analytics(tmp_dir, project_key='EMPTY')
+            with self.assertRaises(StoreError):
+                empty.load_offline_data()
+    
+    def test_36_snapshot_replay_after_sync(self):
+        """Тест 36: Более поздняя синхронизация не меняет метаданные ранних снимков"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for total in (30, 40):
+                with MockJiraServer(total=total) as server:
+                    analytics = make_analytics(tmp_dir, jira_server=server.url, max_results=50, keep_snapshots=2,
+                                               columnar_snapshot=False)
+                    analytics.sync_store(full_refresh=True, profile='lean' if total == 30 else 'full')
+            first, second = analytics.list_snapshots()
+            
+            self.assertEqual(analytics.for_snapshot(first).load_store_meta()['totalIssues'], 30)
+            self.assertEqual(analytics.for_snapshot(first).load_store_meta()['profile'], 'lean')
+            self.assertEqual(analytics.for_snapshot(second).load_store_meta()['totalIssues'], 40)
+            self.assertTrue(analytics.generate_all_reports(reports=['lead-time'], snapshot=first))
+            # Снимок без changelog не проходит проверку для отчетов, которым он нужен
+            with self.assertRaises(StoreError):
+                analytics.generate_all_reports(reports=['time-in-status'], snapshot=first)
+    
+    def test_26_columnar_snapshot(self):
+        """Тест 26: Колоночный снимок совпадает с таблицей из JSON Lines и читается по столбцам"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with MockJiraServer(total=300) as server:
+                analytics = make_analytics(tmp_dir, jira_server=server.url, max_results=100)
+                _, _, all_issues = analytics.prepare_data(full_refresh=True)
+            
+            snapshot = analytics.open_columnar_snapshot()
+            table = analytics.build_issue_table(all_issues)
+            as_of = pd.Timestamp('2030-01-01')
+            
+            pd.testing.assert_frame_equal(snapshot.load_table(list(table.columns)), table)
+            pd.testing.assert_frame_equal(snapshot.load_table(['created', 'resolved']), table[['created', 'resolved']])
+            pd.testing.assert_frame_equal(
+                analytics.status_intervals_from_snapshot(snapshot, as_of=as_of),
+                analytics.build_status_intervals(all_issues, as_of=as_of))
+            self.assertLess(os.path.getsize(analytics.columnar_file), os.path.getsize(analytics.issues_file) / 5)
+            
+            # Снимок устаревшего хранилища перестраивается при следующем чтении
+            analytics.save_issues_to_json(all_issues[:10])
+            self.assertEqual(analytics.open_columnar_snapshot().count, 10)
+            inputs = analytics.load_report_inputs(['lead-time'], 'lean')
+            self.assertEqual(list(inputs['table'].columns),
+                             ['is_closed', 'created', 'resolved', 'status', 'priority', 'assignee'])
+            self.assertNotIn('intervals', inputs)
+    
+    def test_27_sqlite_index_slices(self):
+        """Тест 27: Индекс SQLite обновляется из потока страниц и отдает срезы задач для отчетов"""
+        with tempfile.TemporaryDirectory() as tmp_dir, MockJiraServer(total=200) as server:
+            analytics = make_analytics(tmp_dir, jira_server=server.url, max_results=100, sqlite_index=True)
+            _, _, all_issues = analytics.prepare_data(full_refresh=True)
+            table = analytics.build_issue_table(all_issues)
+            self.assertTrue(analytics._index_is_current())
+            
+            closed = analytics.query_issues(closed=True)
+            self.assertEqual(list(closed['key']), list(table.loc[table['is_closed'], 'key']))
+            pd.testing.assert_series_equal(closed['resolved'],
+                                           table.loc[table['is_closed'], 'resolved'].reset_index(drop=True))
+            
+            assignee = table.loc[table['is_closed'], 'assignee'].value_counts().index[0]
+            since = pd.Timestamp('2015-01-01')
+            expected = table[(table['assignee'] == assignee) & (table['created'] >= since)]
+            user_slice = analytics.query_issues(['key', 'created'], assignee=assignee, created_from='2015-01-01')
+            self.assertEqual(list(user_slice['key']), list(expected['key']))
+            
+            as_of = pd.Timestamp('2030-01-01')
+            pd.testing.assert_frame_equal(analytics.status_intervals_for_slice(as_of=as_of),
+                                          analytics.build_status_intervals(all_issues, as_of=as_of))
+            
+            # Инкрементальная синхронизация дописывает в индекс только измененные задачи
+            with mock.patch.object(analytics.issue_index, 'upsert', wraps=analytics.issue_index.upsert) as upsert:
+                analytics.sync_store()
+            upserted = sum(len(call.args[1]) for call in upsert.call_args_list)
+            self.assertLess(upserted, 200)
+            self.assertTrue(analytics._index_is_current())
+            self.assertEqual(len(analytics.query_issues(['key'])), 200)
+            
+            analytics.report_filters = {'closed': True, 'assignee': assignee}
+            inputs = analytics.load_report_inputs(['priority'], 'lean')
+            self.assertEqual(len(inputs['table']), int((table['is_closed'] & (table['assignee'] == assignee)).sum()))
+    
+    def test_28_closed_issue_stats(self):
+        """Тест 28: Один проход по закрытым задачам для топа пользователей, приоритетов и worklog"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            analytics = make_analytics(tmp_dir)
+            issues = [
+                make_issue(f'KAFKA-{i}', status='Closed' if i % 4 else 'Open',
+                           assignee={'displayName': f'User {i % 7}'}, reporter={'displayName': f'User {i % 3}'},
+                           priority={'name': ['Major', 'Minor', 'Blocker'][i % 3]}, timespent=3600 * (i % 5) or None)
+                for i in range(200)
+            ]
+            table = analytics.build_issue_table(issues)
+            closed = table[table['is_closed']]
+            
+            from_table = analytics.aggregate_closed_issues(table)
+            from_stream = analytics.aggregate_closed_issues(iter(issues))
+            
+            totals = closed['assignee'].value_counts().add(closed['reporter'].value_counts(), fill_value=0)
+            self.assertEqual(from_table.top_users(), from_stream.top_users())
+            self.assertEqual([assignee + reporter for _, assignee, reporter in from_table.top_users()],
+                             sorted(totals[totals > 0].astype(int), reverse=True))
+            self.assertEqual(from_table.priority_counts(), from_stream.priority_counts())
+            self.assertEqual(dict(from_table.priority_counts()), closed['priority'].value_counts().to_dict())
+            self.assertEqual(sorted(from_table.worklog_hours), sorted(from_stream.worklog_hours))
+            
+            charts = analytics.charts_top_users(from_table) + analytics.charts_issues_by_priority(from_table)
+            self.assertEqual(charts[0]['users'], [user for user, _, _ in from_table.top_users()])
+            self.assertEqual(sum(charts[1]['counts']), len(closed))
+            
+            # Space-Saving: тяжелый элемент остается в сводке, память ограничена емкостью
+            sketch = SpaceSaving(capacity=10)
+            for i in range(5000):
+                sketch.add('heavy' if i % 3 == 0 else f'user-{i}')
+            self.assertEqual(len(sketch.counts), 10)
+            self.assertEqual(sketch.most_common(1)[0][0], 'heavy')
+            self.assertGreaterEqual(sketch.most_common(1)[0][1], 5000 // 3)
+
+    
+    def test_29_incremental_aggregates(self):
+        """Тест 29: Агрегаты отчетов пересчитываются только по измененным задачам и совпадают с таблицей"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            analytics = make_analytics(tmp_dir, incremental_aggregates=True, max_results=50)
+            remote = [
+                make_issue(f'KAFKA-{i}', updated=f'2024-01-{i % 28 + 1:02d}T10:00:00.000+0000',
+                           status='Closed' if i % 3 else 'Open', created=f'2023-12-{i % 28 + 1:02d}T08:00:00.000+0000',
+                           resolutiondate=f'2024-01-{i % 28 + 1:02d}T09:00:00.000+0000' if i % 3 else None,
+                           assignee={'displayName': f'User {i % 5}'}, priority={'name': ['Major', 'Minor'][i % 2]},
+                           timespent=1800 * (i % 4) or None)
+                for i in range(120)
+            ]
+            
+            def fake_get(url, params, timeout):
+                return make_search_response(remote, params['startAt'], params['maxResults'])
+            
+            def assert_charts_match():
+                inputs = analytics.load_report_inputs(['lead-time', 'daily-flow', 'top-users', 'priority'], 'lean')
+                table = analytics.build_issue_table(analytics.iter_issues())
+                stats = analytics.aggregate_closed_issues(table)
+                for from_aggregates, from_table in [
+                    (analytics.charts_lead_time_histogram(inputs['table']), analytics.charts_lead_time_histogram(table)),
+                    (analytics.charts_daily_issue_flow(inputs['table']), analytics.charts_daily_issue_flow(table)),
+                    (analytics.charts_top_users(inputs['closed_stats']), analytics.charts_top_users(stats)),
+                    (analytics.charts_issues_by_priority(inputs['closed_stats']), analytics.charts_issues_by_priority(stats)),
+                ]:
+                    self.assertEqual([chart_fingerprint(chart) for chart in from_aggregates],
+                                     [chart_fingerprint(chart) for chart in from_table])
+                self.assertEqual(sorted(inputs['closed_stats'].worklog_hours), sorted(stats.worklog_hours))
+            
+            with mock.patch.object(analytics.session, 'get', side_effect=fake_get):
+                analytics.sync_store(profile='lean')
+                assert_charts_match()
+                with open(analytics.aggregates_file, 'rb') as f:
+                    base = f.read()
+                
+                remote = [
+                    make_issue('KAFKA-0', updated='2024-03-01T10:00:00.000+0000', status='Closed',
+                               resolutiondate='2024-03-01T09:00:00.000+0000', priority={'name': 'Blocker'}),
+                    make_issue('KAFKA-500', updated='2024-03-02T10:00:00.000+0000'),
+                ]
+                with mock.patch.object(ReportAggregates, 'update', autospec=True,
+                                       side_effect=ReportAggregates.update) as update:
+                    analytics.sync_store(profile='lean')
+                    assert_charts_match()
+            
+            self.assertEqual(sum(len(call.args[1]) for call in update.call_args_list), 2)
+            aggregates = analytics.open_report_aggregates()
+            self.assertEqual(len(aggregates.contributions), 121)
+            self.assertEqual(aggregates.counters['priority']['Blocker'], 1)
+            
+            # Базовый файл не переписывается: вклад двух измененных задач дописан в журнал
+            with open(analytics.aggregates_file, 'rb') as f:
+                self.assertEqual(f.read(), base)
+            with open(ReportAggregates.journal_path(analytics.aggregates_file), encoding='utf-8') as f:
+                self.assertEqual([sorted(json.loads(line)['contributions']) for line in f], [['KAFKA-0', 'KAFKA-500']])
+            reloaded = ReportAggregates.load(analytics.aggregates_file)
+            rebuilt = ReportAggregates()
+            rebuilt.update(analytics.iter_issues())
+            self.assertEqual(reloaded.contributions, rebuilt.contributions)
+            self.assertEqual(reloaded.counters, rebuilt.counters)
+            self.assertEqual(reloaded.source, aggregates.source)
+            
+            # Повторный ответ с теми же задачами ничего не дописывает в журнал
+            with mock.patch.object(analytics.session, 'get', side_effect=fake_get):
+                self.assertEqual(analytics.sync_store(profile='lean')['unchanged'], 121)
+            with open(ReportAggregates.journal_path(analytics.aggregates_file), encoding='utf-8') as f:
+                self.assertEqual(len(f.readlines()), 1)
+            
+            # Журнал больше COMPACT_RATIO от числа задач сжимается в базовый файл
+            with mock.patch.object(ReportAggregates, 'COMPACT_RATIO', 0.01):
+                remote = [make_issue('KAFKA-1', updated='2024-03-03T10:00:00.000+0000')]
+                with mock.patch.object(analytics.session, 'get', side_effect=fake_get):
+                    analytics.sync_store(profile='lean')
+            self.assertFalse(os.path.exists(ReportAggregates.journal_path(analytics.aggregates_file)))
+            self.assertEqual(ReportAggregates.load(analytics.aggregates_file).contributions,
+                             analytics.open_report_aggregates().contributions)
+            
+            # Хранилище, перезаписанное в обход синхронизации, дает пересборку агрегатов
+            analytics.save_issues_to_json(list(analytics.iter_issues())[:10])
+            self.assertEqual(len(analytics.open_report_aggregates().contributions), 10)
+
+    
+    def test_30_report_daemon(self):
+        """Тест 30: Демон перерисовывает графики только при изменениях и отдает их по HTTP"""
+        with tempfile.TemporaryDirectory() as tmp_dir, MockJiraServer(total=80) as server:
+            analytics = make_analytics(tmp_dir, jira_server=server.url, max_results=50, render_workers=1)
+            daemon = ReportDaemon(analytics, reports=['lead-time', 'priority'], interval=0, port=0).start()
+            try:
+                first = daemon.run_cycle()['projects']['KAFKA']
+                self.assertEqual(first['sync']['new'], 80)
+                # Демон держит агрегаты отчетов в памяти, даже если они не включены в конфигурации
+                self.assertTrue(analytics.incremental_aggregates)
+                self.assertEqual(len(analytics.open_report_aggregates().contributions), 80)
+                store_mtime = os.stat(analytics.issues_file).st_mtime_ns
+                self.assertEqual(sorted(first['rendered']), ['01_lead_time_histogram.png', '06_issues_by_priority.png'])
+                
+                with mock.patch.object(analytics, 'load_report_inputs') as load_inputs:
+                    second = daemon.run_cycle()['projects']['KAFKA']
+                self.assertFalse(load_inputs.called)
+                self.assertEqual(second['sync']['changed'] + second['sync']['new'], 0)
+                self.assertEqual(second['rendered'], [])
+                self.assertEqual(second['issues'], 80)
+                self.assertEqual(os.stat(analytics.issues_file).st_mtime_ns, store_mtime)
+                # Между циклами замеры сбрасываются целиком, вместе с именами потоков
+                self.assertEqual(analytics.tracer.events, [])
+                self.assertEqual(analytics.tracer._thread_names, {})
+                
+                metrics = requests.get(f'{daemon.url}/metrics', timeout=5).json()
+                self.assertEqual(metrics['cycle'], 2)
+                chart = requests.get(f'{daemon.url}/charts/KAFKA/01_lead_time_histogram.png', timeout=5)
+                self.assertEqual(chart.headers['Content-Type'], 'image/png')
+                with open(os.path.join(analytics.output_dir, '01_lead_time_histogram.png'), 'rb') as f:
+                    self.assertEqual(chart.content, f.read())
+                with open(os.path.join(analytics.output_dir, 'all.pdf'), 'wb') as f:
+                    f.write(b'%PDF-1.4')
+                bundle = requests.get(f'{daemon.url}/charts/KAFKA/all.pdf', timeout=5)
+                self.assertEqual((bundle.headers['Content-Type'], bundle.content), ('application/pdf', b'%PDF-1.4'))
+                self.assertEqual(requests.get(f'{daemon.url}/charts/KAFKA/..%2Fconfig.json', timeout=5).status_code, 404)
+                self.assertEqual(requests.get(f'{daemon.url}/charts/OTHER/01_lead_time_histogram.png',
+                                              timeout=5).status_code, 404)
+            finally:
+                daemon.stop()
+
+    
+    def test_31_lazy_imports_and_cli(self):
+        """Тест 31: Импорт модуля укладывается в бюджет без pandas/matplotlib, команда stats их не грузит"""
+        heavy = ('pandas', 'numpy', 'matplotlib', 'requests')
+        script = (
+            "import sys, time\n"
+            "started = time.perf_counter()\n"
+            "import jira_analytics\n"
+            "seconds = time.perf_counter() - started\n"
+            "jira_analytics.main(sys.argv[1:])\n"
+            f"print(seconds, [name for name in {heavy!r} if name in sys.modules])\n"
+        )
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            analytics = make_analytics(tmp_dir, project_keys=['KAFKA', 'ZOOKEEPER'])
+            analytics.save_issues_to_json([make_issue('KAFKA-1'), make_issue('KAFKA-2')])
+            analytics.for_project('ZOOKEEPER').save_issues_to_json([make_issue('ZOOKEEPER-1')])
+            self.assertIs(analytics.for_project('ZOOKEEPER')._session, analytics._session)
+            result = subprocess.run(
+                [sys.executable, '-c', script, '--config', os.path.join(tmp_dir, 'config.json'), 'stats'],
+                capture_output=True, text=True, cwd=Path(__file__).parent, check=True)
+        
+        output = result.stdout.strip().splitlines()
+        stats = json.loads('\n'.join(output[:-1]))
+        seconds, loaded = output[-1].split(' ', 1)
+        self.assertEqual([item['totalIssues'] for item in stats], [2, 1])
+        self.assertIn('store', stats[0]['fileSizes'])
+        self.assertEqual(loaded, '[]')
+        self.assertLess(float(seconds), IMPORT_TIME_BUDGET)
+        
+        args = build_parser().parse_args(['report', '--only', 'lead-time', 'priority', '--offline'])
+        self.assertEqual((args.command, args.only, args.offline), ('report', ['lead-time', 'priority'], True))
+
+    
+    def test_32_distribution_stats(self):
+        """Тест 32: Квантили распределений по измерениям и сливаемые скетчи"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with MockJiraServer(total=400) as server:
+                analytics = make_analytics(tmp_dir, jira_server=server.url, max_results=100, render_workers=1)
+                analytics.generate_all_reports(full_refresh=True)
+            
+            with open(os.path.join(analytics.output_dir, '07_distribution_stats.json'), encoding='utf-8') as f:
+                document = json.load(f)
+            stats = pd.read_csv(os.path.join(analytics.output_dir, '07_distribution_stats.csv'))
+            table = analytics.build_issue_table(analytics.iter_issues())
+            closed = table[table['is_closed']]
+            lead_days = (closed['resolved'] - closed['created']).dt.total_seconds() / (24 * 3600)
+            
+            self.assertEqual(set(stats['report']), {'lead-time', 'time-in-status', 'worklog'})
+            self.assertEqual(set(stats.loc[stats['report'] == 'time-in-status', 'dimension']),
+                             {'all', 'status', 'priority', 'assignee'})
+            lead_all = stats[(stats['report'] == 'lead-time') & (stats['dimension'] == 'all')].iloc[0]
+            self.assertEqual(lead_all['count'], lead_days.notna().sum())
+            self.assertAlmostEqual(lead_all['p90'], lead_days.quantile(0.9))
+            by_priority = stats[(stats['report'] == 'lead-time') & (stats['dimension'] == 'priority')]
+            self.assertEqual(dict(zip(by_priority['group'], by_priority['count'])),
+                             closed.loc[lead_days.notna(), 'priority'].value_counts().to_dict())
+            self.assertIn('lead-time|assignee|' + str(closed['assignee'].iloc[0]), document['sketches'])
+            
+            # Измерения не зависят от хранилища и от набора отчетов: снимок, JSON Lines и агрегаты дают те же строки
+            def stats_rows(reports, **overrides):
+                other = make_analytics(tmp_dir, **overrides)
+                inputs = other.load_report_inputs(reports, other.required_profile(reports), offline=True)
+                rows = other.compute_distribution_stats(other.distribution_frames(inputs, reports))[0]
+                return rows.sort_values(['report', 'dimension', 'group']).reset_index(drop=True)
+            
+            reports = ['lead-time', 'worklog']
+            from_snapshot = stats_rows(reports)
+            self.assertEqual(set(from_snapshot['dimension']), {'all', 'status', 'priority', 'assignee'})
+            pd.testing.assert_frame_equal(stats_rows(reports, columnar_snapshot=False), from_snapshot)
+            pd.testing.assert_frame_equal(stats_rows(reports, incremental_aggregates=True), from_snapshot)
+            pd.testing.assert_frame_equal(stats_rows(['lead-time']),
+                                          from_snapshot[from_snapshot['report'] == 'lead-time'])
+            
+            # Время в статусах по приоритетам и исполнителям: интервалы присоединяются к задачам по ключу
+            reports = ['time-in-status']
+            dwell = stats_rows(reports)
+            pd.testing.assert_frame_equal(stats_rows(reports, columnar_snapshot=False), dwell)
+            pd.testing.assert_frame_equal(stats_rows(reports, incremental_aggregates=True), dwell)
+            dwell_all = dwell[dwell['dimension'] == 'all'].iloc[0]
+            for dimension in ('status', 'priority', 'assignee'):
+                self.assertEqual(dwell.loc[dwell['dimension'] == dimension, 'count'].sum(), dwell_all['count'])
+            per_issue = analytics.status_dwell(analytics.build_status_intervals(analytics.iter_issues()))
+            priorities = table.set_index('key')['priority'].astype(object)
+            expected = per_issue.groupby(per_issue.index.get_level_values('key').map(priorities)).count()
+            by_priority = dwell[dwell['dimension'] == 'priority']
+            self.assertEqual(dict(zip(by_priority['group'], by_priority['count'])),
+                             {str(group): count for group, count in expected.items()})
+            
+            # Слияние скетчей двух половин совпадает с целым в пределах погрешности скетча
+            values = lead_days.dropna().to_numpy()
+            halves = [{'sketches': {'lead-time|all|all': QuantileSketch().add(part).to_dict()}}
+                      for part in (values[::2], values[1::2])]
+            merged = merge_distribution_stats(halves)['rows'][0]
+            self.assertEqual(merged['count'], len(values))
+            self.assertAlmostEqual(merged['mean'], values.mean())
+            for column, q in (('p50', 0.5), ('p90', 0.9)):
+                self.assertLess(abs(merged[column] - np.quantile(values, q)), 0.05 * np.quantile(values, q))
+
+    
+    def test_33_sharded_sync(self):
+        """Тест 33: Синхронизация по окнам created с делением окон и продолжением после сбоя"""
+        with tempfile.TemporaryDirectory() as tmp_dir, MockJiraServer(total=300) as server:
+            analytics = make_analytics(tmp_dir, jira_server=server.url, max_results=10, shard_sync=True,
+                                       shard_months=12, shard_max_issues=40, backoff_base=0.01, max_retries=1)
+            shards = analytics.plan_shards()
+            self.assertEqual(sum(total for _, _, total in shards), 300)
+            self.assertTrue(all(total <= 40 for _, _, total in shards))
+            self.assertTrue(all(left[1] <= right[0] for left, right in zip(shards, shards[1:])))
+            # Крайние окна открыты, чтобы сдвиг часового пояса JQL не терял задачи
+            self.assertEqual((shards[0][0], shards[-1][1]), (datetime.min, datetime.max))
+            self.assertNotIn('created >=', analytics._created_jql(*shards[0][:2]))
+            self.assertNotIn('created <', analytics._created_jql(*shards[-1][:2]))
+            
+            failed_jql = analytics._created_jql(*shards[2][:2])
+            request_page = analytics._request_page
+            requested = []
+            
+            def flaky_page(jql, start_at, max_results, profile='full'):
+                if max_results > 1:
+                    requested.append(jql)
+                    if jql == failed_jql and fail:
+                        raise JiraSyncError('сбой окна')
+                return request_page(jql, start_at, max_results, profile)
+            
+            with mock.patch.object(analytics, '_request_page', side_effect=flaky_page):
+                fail = True
+                with self.assertRaises(JiraSyncError):
+                    analytics.sync_store(profile='lean')
+                self.assertFalse(os.path.exists(analytics.issues_file))
+                self.assertEqual(len([name for name in os.listdir(analytics.shards_dir) if name.endswith('.jsonl')]),
+                                 len(shards) - 1)
+                
+                fail = False
+                requested.clear()
+                stats = analytics.sync_store(profile='lean')
+            
+            self.assertEqual(set(requested), {failed_jql})
+            self.assertEqual(stats['new'], 300)
+            self.assertEqual([issue['key'] for issue in analytics.iter_issues()],
+                             [f'KAFKA-{i}' for i in range(1, 301)])
+            self.assertFalse(os.path.exists(analytics.shards_dir))
+            
+            # Задача, попавшая в два шарда, сохраняется один раз в самой свежей версии
+            Path(analytics.shards_dir).mkdir(parents=True)
+            old, new = make_issue('KAFKA-1'), make_issue('KAFKA-1', updated='2024-05-01T10:00:00.000+0000')
+            for (start, end, _), issues in zip(shards[:2], [[new], [old, make_issue('KAFKA-2')]]):
+                analytics.save_issues_to_json(issues)
+                os.replace(analytics.issues_file, analytics._shard_path(start, end))
+            with open(os.path.join(analytics.shards_dir, 'plan.json'), 'w', encoding='utf-8') as f:
+                json.dump({'profile': 'lean', 'createdAt': datetime.now().isoformat(),
+                           'shards': [(start.isoformat(), end.isoformat(), 1) for start, end, _ in shards[:2]]}, f)
+            merged = list(analytics.iter_sharded_issues('lean'))
+            self.assertEqual([issue['key'] for issue in merged], ['KAFKA-1', 'KAFKA-2'])
+            self.assertEqual(merged[0]['fields']['updated'], '2024-05-01T10:00:00.000+0000')
+            
+            # Устаревший план строится заново, готовые шарды отбрасываются
+            created_at = (datetime.now() - timedelta(hours=analytics.shard_plan_max_age_hours + 1)).isoformat()
+            with open(os.path.join(analytics.shards_dir, 'plan.json'), 'w', encoding='utf-8') as f:
+                json.dump({'profile': 'lean', 'createdAt': created_at, 'shards': []}, f)
+            self.assertEqual(analytics._load_shard_plan('lean'), shards)
+            self.assertFalse(os.path.exists(analytics._shard_path(*shards[0][:2])))
+
+    
+    def test_34_chart_composition_and_formats(self):
+        """Тест 34: Сетка графиков по статусам, многостраничный PDF и дополнительные форматы"""
+        reports = ['lead-time', 'time-in-status']
+        with tempfile.TemporaryDirectory() as tmp_dir, MockJiraServer(total=200) as server:
+            analytics = make_analytics(tmp_dir, jira_server=server.url, max_results=100, render_workers=1,
+                                       status_layout='faceted', chart_formats=['png', 'svg'], chart_preview_dpi=40)
+            analytics.generate_all_reports(full_refresh=True, reports=reports)
+            files = set(os.listdir(analytics.output_dir))
+            
+            self.assertFalse(any(name.startswith('02_time_in_status_') for name in files))
+            for name in ['02_time_in_status', '01_lead_time_histogram']:
+                self.assertTrue({f'{name}.png', f'{name}.svg', f'{name}.preview.png'} <= files)
+            self.assertLess(os.path.getsize(os.path.join(analytics.output_dir, '02_time_in_status.preview.png')),
+                            os.path.getsize(os.path.join(analytics.output_dir, '02_time_in_status.png')))
+            
+            # Удаленный файл дополнительного формата или превью перерисовывается, остальные берутся из кэша
+            os.remove(os.path.join(analytics.output_dir, '01_lead_time_histogram.svg'))
+            os.remove(os.path.join(analytics.output_dir, '02_time_in_status.preview.png'))
+            analytics.generate_all_reports(reports=reports, offline=True)
+            self.assertEqual(sorted(analytics.last_render_summary['rendered']),
+                             ['01_lead_time_histogram.png', '02_time_in_status.png'])
+            self.assertTrue({'01_lead_time_histogram.svg', '02_time_in_status.preview.png'}
+                            <= set(os.listdir(analytics.output_dir)))
+            
+            panels = analytics.charts_time_in_status(analytics.build_status_intervals(analytics.iter_issues()))
+            self.assertEqual(len(panels), 1)
+            self.assertGreater(len(panels[0]['panels']), 1)
+            
+            bundled = make_analytics(tmp_dir, jira_server=server.url, output_dir=os.path.join(tmp_dir, 'bundle'),
+                                     render_workers=1, chart_bundle='report.pdf')
+            bundled.generate_all_reports(reports=reports, offline=True)
+            with open(os.path.join(bundled.output_dir, 'report.pdf'), 'rb') as f:
+                pages = len(re.findall(rb'/Type\s*/Page\b', f.read()))
+            self.assertEqual(pages, 1 + len(bundled.charts_time_in_status(
+                bundled.build_status_intervals(bundled.iter_issues()))))
+            self.assertFalse(any(name.endswith('.png') for name in os.listdir(bundled.output_dir)))
+            
+            bundled.generate_all_reports(reports=reports, offline=True)
+            self.assertEqual(bundled.last_render_summary['reused'], ['report.pdf'])
+    
+    def test_35_compact_issue_model(self):
+        """Тест 35: Компактная модель задач совпадает со списком задач и занимает в разы меньше памяти"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            analytics = make_analytics(tmp_dir)
+            raw = [SyntheticIssues(total=3000).issue(index) for index in range(3000)]
+            raw[0]['fields'].pop('resolutiondate', None)
+            raw[1]['fields']['assignee'] = None
+            
+            with mock.patch.object(CompactIssues, 'CHUNK_SIZE', 700):
+                compact = CompactIssues(iter(raw))
+            as_of = pd.Timestamp('2030-01-01')
+            table = analytics.build_issue_table(raw)
+            
+            pd.testing.assert_frame_equal(analytics.build_issue_table(compact), table)
+            pd.testing.assert_frame_equal(analytics.build_status_intervals(compact, as_of=as_of),
+                                          analytics.build_status_intervals(raw, as_of=as_of))
+            # Перебор отдает облегченные задачи, из которых строится та же таблица
+            self.assertNotIn('changelog', compact[0])
+            self.assertEqual(compact[-1]['key'], 'KAFKA-3000')
+            pd.testing.assert_frame_equal(analytics.build_issue_table(list(compact)), table)
+            
+            closed = compact.closed()
+            closed_raw = [issue for issue in raw if issue['fields']['status']['name'] in ('Closed', 'Resolved', 'Done')]
+            self.assertEqual([issue['key'] for issue in closed], list(table.loc[table['is_closed'], 'key']))
+            pd.testing.assert_frame_equal(analytics.build_status_intervals(closed, as_of=as_of),
+                                          analytics.build_status_intervals(closed_raw, as_of=as_of))
+            self.assertEqual(analytics.aggregate_closed_issues(compact).top_users(),
+                             analytics.aggregate_closed_issues(table).top_users())
+            # Одинаковые статусы - один и тот же объект строки
+            names = [issue['fields']['status']['name'] for issue in compact[:200]]
+            self.assertEqual(len({id(name) for name in names}), len(set(names)))
+            
+            tracemalloc.start()
+            # Прежнее представление: задачи без changelog, но с полными полями и списком переходов
+            slim = [json.loads(json.dumps({'key': issue['key'], 'fields': issue['fields'],
+                                           'transitions': status_transitions(issue)}))
+                    for issue in raw]
+            slim_bytes = tracemalloc.get_traced_memory()[0]
+            del slim
+            tracemalloc.stop()
+            tracemalloc.start()
+            compact = CompactIssues(raw)
+            compact_bytes = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            self.assertLess(compact_bytes * 4, slim_bytes)
+
 
 def run_tests():
     """Функция для запуска всех тестов"""